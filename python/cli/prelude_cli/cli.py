@@ -1,21 +1,70 @@
+import importlib
+
 import click
 
-from prelude_cli.views.build import build
-from prelude_cli.views.configure import configure
-from prelude_cli.views.detect import detect
-from prelude_cli.views.generate import generate
-from prelude_cli.views.iam import iam
-from prelude_cli.views.jobs import jobs
-from prelude_cli.views.partner import partner
-from prelude_cli.views.scm import scm
-from prelude_sdk.models.account import Account
+
+OUTPUTS = ["pretty", "json", "ndjson", "csv", "table"]
+
+
+class LazyGroup(click.Group):
+    """Group whose subcommands, and everything they import, load only once one of them runs
+
+    lazy_commands maps each command name to (module, short help), so --help never imports a view
+    """
+
+    def __init__(self, *args, lazy_commands: dict = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lazy_commands = lazy_commands or dict()
+
+    def list_commands(self, ctx):
+        return sorted(set(super().list_commands(ctx)) | set(self.lazy_commands))
+
+    def get_command(self, ctx, name):
+        if name in self.lazy_commands and name not in self.commands:
+            module, _ = self.lazy_commands[name]
+            self.add_command(getattr(importlib.import_module(module), name), name)
+        return super().get_command(ctx, name)
+
+    def format_commands(self, ctx, formatter):
+        rows = [
+            (name, self.lazy_commands[name][1])
+            for name in self.list_commands(ctx)
+            if name in self.lazy_commands and name not in self.commands
+        ]
+        rows += [
+            (name, self.commands[name].get_short_help_str())
+            for name in self.list_commands(ctx)
+            if name in self.commands
+        ]
+        if rows:
+            with formatter.section("Commands"):
+                formatter.write_dl(sorted(rows))
 
 
 def complete_profile(ctx, param, incomplete):
+    from prelude_sdk.models.account import Account
+
     return [x for x in Account().read_keychain_config() if x.startswith(incomplete)]
 
 
-@click.group(invoke_without_command=True)
+@click.group(
+    cls=LazyGroup,
+    invoke_without_command=True,
+    lazy_commands=dict(
+        build=("prelude_cli.views.build", "Custom security tests"),
+        configure=("prelude_cli.views.configure", "Configure your local keychain"),
+        detect=("prelude_cli.views.detect", "Continuous security testing"),
+        generate=("prelude_cli.views.generate", "Generate tests"),
+        iam=("prelude_cli.views.iam", "Prelude account management"),
+        jobs=("prelude_cli.views.jobs", "Jobs system commands"),
+        partner=("prelude_cli.views.partner", "Partner system commands"),
+        scm=("prelude_cli.views.scm", "SCM system commands"),
+        sync=(
+            "prelude_cli.views.sync",
+            "Mirror the catalog to a local database, or query the mirror",
+        ),
+    ),
+)
 @click.version_option()
 @click.pass_context
 @click.option(
@@ -25,20 +74,43 @@ def complete_profile(ctx, param, incomplete):
     show_default=True,
     shell_complete=complete_profile,
 )
-def cli(ctx, profile):
+@click.option(
+    "-o",
+    "--output",
+    default="pretty",
+    help="how results are written: pretty JSON, compact JSON, NDJSON, CSV or a table",
+    show_default=True,
+    type=click.Choice(OUTPUTS),
+)
+@click.option(
+    "--trace-requests",
+    is_flag=True,
+    help="print a waterfall and summary of every API call to stderr once the command ends",
+)
+@click.option(
+    "--deadline",
+    help="seconds the whole command may take, across every API call and wait it makes",
+    type=float,
+    envvar="PRELUDE_DEADLINE",
+)
+def cli(ctx, profile, output, trace_requests, deadline):
+    from prelude_sdk.models.account import Account
+
+    ctx.meta["output"] = output
     ctx.obj = Account(profile=profile)
-    if ctx.invoked_subcommand is None:
-        click.echo(ctx.get_help())
+    if deadline:
+        from prelude_sdk.controllers.call_context import call_context
 
+        ctx.with_resource(call_context(deadline=deadline))
+    if trace_requests:
+        from prelude_sdk.controllers.http_controller import HttpController
+        from prelude_sdk.controllers.instrumentation import Trace
+        from prelude_cli.views.shared import print_trace
 
-cli.add_command(build)
-cli.add_command(configure)
-cli.add_command(detect)
-cli.add_command(generate)
-cli.add_command(iam)
-cli.add_command(jobs)
-cli.add_command(partner)
-cli.add_command(scm)
+        trace = HttpController(ctx.obj).add_instrument(Trace())
+        ctx.call_on_close(lambda: print_trace(trace))
+    if ctx.invoked_subcommand is None:
+        click.echo(ctx.get_help())
 
 
 if __name__ == "__main__":
@@ -2,7 +2,6 @@ import importlib.resources as pkg_resources
 import json
 import os
 import re
-import time
 from datetime import datetime, timezone
 from pathlib import Path, PurePath
 
@@ -11,14 +10,23 @@ import click
 import prelude_cli.templates as templates
 from prelude_cli.views.shared import Spinner, pretty_print
 from prelude_sdk.controllers.build_controller import BuildController
+from prelude_sdk.controllers.job_waiter import JobWaiter
 from prelude_sdk.models.codes import Control, EDRResponse
 
 
+THREAT_JOURNAL = ".prelude_threat.json"
 UUID = re.compile(
     "[a-f0-9]{8}-?[a-f0-9]{4}-?4[a-f0-9]{3}-?[89ab][a-f0-9]{3}-?[a-f0-9]{12}"
 )
 
 
+def _wait_for_compile(controller, job_id):
+    return JobWaiter(account=controller.account).poll(
+        lambda: controller.get_compile_status(job_id),
+        lambda result: result["status"] != "RUNNING",
+    )
+
+
 @click.group()
 @click.pass_context
 def build(ctx):
@@ -141,10 +149,7 @@ def compile_code_file(controller, path, source_test_id):
             )
             if compile_job_id := data.get("job_id"):
                 spinner.update(spinner.task_ids[-1], description="Compiling")
-                while (
-                    result := controller.get_compile_status(compile_job_id)
-                ) and result["status"] == "RUNNING":
-                    time.sleep(2)
+                result = _wait_for_compile(controller, compile_job_id)
                 if result["status"] == "FAILED":
                     result["error"] = "Failed to compile"
                 data |= result
@@ -164,10 +169,17 @@ def undelete_test(controller, test):
 @build.command("upload")
 @click.argument("path", type=click.Path(exists=True))
 @click.option("-t", "--test", help="test identifier", default=None, type=str)
+@click.option(
+    "--parallel",
+    is_flag=True,
+    help="upload and compile every test directory under PATH at once",
+)
 @click.pass_obj
 @pretty_print
-def upload_attachment(controller, path, test):
+def upload_attachment(controller, path, test, parallel):
     """Upload a test attachment from disk"""
+    if parallel:
+        return _upload_tests(controller, path)
 
     def test_id():
         match = UUID.search(path)
@@ -189,10 +201,7 @@ def upload_attachment(controller, path, test):
                 )
                 if data.get("compile_job_id"):
                     spinner.update(spinner.task_ids[-1], description="Compiling")
-                    while (
-                        result := controller.get_compile_status(data["compile_job_id"])
-                    ) and result["status"] == "RUNNING":
-                        time.sleep(2)
+                    result = _wait_for_compile(controller, data["compile_job_id"])
                     if result["status"] == "FAILED":
                         result["error"] = "Failed to compile"
                     data |= result
@@ -213,6 +222,37 @@ def upload_attachment(controller, path, test):
     return res
 
 
+def _upload_tests(controller, path):
+    def files(test_dir):
+        for p in sorted(test_dir.iterdir()):
+            if p.is_file():
+                yield dict(filename=p.name, data=p.read_bytes())
+
+    tests = []
+    for test_dir in sorted(Path(path).iterdir()):
+        if test_dir.is_dir() and (match := UUID.search(test_dir.name)):
+            tests.append(dict(test_id=match.group(0), files=list(files(test_dir))))
+    if not tests:
+        raise FileNotFoundError(f"No test directories named by test ID under {path}")
+
+    res = dict()
+    with Spinner(description=f"Uploading {len(tests)} tests") as spinner:
+        for upload in controller.upload_tests(tests):
+            res[upload["test_id"]] = upload
+        jobs = {r["compile_job_id"]: r for r in res.values() if r["compile_job_id"]}
+        for job_id, result, error in controller.wait_for_compiles(jobs):
+            if error:
+                result = dict(status="FAILED", error=" ".join(map(str, error.args)))
+            elif result["status"] == "FAILED":
+                result["error"] = "Failed to compile"
+            jobs[job_id]["compile"] = result
+            spinner.update(
+                spinner.task_ids[-1],
+                description=f"Compiling ({sum('compile' in j for j in jobs.values())}/{len(jobs)})",
+            )
+    return list(res.values())
+
+
 @build.command("create-threat")
 @click.argument("name")
 @click.option(
@@ -239,77 +279,308 @@ def upload_attachment(controller, path, test):
     default=None,
     type=click.Path(exists=True, dir_okay=True, file_okay=False),
 )
+@click.option(
+    "-c",
+    "--concurrency",
+    help="number of API calls to run at once when using --directory",
+    default=8,
+    show_default=True,
+    type=int,
+)
+@click.option(
+    "--rollback",
+    help="delete everything a previous --directory run created, as recorded in its journal",
+    is_flag=True,
+)
 @click.pass_obj
 @pretty_print
-def create_threat(controller, name, published, id, source_id, source, tests, directory):
-    """Create a security threat"""
+def create_threat(
+    controller,
+    name,
+    published,
+    id,
+    source_id,
+    source,
+    tests,
+    directory,
+    concurrency,
+    rollback,
+):
+    """Create a security threat
+
+    With --directory, every technique is created concurrently and each step is recorded in a
+    journal inside the directory. Re-running the command resumes after a partial failure;
+    --rollback undoes it.
+    """
+    if directory:
+        journal = _ThreatJournal(Path(directory, THREAT_JOURNAL))
+        if rollback:
+            with Spinner(description="Rolling back threat"):
+                return _rollback_threat(controller, journal, concurrency)
+        with Spinner(description="Creating new threat"):
+            return _create_threat_from_directory(
+                controller,
+                journal,
+                Path(directory),
+                concurrency,
+                threat=dict(
+                    name=name,
+                    threat_id=id,
+                    source_id=source_id,
+                    source=source,
+                    published=published,
+                ),
+            )
+
     with Spinner(description="Creating new threat"):
+        return controller.create_threat(
+            name=name,
+            threat_id=id,
+            source_id=source_id,
+            source=source,
+            published=published,
+            tests=tests,
+        )
+
+
+class _ThreatJournal:
+    """Everything created so far by `create-threat --directory`, saved after every step"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.data = (
+            json.loads(path.read_text())
+            if path.is_file()
+            else dict(threat=None, techniques=dict())
+        )
+
+    def technique(self, name):
+        return self.data["techniques"].setdefault(
+            name, dict(test=None, upload=None, detections=dict(), hunts=dict())
+        )
+
+    def save(self):
+        part = self.path.with_name(self.path.name + ".part")
+        part.write_text(json.dumps(self.data, indent=2))
+        os.replace(part, self.path)
+
+
+def _create_threat_from_directory(controller, journal, directory, concurrency, threat):
+    import asyncio
+
+    from prelude_sdk.controllers.async_controller import AsyncBuildController
+
+    failed = []
+
+    async def record(step, entries, key, call, load):
+        """Run one API call with the arguments load() returns, unless the journal shows it already succeeded
+
+        Files are read by load() inside the step, so a missing or malformed one fails that step alone
+        """
+        if entries.get(key):
+            return
         try:
-            created_tests = []
-            test_uploads = []
-            created_detections = []
-            created_queries = []
-            threat = None
-            if directory:
-                for technique_dir in os.listdir(directory):
-                    with open(f"{directory}/{technique_dir}/config.json", "r") as f:
-                        config = json.load(f)
-                        test = controller.create_test(
-                            name=config["name"],
-                            unit=config["unit"],
-                            technique=config["technique"],
-                        )
-                        created_tests.append(test)
-                    with open(f"{directory}/{technique_dir}/test.go", "r") as f:
-                        go_code = f.read()
-                        test_uploads.append(
-                            controller.upload(
-                                test_id=test["id"],
-                                filename=f'{test["id"]}.go',
-                                data=go_code.encode(),
-                            )
-                        )
-                    for sigma_file in Path(f"{directory}/{technique_dir}").glob(
-                        "sigma*"
-                    ):
-                        with open(sigma_file, "r") as f:
-                            rule = f.read()
-                            created_detections.append(
-                                controller.create_detection(
-                                    rule=rule, test_id=test["id"]
-                                )
-                            )
-                    for query_file in Path(f"{directory}/{technique_dir}").glob(
-                        "query*"
-                    ):
-                        with open(query_file, "r") as f:
-                            query = json.load(f)
-                            created_queries.append(
-                                controller.create_threat_hunt(
-                                    name=query["name"],
-                                    query=query["query"],
-                                    test_id=test["id"],
-                                )
-                            )
-                tests = ",".join([t["id"] for t in created_tests])
-            threat = controller.create_threat(
-                name=name,
-                threat_id=id,
-                source_id=source_id,
-                source=source,
-                published=published,
-                tests=tests,
+            entries[key] = await call(**load())
+        except Exception as e:
+            reason = (
+                f"{e.strerror}: {e.filename}"
+                if getattr(e, "filename", None)
+                else " ".join(str(arg) for arg in e.args)
             )
-        except FileNotFoundError as e:
-            raise Exception(e)
-        finally:
+            failed.append(dict(step=step, reason=reason))
+            return
+        journal.save()
+
+    async def create_technique(build, technique_dir):
+        def load_test():
+            config = json.loads((technique_dir / "config.json").read_text())
             return dict(
-                threat=threat,
-                created_tests=created_tests,
-                test_uploads=test_uploads,
-                created_detections=created_detections,
-                created_threat_hunt_queries=created_queries,
+                name=config["name"], unit=config["unit"], technique=config["technique"]
+            )
+
+        entry = journal.technique(technique_dir.name)
+        await record(
+            f"{technique_dir.name}/test", entry, "test", build.create_test, load_test
+        )
+        if not entry["test"]:
+            return
+
+        test_id = entry["test"]["id"]
+
+        steps = [
+            record(
+                f"{technique_dir.name}/test.go",
+                entry,
+                "upload",
+                build.upload,
+                lambda: dict(
+                    test_id=test_id,
+                    filename=f"{test_id}.go",
+                    data=(technique_dir / "test.go").read_bytes(),
+                ),
+            )
+        ]
+        for sigma_file in sorted(technique_dir.glob("sigma*")):
+            steps.append(
+                record(
+                    f"{technique_dir.name}/{sigma_file.name}",
+                    entry["detections"],
+                    sigma_file.name,
+                    build.create_detection,
+                    lambda sigma_file=sigma_file: dict(
+                        rule=sigma_file.read_text(), test_id=test_id
+                    ),
+                )
             )
+        for query_file in sorted(technique_dir.glob("query*")):
+            steps.append(
+                record(
+                    f"{technique_dir.name}/{query_file.name}",
+                    entry["hunts"],
+                    query_file.name,
+                    build.create_threat_hunt,
+                    lambda query_file=query_file: _load_query(query_file, test_id),
+                )
+            )
+        await asyncio.gather(*steps)
+
+    async def create_all():
+        async with AsyncBuildController(
+            controller.account, max_workers=concurrency
+        ) as build:
+            await asyncio.gather(
+                *[
+                    create_technique(build, technique_dir)
+                    for technique_dir in sorted(directory.iterdir())
+                    if technique_dir.is_dir()
+                ]
+            )
+            if not failed:
+                tests = [t["test"]["id"] for t in journal.data["techniques"].values()]
+                await record(
+                    "threat",
+                    journal.data,
+                    "threat",
+                    build.create_threat,
+                    lambda: dict(tests=",".join(tests), **threat),
+                )
+
+    asyncio.run(create_all())
+    techniques = journal.data["techniques"].values()
+    result = dict(
+        threat=journal.data["threat"],
+        created_tests=[t["test"] for t in techniques if t["test"]],
+        test_uploads=[t["upload"] for t in techniques if t["upload"]],
+        created_detections=[
+            d for t in techniques for d in t["detections"].values() if d
+        ],
+        created_threat_hunt_queries=[
+            h for t in techniques for h in t["hunts"].values() if h
+        ],
+        failed=failed,
+    )
+    if failed:
+        return (
+            result,
+            f"Some steps failed. Re-run to resume, or pass --rollback to undo (journal: {journal.path})",
+        )
+    return result
+
+
+def _load_query(query_file, test_id):
+    """Arguments of create_threat_hunt for a query_N.json file, which must name its control"""
+    query = json.loads(Path(query_file).read_text())
+    control = Control[query["control"]] if query.get("control") else Control.NONE
+    if control in (Control.INVALID, Control.NONE):
+        raise ValueError(
+            f'{query_file} needs the "control" its query is written for, e.g. "CROWDSTRIKE"'
+        )
+    return dict(
+        control=control,
+        name=query["name"],
+        query=query["query"],
+        test_id=test_id,
+    )
+
+
+def _rollback_threat(controller, journal, concurrency):
+    import asyncio
+
+    from prelude_sdk.controllers.async_controller import AsyncBuildController
+
+    if not journal.path.is_file():
+        raise FileNotFoundError(f"No journal to roll back at {journal.path}")
+    failed = []
+
+    async def remove(step, entries, key, call, *args, **kwargs):
+        try:
+            await call(*args, **kwargs)
+        except Exception as e:
+            failed.append(dict(step=step, reason=" ".join(str(arg) for arg in e.args)))
+            return
+        entries[key] = None
+        journal.save()
+
+    async def remove_technique(build, name, entry):
+        await asyncio.gather(
+            *[
+                remove(
+                    f"{name}/{key}",
+                    entry["detections"],
+                    key,
+                    build.delete_detection,
+                    d["id"],
+                )
+                for key, d in entry["detections"].items()
+                if d
+            ],
+            *[
+                remove(
+                    f"{name}/{key}",
+                    entry["hunts"],
+                    key,
+                    build.delete_threat_hunt,
+                    h["id"],
+                )
+                for key, h in entry["hunts"].items()
+                if h
+            ],
+        )
+        if entry["test"]:
+            await remove(
+                f"{name}/test",
+                entry,
+                "test",
+                build.delete_test,
+                test_id=entry["test"]["id"],
+                purge=True,
+            )
+
+    async def remove_all():
+        async with AsyncBuildController(
+            controller.account, max_workers=concurrency
+        ) as build:
+            if journal.data["threat"]:
+                await remove(
+                    "threat",
+                    journal.data,
+                    "threat",
+                    build.delete_threat,
+                    threat_id=journal.data["threat"]["id"],
+                    purge=True,
+                )
+            await asyncio.gather(
+                *[
+                    remove_technique(build, name, entry)
+                    for name, entry in journal.data["techniques"].items()
+                ]
+            )
+
+    asyncio.run(remove_all())
+    if failed:
+        return dict(failed=failed), "Some deletions failed. Re-run --rollback to retry"
+    journal.path.unlink()
+    return dict(failed=failed), "Rolled back threat"
 
 
 @build.command("update-threat")
@@ -1,17 +1,22 @@
-import asyncio
 import click
-import yaml
+import csv
+import hashlib
+import json
+import os
 
 from datetime import datetime, time, timedelta, timezone
-from dateutil.parser import parse
 from pathlib import Path, PurePath
 
-from prelude_cli.views.shared import Spinner, pretty_print
+from prelude_cli.views.shared import Spinner, Stream, pretty_print
+from prelude_sdk.controllers.columnar import ACTIVITY_LOGS, arrow_schema, write_parquet
 from prelude_sdk.controllers.detect_controller import DetectController
 from prelude_sdk.controllers.iam_controller import IAMController
 from prelude_sdk.models.codes import Control, RunCode
 
 
+CLONE_MANIFEST = ".prelude_clone.json"
+
+
 @click.group()
 @click.pass_context
 def detect(ctx):
@@ -42,6 +47,41 @@ def register_endpoint(controller, host, serial_num, tags):
     return dict(token=token)
 
 
+@detect.command("create-endpoints")
+@click.option(
+    "-f",
+    "--from-file",
+    "from_file",
+    help="CSV file of endpoints, with host, serial_num and (optionally) tags columns",
+    required=True,
+    type=click.File("r"),
+)
+@click.option(
+    "--format",
+    "output_format",
+    help="output format for the registered tokens [default: ndjson, or the --output format]",
+    type=click.Choice(["csv", "ndjson"], case_sensitive=False),
+)
+@click.option(
+    "-c",
+    "--concurrency",
+    help="number of registrations to run at once",
+    default=16,
+    show_default=True,
+    type=int,
+)
+@click.pass_obj
+@pretty_print
+def register_endpoints(controller, from_file, output_format, concurrency):
+    """Register many endpoints from a file, streaming out their tokens"""
+    return Stream(
+        controller.register_endpoints(
+            endpoints=csv.DictReader(from_file), max_workers=concurrency
+        ),
+        format=output_format and output_format.lower(),
+    )
+
+
 @detect.command("update-endpoint")
 @click.argument("endpoint_id")
 @click.option(
@@ -59,6 +99,127 @@ def update_endpoint(controller, endpoint_id, tags):
         return controller.update_endpoint(endpoint_id=endpoint_id, tags=tags)
 
 
+def endpoint_selection(func):
+    for option in reversed(
+        [
+            click.option(
+                "-f",
+                "--from-file",
+                "from_file",
+                help="CSV file of endpoints, with an endpoint_id column",
+                type=click.File("r"),
+            ),
+            click.option(
+                "--stale_days",
+                help="select endpoints not seen in the past STALE_DAYS days",
+                type=int,
+            ),
+            click.option(
+                "--with_tags",
+                help="select endpoints with any of these tags (comma-separated list)",
+                type=str,
+            ),
+            click.option(
+                "-d",
+                "--days",
+                help="only consider endpoints that have run in the past DAYS days [default: 90, or STALE_DAYS + 90]",
+                type=int,
+            ),
+            click.option(
+                "--format",
+                "output_format",
+                help="output format for the per-endpoint report [default: ndjson, or the --output format]",
+                type=click.Choice(["csv", "ndjson"], case_sensitive=False),
+            ),
+            click.option(
+                "-c",
+                "--concurrency",
+                help="number of requests to run at once",
+                default=16,
+                show_default=True,
+                type=int,
+            ),
+        ]
+    ):
+        func = option(func)
+    return func
+
+
+def select_endpoints(controller, from_file, stale_days, with_tags, days):
+    if from_file:
+        rows = csv.DictReader(from_file)
+        if "endpoint_id" not in (rows.fieldnames or []):
+            raise click.UsageError("The --from-file CSV needs an endpoint_id column")
+        return list(rows)
+    if stale_days is None and not with_tags:
+        raise click.UsageError(
+            "Select endpoints with --from-file, --stale_days or --with_tags"
+        )
+    return list(
+        controller.select_endpoints(days=days, stale_days=stale_days, tags=with_tags)
+    )
+
+
+@detect.command("update-endpoints")
+@click.option(
+    "-t",
+    "--tags",
+    help="a comma-separated list of tags for the selected endpoints, unless the file has a tags column",
+    type=str,
+    default=None,
+)
+@endpoint_selection
+@click.pass_obj
+@pretty_print
+def bulk_update_endpoints(
+    controller,
+    tags,
+    from_file,
+    stale_days,
+    with_tags,
+    days,
+    output_format,
+    concurrency,
+):
+    """Update many endpoints at once"""
+    endpoints = select_endpoints(controller, from_file, stale_days, with_tags, days)
+    tags_column = bool(from_file and endpoints and "tags" in endpoints[0])
+    if tags is None and not tags_column:
+        raise click.UsageError("Give the new tags with --tags or a tags column")
+    return Stream(
+        controller.bulk_update_endpoints(
+            endpoints=[
+                dict(
+                    endpoint_id=e["endpoint_id"],
+                    tags=e["tags"] if tags_column else tags,
+                )
+                for e in endpoints
+            ],
+            max_workers=concurrency,
+        ),
+        format=output_format and output_format.lower(),
+    )
+
+
+@detect.command("delete-endpoints")
+@endpoint_selection
+@click.confirmation_option(prompt="Are you sure?")
+@click.pass_obj
+@pretty_print
+def bulk_delete_endpoints(
+    controller, from_file, stale_days, with_tags, days, output_format, concurrency
+):
+    """Delete many probes/endpoints at once"""
+    endpoints = select_endpoints(controller, from_file, stale_days, with_tags, days)
+    return Stream(
+        controller.bulk_delete_endpoints(
+            endpoint_ids=[e["endpoint_id"] for e in endpoints],
+            max_workers=concurrency,
+        ),
+        format=output_format and output_format.lower(),
+    )
+
+
 @detect.command("tests")
 @click.option("--techniques", help="comma-separated list of techniques", type=str)
 @click.pass_obj
@@ -134,6 +295,8 @@ def get_detection(controller, detection_id, output_file):
     with Spinner(description="Fetching data for detection"):
         data = controller.get_detection(detection_id=detection_id)
     if output_file:
+        import yaml
+
         with open(output_file, "w") as f:
             f.write(yaml.safe_dump(data["rule"]))
     return data
@@ -183,9 +346,9 @@ def download(controller, test):
         attachments = controller.get_test(test_id=test).get("attachments")
 
         for attach in attachments:
-            code = controller.download(test_id=test, filename=attach)
-            with open(PurePath(test, attach), "wb") as f:
-                f.write(code)
+            controller.download_to(
+                test_id=test, filename=attach, dest=PurePath(test, attach)
+            )
 
 
 @detect.command("schedule")
@@ -291,24 +454,112 @@ def endpoints(controller, days):
 
 
 @detect.command("clone")
+@click.option(
+    "-c",
+    "--concurrency",
+    help="number of downloads to run at once",
+    default=8,
+    show_default=True,
+    type=int,
+)
+@click.option(
+    "-f",
+    "--force",
+    help="download every file, even those that already match locally",
+    is_flag=True,
+)
 @click.pass_obj
 @pretty_print
-def clone(controller):
+def clone(controller, concurrency, force):
     """Download all tests to your local environment"""
+    import asyncio
 
-    async def fetch(test):
-        Path(test["id"]).mkdir(parents=True, exist_ok=True)
+    from prelude_sdk.controllers.async_controller import AsyncDetectController
 
-        for attach in controller.get_test(test_id=test["id"]).get("attachments"):
-            code = controller.download(test_id=test["id"], filename=attach)
-            with open(PurePath(test["id"], attach), "wb") as f:
-                f.write(code)
+    manifest_file = Path(CLONE_MANIFEST)
+    manifest = (
+        json.loads(manifest_file.read_text())
+        if manifest_file.is_file() and not force
+        else dict()
+    )
+    summary = dict(downloaded=[], unchanged=[], failed=[])
+
+    def matches(path, entry):
+        if not entry or not path.is_file() or path.stat().st_size != entry["size"]:
+            return False
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            while chunk := f.read(1 << 20):
+                digest.update(chunk)
+        return digest.hexdigest() == entry["sha256"]
+
+    def save_manifest():
+        part = manifest_file.with_name(manifest_file.name + ".part")
+        part.write_text(json.dumps(manifest, indent=2))
+        os.replace(part, manifest_file)
+
+    async def fetch_attachment(detect, test_id, attach):
+        key = f"{test_id}/{attach}"
+        path = Path(test_id, attach)
+        entry = manifest.get(key)
+        # hashing a large attachment must not hold up the other downloads
+        current = await asyncio.to_thread(matches, path, entry)
+        if current and not entry.get("etag"):
+            summary["unchanged"].append(key)
+            return
+
+        # an interrupted download is left in place and resumed with a Range request next time
+        part = path.with_name(path.name + ".part")
+        if force:
+            part.unlink(missing_ok=True)
+        try:
+            res = await detect.download_to(
+                test_id=test_id,
+                filename=attach,
+                dest=part,
+                etag=entry["etag"] if current else None,
+                resume=True,
+            )
+        except Exception as e:
+            summary["failed"].append(
+                dict(file=key, reason=" ".join(str(arg) for arg in e.args))
+            )
+            return
+        if res is None:
+            summary["unchanged"].append(key)
+            return
+        os.replace(part, path)
+        manifest[key] = dict(size=res["size"], sha256=res["sha256"], etag=res["etag"])
+        save_manifest()
+        summary["downloaded"].append(key)
+
+    async def fetch(detect, test):
+        try:
+            attachments = (await detect.get_test(test_id=test["id"])).get("attachments")
+        except Exception as e:
+            summary["failed"].append(
+                dict(test=test["id"], reason=" ".join(str(arg) for arg in e.args))
+            )
+            return
+        Path(test["id"]).mkdir(parents=True, exist_ok=True)
+        await asyncio.gather(
+            *[fetch_attachment(detect, test["id"], attach) for attach in attachments]
+        )
 
     async def start_cloning():
-        await asyncio.gather(*[fetch(test) for test in controller.list_tests()])
+        async with AsyncDetectController(
+            controller.account, max_workers=concurrency
+        ) as detect:
+            tests = await detect.list_tests()
+            await asyncio.gather(*[fetch(detect, test) for test in tests])
 
     with Spinner(description="Downloading all tests"):
         asyncio.run(start_cloning())
+    return dict(
+        downloaded=len(summary["downloaded"]),
+        unchanged=len(summary["unchanged"]),
+        failed=summary["failed"],
+    )
 
 
 @detect.command("activity")
@@ -348,25 +599,56 @@ def clone(controller):
 @click.option("--techniques", help="comma-separated list of techniques", type=str)
 @click.option("--tests", help="comma-separated list of test IDs", type=str)
 @click.option("--threats", help="comma-separated list of threat IDs", type=str)
+@click.option(
+    "--stream",
+    help="fetch the range in chunks and write records as they arrive, in this format",
+    type=click.Choice(["ndjson", "csv"]),
+)
+@click.option(
+    "--parquet",
+    help="fetch the range in chunks and write records to this Parquet file (requires pyarrow)",
+    type=click.Path(dir_okay=False, writable=True),
+)
+@click.option(
+    "--chunk",
+    help="length of each chunk with --stream or --parquet",
+    default="day",
+    show_default=True,
+    type=click.Choice(["day", "hour"]),
+)
+@click.option(
+    "-c",
+    "--concurrency",
+    help="number of chunks to fetch at once with --stream or --parquet",
+    default=8,
+    show_default=True,
+    type=int,
+)
 @click.pass_obj
 @pretty_print
 def describe_activity(
     controller,
+    chunk,
+    concurrency,
     control,
     dos,
     endpoints,
     finish,
     os,
+    parquet,
     policy,
     social,
     start,
     statuses,
+    stream,
     techniques,
     tests,
     threats,
     view,
 ):
     """View my Detect results"""
+    from dateutil.parser import parse
+
     start = parse(start) if start else datetime.now(timezone.utc) - timedelta(days=29)
     finish = parse(finish) if finish else datetime.now(timezone.utc)
     filters = dict(
@@ -394,6 +676,22 @@ def describe_activity(
     if threats:
         filters["threats"] = threats
 
+    if stream or parquet:
+        records = controller.iter_activity(
+            filters=filters,
+            view=view,
+            chunk=timedelta(days=1) if chunk == "day" else timedelta(hours=1),
+            max_workers=concurrency,
+        )
+        if parquet:
+            with Spinner(description="Exporting activity"):
+                return write_parquet(
+                    records,
+                    parquet,
+                    schema=arrow_schema(ACTIVITY_LOGS) if view == "logs" else None,
+                )
+        return Stream(records, format=stream)
+
     with Spinner(description="Fetching activity"):
         return controller.describe_activity(view=view, filters=filters)
 
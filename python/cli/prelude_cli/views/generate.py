@@ -1,10 +1,14 @@
 import json
 import os
+import shutil
+from contextlib import suppress
+from concurrent.futures import ThreadPoolExecutor
 
 import click
 
 from prelude_cli.views.shared import Spinner, pretty_print
 from prelude_sdk.controllers.generate_controller import GenerateController
+from prelude_sdk.controllers.job_waiter import JobWaiter
 from prelude_sdk.models.codes import Control
 
 
@@ -15,39 +19,117 @@ def generate(ctx):
     ctx.obj = GenerateController(account=ctx.obj)
 
 
-def _process_results(result: dict, output_dir: str, job_id: str) -> dict:
+def _wait_for_threat_intel(
+    controller: GenerateController, job_id: str, spinner, writer
+):
+    def progress(result):
+        writer.add(result)
+        if result["step"] == "GENERATE":
+            spinner.update(
+                spinner.task_ids[-1],
+                description=f'Generating ({result["completed_tasks"]}/{result["num_tasks"]}, {len(writer.written)} written)',
+            )
+
+    result = JobWaiter(account=controller.account).poll(
+        lambda: controller.get_threat_intel(job_id),
+        lambda result: result["status"] != "RUNNING",
+        on_update=progress,
+    )
     if result["status"] == "COMPLETE":
-        for technique in result["output"]:
-            if technique["status"] == "SUCCEEDED":
-                technique_directory = technique["technique"].replace(".", "_")
-                os.makedirs(f"{output_dir}/{technique_directory}")
-                content = technique.get("ai_generated") or technique.get(
-                    "existing_test"
+        writer.add(result)
+    return result
+
+
+class _TechniqueWriter:
+    """Writes every successfully generated technique to its own directory as soon as it shows up in the job output
+
+    Directories are written on a small pool while the job keeps being polled, and renamed into
+    place only once complete. Each threat hunt query keeps its control, or `control` when the
+    job output does not name one.
+    """
+
+    def __init__(self, output_dir: str, control: str = None, max_workers: int = 4):
+        self.output_dir = output_dir
+        self.control = control
+        self.written = set()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._futures = []
+
+    def add(self, result: dict):
+        for technique in result.get("output") or []:
+            if (
+                technique["status"] == "SUCCEEDED"
+                and technique["technique"] not in self.written
+            ):
+                self.written.add(technique["technique"])
+                self._futures.append(self._pool.submit(self._write, technique))
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+        for future in self._futures:
+            future.result()
+
+    def _write(self, technique: dict):
+        technique_directory = technique["technique"].replace(".", "_")
+        final = os.path.join(self.output_dir, technique_directory)
+        if os.path.exists(final):
+            raise FileExistsError(f"{final} already exists")
+        part = os.path.join(self.output_dir, f".{technique_directory}.part")
+        # a .part left by an interrupted run may hold files this technique no longer has
+        shutil.rmtree(part, ignore_errors=True)
+        os.makedirs(part)
+
+        content = technique.get("ai_generated") or technique.get("existing_test")
+        with open(f"{part}/test.go", "w") as f:
+            f.write(content["go_code"])
+        for i, sigma_rule in enumerate(content["sigma_rules"]):
+            with open(f"{part}/sigma_{i}.yaml", "w") as f:
+                f.write(sigma_rule)
+        for i, query in enumerate(content.get("threat_hunt_queries", [])):
+            with open(f"{part}/query_{i}.json", "w") as f:
+                json.dump(
+                    dict(
+                        name=query["name"],
+                        query=query["query"],
+                        control=query.get("control") or self.control,
+                    ),
+                    f,
+                    indent=4,
                 )
-                with open(f"{output_dir}/{technique_directory}/test.go", "w") as f:
-                    f.write(content["go_code"])
-                for i, sigma_rule in enumerate(content["sigma_rules"]):
-                    with open(
-                        f"{output_dir}/{technique_directory}/sigma_{i}.yaml", "w"
-                    ) as f:
-                        f.write(sigma_rule)
-                for i, query in enumerate(content.get("threat_hunt_queries", [])):
-                    with open(
-                        f"{output_dir}/{technique_directory}/query_{i}.json", "w"
-                    ) as f:
-                        json.dump(
-                            dict(name=query["name"], query=query["query"]), f, indent=4
-                        )
-                with open(f"{output_dir}/{technique_directory}/config.json", "w") as f:
-                    json.dump(
-                        dict(
-                            technique=technique["technique"],
-                            name=technique["name"],
-                            unit="response",
-                        ),
-                        f,
-                        indent=4,
-                    )
+        with open(f"{part}/config.json", "w") as f:
+            json.dump(
+                dict(
+                    technique=technique["technique"],
+                    name=technique["name"],
+                    unit="response",
+                ),
+                f,
+                indent=4,
+            )
+        os.rename(part, final)
+
+
+def _generate(
+    controller: GenerateController, start, output_dir: str, control: str = None
+) -> dict:
+    writer = _TechniqueWriter(output_dir, control=control)
+    try:
+        with Spinner("Uploading") as spinner:
+            job_id = start()["job_id"]
+            spinner.update(spinner.task_ids[-1], description="Parsing PDF")
+            result = _wait_for_threat_intel(controller, job_id, spinner, writer)
+    except BaseException:
+        # the failed job matters more than a technique that could not be written
+        with suppress(Exception):
+            writer.close()
+        raise
+    writer.close()
+
+    return _process_results(result, output_dir, job_id)
+
+
+def _process_results(result: dict, output_dir: str, job_id: str) -> dict:
+    if result["status"] == "COMPLETE":
         return dict(
             output_dir=output_dir,
             successfully_generated=[
@@ -77,18 +159,9 @@ def _process_results(result: dict, output_dir: str, job_id: str) -> dict:
 def generate_threat_intel(
     controller: GenerateController, threat_pdf: str, output_dir: str
 ):
-    with Spinner("Uploading") as spinner:
-        job_id = controller.upload_threat_intel(threat_pdf)["job_id"]
-        spinner.update(spinner.task_ids[-1], description="Parsing PDF")
-        while (result := controller.get_threat_intel(job_id)) and result[
-            "status"
-        ] == "RUNNING":
-            if result["step"] == "GENERATE":
-                spinner.update(
-                    spinner.task_ids[-1],
-                    description=f'Generating ({result["completed_tasks"]}/{result["num_tasks"]})',
-                )
-    return _process_results(result, output_dir, job_id)
+    return _generate(
+        controller, lambda: controller.upload_threat_intel(threat_pdf), output_dir
+    )
 
 
 @generate.command("from-advisory")
@@ -109,17 +182,11 @@ def generate_threat_intel(
 def generate_from_partner_advisory(
     controller: GenerateController, partner: Control, advisory_id: str, output_dir: str
 ):
-    with Spinner("Uploading") as spinner:
-        job_id = controller.generate_from_partner_advisory(
+    return _generate(
+        controller,
+        lambda: controller.generate_from_partner_advisory(
             partner=Control[partner], advisory_id=advisory_id
-        )["job_id"]
-        spinner.update(spinner.task_ids[-1], description="Parsing PDF")
-        while (result := controller.get_threat_intel(job_id)) and result[
-            "status"
-        ] == "RUNNING":
-            if result["step"] == "GENERATE":
-                spinner.update(
-                    spinner.task_ids[-1],
-                    description=f'Generating ({result["completed_tasks"]}/{result["num_tasks"]})',
-                )
-    return _process_results(result, output_dir, job_id)
+        ),
+        output_dir,
+        control=Control[partner].name,
+    )
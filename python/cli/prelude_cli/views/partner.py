@@ -1,6 +1,6 @@
 import click
 
-from prelude_cli.views.shared import Spinner, pretty_print
+from prelude_cli.views.shared import Spinner, Stream, pretty_print
 from prelude_sdk.controllers.partner_controller import PartnerController
 from prelude_sdk.models.codes import Control
 
@@ -90,10 +90,38 @@ def partner_block(controller, partner, test_id):
 )
 @click.option("--offset", default=0, help="API pagination offset", type=int)
 @click.option("--limit", default=100, help="API pagination limit", type=int)
+@click.option(
+    "--all",
+    "fetch_all",
+    help="page through every endpoint, --limit at a time",
+    is_flag=True,
+)
+@click.option(
+    "--prefetch", default=1, help="pages to request ahead with --all", type=int
+)
+@click.option(
+    "--stream",
+    help="write endpoints as newline-delimited JSON as pages arrive",
+    is_flag=True,
+)
 @click.pass_obj
 @pretty_print
-def partner_endpoints(controller, partner, platform, hostname, offset, limit):
+def partner_endpoints(
+    controller, partner, platform, hostname, offset, limit, fetch_all, prefetch, stream
+):
     """Get a list of endpoints from a partner"""
+    if fetch_all:
+        records = controller.iter_endpoints(
+            partner=Control[partner],
+            platform=platform,
+            hostname=hostname,
+            page_size=limit,
+            prefetch=prefetch,
+        )
+        if stream:
+            return Stream(records)
+        with Spinner(description="Fetching endpoints from partner"):
+            return list(records)
     with Spinner(description="Fetching endpoints from partner"):
         return controller.endpoints(
             partner=Control[partner],
@@ -178,10 +206,37 @@ def observed_detected(controller, test_id, hours):
 @click.option("-s", "--start", help="start date for advisories")
 @click.option("-o", "--offset", help="API pagination offset", type=int)
 @click.option("-l", "--limit", help="API pagination limit", type=int)
+@click.option(
+    "--all",
+    "fetch_all",
+    help="page through every advisory, --limit at a time",
+    is_flag=True,
+)
+@click.option(
+    "--prefetch", default=1, help="pages to request ahead with --all", type=int
+)
+@click.option(
+    "--stream",
+    help="write advisories as newline-delimited JSON as pages arrive",
+    is_flag=True,
+)
 @click.pass_obj
 @pretty_print
-def partner_advisories(controller, partner, start, offset, limit):
+def partner_advisories(
+    controller, partner, start, offset, limit, fetch_all, prefetch, stream
+):
     """Get advisories provided by partner"""
+    if fetch_all:
+        records = controller.iter_advisories(
+            partner=Control[partner],
+            start=start,
+            page_size=limit or 100,
+            prefetch=prefetch,
+        )
+        if stream:
+            return Stream(records)
+        with Spinner(description="Getting partner advisories"):
+            return list(records)
     with Spinner(description="Getting partner advisories"):
         return controller.list_advisories(
             partner=Control[partner], start=start, offset=offset, limit=limit
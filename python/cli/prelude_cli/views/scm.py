@@ -1,10 +1,14 @@
 import click
 import requests
-from time import sleep
 
-from prelude_cli.views.shared import Spinner, pretty_print
+from prelude_cli.views.shared import Spinner, Stream, pretty_print
+from prelude_sdk.controllers.columnar import (
+    EVALUATION_POLICIES,
+    arrow_schema,
+    write_parquet,
+)
 from prelude_sdk.controllers.export_controller import ExportController
-from prelude_sdk.controllers.jobs_controller import JobsController
+from prelude_sdk.controllers.job_waiter import JobWaiter
 from prelude_sdk.controllers.scm_controller import ScmController
 from prelude_sdk.models.codes import (
     Control,
@@ -28,14 +32,54 @@ def scm(ctx):
 )
 @click.option("--odata_filter", help="OData filter string", default=None)
 @click.option("--odata_orderby", help="OData orderby string", default=None)
+@click.option(
+    "--all",
+    "fetch_all",
+    help="page through every result, ignoring --limit",
+    is_flag=True,
+)
+@click.option("--page_size", default=1000, help="results per page with --all", type=int)
+@click.option(
+    "--stream",
+    help="write results as newline-delimited JSON as pages arrive",
+    is_flag=True,
+)
+@click.option(
+    "--parquet",
+    help="write results to this Parquet file (requires pyarrow)",
+    type=click.Path(dir_okay=False, writable=True),
+)
 @click.pass_obj
 @pretty_print
-def endpoints(controller, limit, odata_filter, odata_orderby):
+def endpoints(
+    controller,
+    limit,
+    odata_filter,
+    odata_orderby,
+    fetch_all,
+    page_size,
+    stream,
+    parquet,
+):
     """List endpoints with SCM data"""
+    if fetch_all:
+        records = controller.iter_endpoints(
+            filter=odata_filter, orderby=odata_orderby, page_size=page_size
+        )
+        if parquet:
+            with Spinner(description="Exporting endpoints"):
+                return write_parquet(records, parquet)
+        if stream:
+            return Stream(records)
+        with Spinner(description="Fetching endpoints from partner"):
+            return list(records)
     with Spinner(description="Fetching endpoints from partner"):
-        return controller.endpoints(
+        records = controller.endpoints(
             filter=odata_filter, orderby=odata_orderby, top=limit
         )
+        if parquet:
+            return write_parquet(records, parquet)
+    return Stream(records) if stream else records
 
 
 @scm.command("inboxes")
@@ -44,12 +88,37 @@ def endpoints(controller, limit, odata_filter, odata_orderby):
 )
 @click.option("--odata_filter", help="OData filter string", default=None)
 @click.option("--odata_orderby", help="OData orderby string", default=None)
+@click.option(
+    "--all",
+    "fetch_all",
+    help="page through every result, ignoring --limit",
+    is_flag=True,
+)
+@click.option("--page_size", default=1000, help="results per page with --all", type=int)
+@click.option(
+    "--stream",
+    help="write results as newline-delimited JSON as pages arrive",
+    is_flag=True,
+)
 @click.pass_obj
 @pretty_print
-def endpoints(controller, limit, odata_filter, odata_orderby):
+def inboxes(
+    controller, limit, odata_filter, odata_orderby, fetch_all, page_size, stream
+):
     """List inboxes with SCM data"""
+    if fetch_all:
+        records = controller.iter_inboxes(
+            filter=odata_filter, orderby=odata_orderby, page_size=page_size
+        )
+        if stream:
+            return Stream(records)
+        with Spinner(description="Fetching inboxes from partner"):
+            return list(records)
     with Spinner(description="Fetching inboxes from partner"):
-        return controller.inboxes(filter=odata_filter, orderby=odata_orderby, top=limit)
+        records = controller.inboxes(
+            filter=odata_filter, orderby=odata_orderby, top=limit
+        )
+    return Stream(records) if stream else records
 
 
 @scm.command("users")
@@ -58,12 +127,35 @@ def endpoints(controller, limit, odata_filter, odata_orderby):
 )
 @click.option("--odata_filter", help="OData filter string", default=None)
 @click.option("--odata_orderby", help="OData orderby string", default=None)
+@click.option(
+    "--all",
+    "fetch_all",
+    help="page through every result, ignoring --limit",
+    is_flag=True,
+)
+@click.option("--page_size", default=1000, help="results per page with --all", type=int)
+@click.option(
+    "--stream",
+    help="write results as newline-delimited JSON as pages arrive",
+    is_flag=True,
+)
 @click.pass_obj
 @pretty_print
-def endpoints(controller, limit, odata_filter, odata_orderby):
+def users(controller, limit, odata_filter, odata_orderby, fetch_all, page_size, stream):
     """List users with SCM data"""
+    if fetch_all:
+        records = controller.iter_users(
+            filter=odata_filter, orderby=odata_orderby, page_size=page_size
+        )
+        if stream:
+            return Stream(records)
+        with Spinner(description="Fetching users from partner"):
+            return list(records)
     with Spinner(description="Fetching users from partner"):
-        return controller.users(filter=odata_filter, orderby=odata_orderby, top=limit)
+        records = controller.users(
+            filter=odata_filter, orderby=odata_orderby, top=limit
+        )
+    return Stream(records) if stream else records
 
 
 @scm.command("technique-summary")
@@ -128,17 +220,33 @@ def evaluation_summary(
     type=str,
     default=None,
 )
+@click.option(
+    "--parquet",
+    help="write one row per evaluated policy to this Parquet file (requires pyarrow)",
+    type=click.Path(dir_okay=False, writable=True),
+)
 @click.pass_obj
 @pretty_print
-def evaluation(controller, partner, instance_id, odata_filter, techniques):
+def evaluation(controller, partner, instance_id, odata_filter, techniques, parquet):
     """Get policy evaluation for given partner"""
     with Spinner(description="Getting policy evaluation"):
-        return controller.evaluation(
+        result = controller.evaluation(
             partner=Control[partner],
             instance_id=instance_id,
             filter=odata_filter,
             techniques=techniques,
         )
+        if parquet:
+            return write_parquet(
+                (
+                    dict(evaluation=kind.removesuffix("_evaluation"), **policy)
+                    for kind, evaluation in result.items()
+                    for policy in (evaluation or dict()).get("policies", [])
+                ),
+                parquet,
+                schema=arrow_schema(EVALUATION_POLICIES),
+            )
+        return result
 
 
 @scm.command("sync")
@@ -158,10 +266,7 @@ def sync(controller, partner, instance_id):
         job_id = controller.update_evaluation(
             partner=Control[partner], instance_id=instance_id
         )["job_id"]
-        jobs = JobsController(account=controller.account)
-        while (result := jobs.job_status(job_id))["end_time"] is None:
-            sleep(3)
-        return result
+        return JobWaiter(account=controller.account).wait(job_id)
 
 
 @scm.command("export")
@@ -189,15 +294,13 @@ def export(controller, type, output_file, limit, odata_filter, odata_orderby):
     """Export SCM data"""
     with Spinner(description="Exporting SCM data"):
         export = ExportController(account=controller.account)
-        jobs = JobsController(account=controller.account)
         job_id = export.export_scm(
             export_type=SCMCategory[type],
             filter=odata_filter,
             orderby=odata_orderby,
             top=limit,
         )["job_id"]
-        while (result := jobs.job_status(job_id))["end_time"] is None:
-            sleep(3)
+        result = JobWaiter(account=controller.account).wait(job_id)
         if result["successful"]:
             data = requests.get(result["results"]["url"], timeout=10).content
             with open(output_file, "wb") as f:
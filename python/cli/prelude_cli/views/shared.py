@@ -1,31 +1,114 @@
+import csv
+import json
+import pickle
+import sys
+import tempfile
 from functools import wraps
+
+import click
 from rich import print_json
+from rich.console import Console
 from rich.progress import Progress, TextColumn, SpinnerColumn
+from rich.table import Table
+
+
+def output_format():
+    """The --output format chosen on the root command, if running under click"""
+    ctx = click.get_current_context(silent=True)
+    return ctx.meta.get("output", "pretty") if ctx else "pretty"
 
 
 def pretty_print(func):
     @wraps(func)
     def handler(*args, **kwargs):
+        output = output_format()
         try:
             res = func(*args, **kwargs)
+            if isinstance(res, Stream):
+                output = res.format or (output if output != "pretty" else "ndjson")
+                return res.write(format=output)
             msg = None
             if isinstance(res, tuple):
                 res, msg = res
             if not isinstance(res, list):
                 res = [res]
-            return print_json(data=dict(status="complete", results=res, message=msg))
+            if output == "pretty":
+                return print_json(
+                    data=dict(status="complete", results=res, message=msg)
+                )
+            return Stream(res, message=msg).write(format=output)
         except Exception as e:
-            return print_json(
-                data=dict(
-                    status="error",
-                    results=None,
-                    message=" ".join(str(arg) for arg in e.args),
+            message = " ".join(str(arg) for arg in e.args)
+            if output == "pretty":
+                return print_json(
+                    data=dict(status="error", results=None, message=message)
                 )
+            # other formats may be part written already, so their error stays off stdout
+            return _write_json(
+                dict(status="error", results=None, message=message),
+                out=sys.stdout if output == "json" else sys.stderr,
             )
 
     return handler
 
 
+class Stream:
+    """Records written to stdout while they arrive, instead of pretty printed
+
+    Formats are newline-delimited JSON, CSV, a compact JSON envelope or a table. A format
+    given here (a command's own --format or --stream) wins over the root --output one. CSV
+    and table output start once every record has arrived, so that their columns cover the
+    fields of every record.
+    """
+
+    def __init__(self, records, format=None, message=None):
+        self.records = records
+        self.format = format
+        self.message = message
+
+    def write(self, out=None, format=None):
+        out = out or sys.stdout
+        format = self.format or format or "ndjson"
+        if format == "csv":
+            with tempfile.TemporaryFile() as spool:
+                columns = dict()
+                for record in self.records:
+                    record = _flat(record)
+                    columns.update(dict.fromkeys(record))
+                    pickle.dump(record, spool)
+                if columns:
+                    spool.seek(0)
+                    writer = csv.DictWriter(out, fieldnames=list(columns))
+                    writer.writeheader()
+                    writer.writerows(_unspool(spool))
+        elif format == "json":
+            # the status goes last, so a failure part way through still closes a single envelope
+            out.write('{"results":[')
+            status, message = "complete", self.message
+            try:
+                for i, record in enumerate(self.records):
+                    if i:
+                        out.write(",")
+                    out.write(_dumps(record))
+            except Exception as e:
+                status, message = "error", " ".join(str(arg) for arg in e.args)
+            out.write(
+                '],"status":%s,"message":%s}\n' % (_dumps(status), _dumps(message))
+            )
+        elif format == "table":
+            records = [_flat(record) for record in self.records]
+            columns = list(dict.fromkeys(k for record in records for k in record))
+            table = Table(*columns)
+            for record in records:
+                table.add_row(*(_cell(record.get(c)) for c in columns))
+            Console(file=out).print(table)
+        else:
+            for record in self.records:
+                out.write(_dumps(record))
+                out.write("\n")
+        out.flush()
+
+
 class Spinner(Progress):
     def __init__(self, description="Loading"):
         super().__init__(
@@ -33,5 +116,102 @@ class Spinner(Progress):
             TextColumn("[green]{task.description}..."),
             transient=True,
             refresh_per_second=10,
+            disable=not sys.stdout.isatty(),
         )
         self.add_task(description)
+
+
+def print_trace(trace, out=None, width: int = 30, rows: int = 200):
+    """Draw the waterfall and per-route summary of a Trace of one command"""
+    console = Console(file=out or sys.stderr, highlight=False)
+    events = sorted(trace.events, key=lambda e: e.started)
+    if not events:
+        return console.print("[dim]No API requests were made[/dim]")
+
+    start = events[0].started
+    end = max(e.started + e.latency for e in events)
+    scale = width / max(end - start, 1e-6)
+    calls = [
+        f"sleep: {e.route}" if e.method == "SLEEP" else f"{e.method} {e.route}"
+        for e in events[:rows]
+    ]
+    pad = max(len(c) for c in calls)
+    for e, call in zip(events, calls):
+        offset = e.started - start
+        sleep = e.method == "SLEEP"
+        bar = " " * int(offset * scale) + ("·" if sleep else "█") * max(
+            1, int(e.latency * scale)
+        )
+        line = (
+            f"{offset:8.3f}s  {call:<{pad}}  {str(e.status or e.error or ''):>3}  "
+            f"{'' if sleep else _size(e.response_bytes):>7}  {e.latency:7.3f}s  |{bar:<{width}}|"
+        )
+        console.print(
+            f"[dim]{line}[/dim]" if sleep else line, soft_wrap=True, markup=sleep
+        )
+    if len(events) > rows:
+        console.print(f"[dim]... and {len(events) - rows} more[/dim]")
+
+    summary = Table(
+        "method", "route", "status", "count", "p50", "p95", "retries", "bytes"
+    )
+    for row in trace.summary():
+        summary.add_row(
+            row["method"],
+            row["route"],
+            str(row["status"]),
+            str(row["count"]),
+            f"{row['p50']:.3f}s",
+            f"{row['p95']:.3f}s",
+            str(row["retries"]),
+            _size(row["request_bytes"] + row["response_bytes"]),
+        )
+    console.print(summary)
+    made = [e for e in events if e.method != "SLEEP"]
+    transferred = sum((e.request_bytes or 0) + (e.response_bytes or 0) for e in made)
+    slept = ", ".join(f"{s:.2f}s {reason}" for reason, s in trace.sleeps.items())
+    console.print(
+        f"{len(made)} requests in {end - start:.2f}s, {_size(transferred)} transferred"
+        + (f", slept {slept}" if slept else "")
+    )
+
+
+def _size(n):
+    if n is None:
+        return ""
+    for unit in ("B", "KB", "MB"):
+        if n < 1024:
+            return f"{n:.0f}{unit}" if unit == "B" else f"{n:.1f}{unit}"
+        n /= 1024
+    return f"{n:.1f}GB"
+
+
+def _dumps(value):
+    return json.dumps(value, default=str, separators=(",", ":"))
+
+
+def _write_json(data, out=None):
+    out = out or sys.stdout
+    out.write(_dumps(data))
+    out.write("\n")
+    out.flush()
+
+
+def _flat(record):
+    if not isinstance(record, dict):
+        return dict(value=record)
+    return {
+        k: _dumps(v) if isinstance(v, (dict, list)) else v for k, v in record.items()
+    }
+
+
+def _unspool(spool):
+    while True:
+        try:
+            yield pickle.load(spool)
+        except EOFError:
+            return
+
+
+def _cell(value):
+    return "" if value is None else str(value)
@@ -0,0 +1,79 @@
+import click
+
+from prelude_cli.views.shared import Spinner, pretty_print
+from prelude_sdk.controllers.catalog_controller import CatalogController
+
+
+@click.group(invoke_without_command=True)
+@click.option(
+    "--db",
+    help="path of the local catalog database (default: ~/.prelude/catalog-<profile>.db)",
+    default=None,
+    type=click.Path(dir_okay=False, writable=True),
+)
+@click.option(
+    "-k",
+    "--kind",
+    help="only sync these kinds",
+    multiple=True,
+    type=click.Choice(list(CatalogController.KINDS)),
+)
+@click.pass_context
+def sync(ctx, db, kind):
+    """Mirror the catalog to a local database, or query the mirror"""
+    ctx.obj = CatalogController(account=ctx.obj, path=db)
+    ctx.call_on_close(ctx.obj.close)
+    if ctx.invoked_subcommand is None:
+        _sync(ctx.obj, kind)
+
+
+@pretty_print
+def _sync(controller, kinds):
+    with Spinner(description="Syncing catalog"):
+        return dict(path=controller.path, **controller.sync(kinds=kinds or None))
+
+
+@sync.command("tests")
+@click.option("-t", "--technique", help="only tests of this technique", type=str)
+@click.option("--threat", help="only tests of this threat ID", type=str)
+@click.pass_obj
+@pretty_print
+def tests(controller, technique, threat):
+    """Query mirrored tests"""
+    return controller.tests(technique=technique, threat_id=threat)
+
+
+@sync.command("threats")
+@click.option("-s", "--source", help="only threats from this source", type=str)
+@click.option("--test", help="only threats covering this test ID", type=str)
+@click.pass_obj
+@pretty_print
+def threats(controller, source, test):
+    """Query mirrored threats"""
+    return controller.threats(source=source, test_id=test)
+
+
+@sync.command("detections")
+@click.option("--test", help="only detections of this test ID", type=str)
+@click.pass_obj
+@pretty_print
+def detections(controller, test):
+    """Query mirrored detections"""
+    return controller.detections(test_id=test)
+
+
+@sync.command("threat-hunts")
+@click.option("--test", help="only threat hunts of this test ID", type=str)
+@click.pass_obj
+@pretty_print
+def threat_hunts(controller, test):
+    """Query mirrored threat hunts"""
+    return controller.threat_hunts(test_id=test)
+
+
+@sync.command("status")
+@click.pass_obj
+@pretty_print
+def status(controller):
+    """Show when each kind was last synced"""
+    return dict(path=controller.path, synced=controller.last_synced())
@@ -0,0 +1,25 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+from prelude_sdk.models import account as keychain
+
+# the local stub of the API lives with the SDK tests
+sys.path.insert(0, str(Path(__file__).parents[2] / "sdk" / "tests"))
+from testutils import StubAPI  # noqa: E402
+
+
+@pytest.fixture
+def stub_api():
+    api = StubAPI().start()
+    yield api
+    api.stop()
+
+
+@pytest.fixture
+def stub_account(stub_api, tmp_path):
+    """A keychain account pointed at the local stub API"""
+    account = keychain.Account(keychain_location=str(tmp_path / "keychain.ini"))
+    account.configure("stub", "stub-token", "stub@example.com", hq=stub_api.url)
+    return account
@@ -0,0 +1,45 @@
+import json
+
+from click.testing import CliRunner
+
+from prelude_cli.views.detect import detect
+
+
+BODY = b"package main // " + b"x" * 100
+
+
+def attachment(request):
+    if request.headers.get("If-None-Match") == '"v1"':
+        return 304, b""
+    return 200, BODY, {"ETag": '"v1"'}
+
+
+def clone(account):
+    res = CliRunner().invoke(detect, ["clone"], obj=account, catch_exceptions=False)
+    return json.loads(res.stdout)["results"][0]
+
+
+class TestClone:
+
+    def test_only_changed_files_download_again(
+        self, stub_api, stub_account, tmp_path, monkeypatch
+    ):
+        monkeypatch.chdir(tmp_path)
+        stub_api.routes["GET /detect/tests"] = lambda _: (200, [dict(id="t1")])
+        stub_api.routes["GET /detect/tests/t1"] = lambda _: (
+            200,
+            dict(id="t1", attachments=["t1.go"]),
+        )
+        stub_api.routes["GET /detect/tests/t1/t1.go"] = attachment
+
+        assert clone(stub_account) == dict(downloaded=1, unchanged=0, failed=[])
+        assert (tmp_path / "t1" / "t1.go").read_bytes() == BODY
+
+        assert clone(stub_account) == dict(downloaded=0, unchanged=1, failed=[])
+        assert stub_api.hits[-1].headers["If-None-Match"] == '"v1"'
+
+        # same size, different content: the hash no longer matches the manifest
+        (tmp_path / "t1" / "t1.go").write_bytes(BODY.upper())
+        assert clone(stub_account) == dict(downloaded=1, unchanged=0, failed=[])
+        assert "If-None-Match" not in stub_api.hits[-1].headers
+        assert (tmp_path / "t1" / "t1.go").read_bytes() == BODY
@@ -0,0 +1,140 @@
+import json
+
+import pytest
+from click.testing import CliRunner
+
+from prelude_cli.views.build import THREAT_JOURNAL, _load_query, build
+
+
+def technique(directory, name, control="CROWDSTRIKE"):
+    path = directory / name
+    path.mkdir()
+    (path / "config.json").write_text(
+        json.dumps(dict(name=name, unit="response", technique="T1059"))
+    )
+    (path / "test.go").write_text("package main")
+    (path / "sigma_0.yaml").write_text("title: rule")
+    query = dict(name=f"{name}-hunt", query="#repo=base_sensor")
+    if control:
+        query["control"] = control
+    (path / "query_0.json").write_text(json.dumps(query))
+
+
+def created(prefix):
+    def handler(request):
+        body = json.loads(request.body or b"{}")
+        return 200, dict(id=f"{prefix}-{body.get('name', body.get('test_id'))}")
+
+    return handler
+
+
+@pytest.fixture
+def api(stub_api):
+    uploads = dict()
+
+    def upload(request):
+        uploads[request.path] = uploads.get(request.path, 0) + 1
+        # the first upload of b's test fails
+        if request.path.endswith("test-b.go") and uploads[request.path] == 1:
+            return 500, b"upload failed"
+        return 200, dict(id=request.path.rsplit("/", 1)[-1])
+
+    stub_api.routes["POST /build/tests"] = created("test")
+    stub_api.routes["POST /build/detections"] = created("detection")
+    stub_api.routes["POST /build/threat_hunts"] = created("hunt")
+    stub_api.routes["POST /build/threats"] = created("threat")
+    for name in "ab":
+        stub_api.routes[f"POST /build/tests/test-{name}/test-{name}.go"] = upload
+        for path in (
+            f"/build/tests/test-{name}",
+            f"/build/detections/detection-test-{name}",
+            f"/build/threat_hunts/hunt-{name}-hunt",
+        ):
+            stub_api.routes[f"DELETE {path}"] = lambda _: (200, dict())
+    stub_api.routes["DELETE /build/threats/threat-apt"] = lambda _: (200, dict())
+    return stub_api
+
+
+def create_threat(account, directory, *args):
+    res = CliRunner().invoke(
+        build,
+        ["create-threat", "apt", "-p", "2024-01-01", "-d", str(directory), *args],
+        obj=account,
+        catch_exceptions=False,
+    )
+    return json.loads(res.stdout)
+
+
+class TestCreateThreatFromDirectory:
+
+    def test_resume_after_partial_failure(self, api, stub_account, tmp_path):
+        technique(tmp_path, "a")
+        technique(tmp_path, "b")
+
+        first = create_threat(stub_account, tmp_path)
+        assert first["results"][0]["failed"] == [
+            dict(step="b/test.go", reason="upload failed")
+        ]
+        assert first["results"][0]["threat"] is None
+        assert (tmp_path / THREAT_JOURNAL).is_file()
+
+        second = create_threat(stub_account, tmp_path)
+        result = second["results"][0]
+        assert result["failed"] == []
+        assert result["threat"] == dict(id="threat-apt")
+        assert len(result["test_uploads"]) == 2
+        assert len(result["created_threat_hunt_queries"]) == 2
+        # nothing that succeeded the first time is created again
+        assert api.count("POST", "/build/tests") == 2
+        assert api.count("POST", "/build/detections") == 2
+        assert api.count("POST", "/build/threat_hunts") == 2
+        assert api.count("POST", "/build/tests/test-a/test-a.go") == 1
+        assert api.count("POST", "/build/tests/test-b/test-b.go") == 2
+        assert api.count("POST", "/build/threats") == 1
+        threat = json.loads(
+            next(h.body for h in api.hits if h.path == "/build/threats")
+        )
+        assert sorted(threat["tests"].split(",")) == ["test-a", "test-b"]
+
+    def test_rollback_deletes_what_was_created(self, api, stub_account, tmp_path):
+        technique(tmp_path, "a")
+        technique(tmp_path, "b")
+        create_threat(stub_account, tmp_path)
+        create_threat(stub_account, tmp_path)
+
+        rolled_back = create_threat(stub_account, tmp_path, "--rollback")
+
+        assert rolled_back["results"] == [dict(failed=[])]
+        assert rolled_back["message"] == "Rolled back threat"
+        deleted = sorted(h.path for h in api.hits if h.method == "DELETE")
+        assert deleted == sorted(
+            [
+                "/build/threats/threat-apt",
+                "/build/tests/test-a",
+                "/build/tests/test-b",
+                "/build/detections/detection-test-a",
+                "/build/detections/detection-test-b",
+                "/build/threat_hunts/hunt-a-hunt",
+                "/build/threat_hunts/hunt-b-hunt",
+            ]
+        )
+        assert not (tmp_path / THREAT_JOURNAL).exists()
+
+    def test_query_without_control_fails_its_step(self, api, stub_account, tmp_path):
+        technique(tmp_path, "a", control=None)
+
+        result = create_threat(stub_account, tmp_path)["results"][0]
+
+        assert [f["step"] for f in result["failed"]] == ["a/query_0.json"]
+        assert '"control"' in result["failed"][0]["reason"]
+        assert api.count("POST", "/build/threat_hunts") == 0
+
+
+def test_load_query_requires_a_known_control(tmp_path):
+    path = tmp_path / "query_0.json"
+    path.write_text(json.dumps(dict(name="n", query="q", control="DEFENDER")))
+    assert _load_query(path, "t1")["control"].name == "DEFENDER"
+
+    path.write_text(json.dumps(dict(name="n", query="q", control="NOPE")))
+    with pytest.raises(ValueError, match="control"):
+        _load_query(path, "t1")
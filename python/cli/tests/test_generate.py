@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+from prelude_cli.views.build import _load_query
+from prelude_cli.views.generate import _TechniqueWriter
+
+
+def job_output(*techniques, status="SUCCEEDED"):
+    return dict(
+        output=[
+            dict(
+                technique=technique,
+                name=f"{technique} test",
+                status=status,
+                ai_generated=dict(
+                    go_code="package main",
+                    sigma_rules=["title: one", "title: two"],
+                    threat_hunt_queries=[
+                        dict(name="hunt", query="#repo=base_sensor"),
+                        dict(name="mde", query="DeviceEvents", control="DEFENDER"),
+                    ],
+                ),
+            )
+            for technique in techniques
+        ]
+    )
+
+
+class TestTechniqueWriter:
+
+    def test_written_files_load_back(self, tmp_path):
+        writer = _TechniqueWriter(str(tmp_path), control="CROWDSTRIKE")
+        writer.add(job_output("T1059.001"))
+        writer.add(job_output("T1059.001", "T1003"))
+        writer.close()
+
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["T1003", "T1059_001"]
+        technique = tmp_path / "T1059_001"
+        assert sorted(p.name for p in technique.iterdir()) == [
+            "config.json",
+            "query_0.json",
+            "query_1.json",
+            "sigma_0.yaml",
+            "sigma_1.yaml",
+            "test.go",
+        ]
+        assert json.loads((technique / "config.json").read_text()) == dict(
+            technique="T1059.001", name="T1059.001 test", unit="response"
+        )
+        queries = [_load_query(technique / f"query_{i}.json", "t1") for i in range(2)]
+        assert [(q["control"].name, q["name"], q["test_id"]) for q in queries] == [
+            ("CROWDSTRIKE", "hunt", "t1"),
+            ("DEFENDER", "mde", "t1"),
+        ]
+
+    def test_skips_failed_techniques_and_leftover_parts(self, tmp_path):
+        (tmp_path / ".T1003.part").mkdir()
+        (tmp_path / ".T1003.part" / "stale.txt").write_text("old")
+        writer = _TechniqueWriter(str(tmp_path))
+        writer.add(job_output("T1059", status="FAILED"))
+        writer.add(job_output("T1003"))
+        writer.close()
+
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["T1003"]
+        assert not (tmp_path / "T1003" / "stale.txt").exists()
+        # without a control from the job or the command, the query cannot be loaded
+        with pytest.raises(ValueError, match="control"):
+            _load_query(tmp_path / "T1003" / "query_0.json", "t1")
@@ -0,0 +1,82 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+
+# wall-clock budgets flake on slow or shared runners, so the timing check is opt-in
+IMPORT_BUDGET_MS = os.getenv("PRELUDE_IMPORT_BUDGET_MS")
+HEAVY_MODULES = ["asyncio", "dateutil", "prelude_sdk", "requests", "rich", "yaml"]
+
+
+def import_times():
+    """Cumulative import time (ms) of each module imported by `prelude --help`"""
+    res = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            "from prelude_cli.cli import cli; cli()",
+            "--help",
+        ],
+        capture_output=True,
+        text=True,
+    )
+    assert res.returncode == 0, res.stderr
+    modules = dict()
+    for line in res.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit():
+                modules[name.strip()] = int(cumulative) / 1000
+    return modules
+
+
+def loaded_modules(*args, run=True):
+    """Every module loaded once the CLI has run with args, or only been imported"""
+    script = (
+        "import sys\n"
+        "from prelude_cli.cli import cli\n"
+        "try:\n"
+        f"    {'cli()' if run else 'pass'}\n"
+        "finally:\n"
+        "    print(*sys.modules, sep='\\n', file=sys.stderr)\n"
+    )
+    res = subprocess.run(
+        [sys.executable, "-c", script, *args], capture_output=True, text=True
+    )
+    assert res.returncode == 0, res.stderr
+    return set(res.stderr.splitlines())
+
+
+class TestImportTime:
+
+    def test_import_skips_heavy_imports(self):
+        modules = loaded_modules(run=False)
+        assert not [m for m in HEAVY_MODULES if m in modules], sorted(modules)
+        assert not [m for m in modules if m.startswith("prelude_cli.views")]
+
+    def test_help_skips_heavy_imports(self):
+        modules = loaded_modules("--help")
+        assert not [m for m in HEAVY_MODULES if m in modules], sorted(modules)
+
+    @pytest.mark.skipif(
+        not IMPORT_BUDGET_MS, reason="set PRELUDE_IMPORT_BUDGET_MS to check import time"
+    )
+    def test_help_within_budget(self):
+        modules = import_times()
+        assert modules["prelude_cli.cli"] < int(IMPORT_BUDGET_MS), modules[
+            "prelude_cli.cli"
+        ]
+
+    @pytest.mark.parametrize("command", ["jobs", "scm", "sync"])
+    def test_subcommand_loads_only_its_view(self, command):
+        modules = loaded_modules(command, "--help")
+        assert f"prelude_cli.views.{command}" in modules
+        loaded = [m for m in modules if m.startswith("prelude_cli.views.")]
+        assert set(loaded) <= {
+            f"prelude_cli.views.{command}",
+            "prelude_cli.views.shared",
+        }, loaded
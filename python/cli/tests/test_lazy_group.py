@@ -0,0 +1,13 @@
+import importlib
+
+import pytest
+
+from prelude_cli.cli import cli
+
+
+@pytest.mark.parametrize("name", sorted(cli.lazy_commands))
+def test_lazy_help_matches_command(name):
+    module, short_help = cli.lazy_commands[name]
+    command = getattr(importlib.import_module(module), name)
+    assert command.name == name
+    assert short_help == command.get_short_help_str(limit=1000)
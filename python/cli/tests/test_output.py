@@ -0,0 +1,101 @@
+import json
+
+import click
+from click.testing import CliRunner
+
+from prelude_cli.views.shared import Stream, pretty_print
+
+
+RECORDS = [dict(id="a", n=1), dict(id="b", n=2)]
+MIXED = [dict(id="a"), dict(id="b", n=2), dict(id="c", tags=["x"])]
+
+
+@pretty_print
+def emit(format, fail_after, mixed=False):
+    def records():
+        for i, record in enumerate(MIXED if mixed else RECORDS):
+            if i == fail_after:
+                raise Exception("connection lost")
+            yield record
+
+    return Stream(records(), format=format)
+
+
+@click.command()
+@click.option("-o", "--output", default="pretty")
+@click.option("--format", default=None)
+@click.option("--fail-after", default=None, type=int)
+@click.option("--mixed", is_flag=True)
+def command(output, format, fail_after, mixed):
+    click.get_current_context().meta["output"] = output
+    emit(format, fail_after, mixed)
+
+
+def invoke(*args):
+    return CliRunner().invoke(command, args, catch_exceptions=False)
+
+
+def run(*args):
+    return invoke(*args).stdout
+
+
+class TestStreamFormat:
+
+    def test_defaults_to_ndjson(self):
+        assert [json.loads(line) for line in run().splitlines()] == RECORDS
+
+    def test_global_output_applies_without_command_format(self):
+        assert run("-o", "csv").splitlines() == ["id,n", "a,1", "b,2"]
+
+    def test_command_format_wins_over_global_output(self):
+        assert run("-o", "json", "--format", "csv").splitlines() == [
+            "id,n",
+            "a,1",
+            "b,2",
+        ]
+
+
+class TestJsonEnvelope:
+
+    def test_complete(self):
+        assert json.loads(run("-o", "json")) == dict(
+            status="complete", results=RECORDS, message=None
+        )
+
+    def test_failure_mid_stream_closes_one_envelope(self):
+        output = run("-o", "json", "--fail-after", "1")
+        assert json.loads(output) == dict(
+            status="error", results=RECORDS[:1], message="connection lost"
+        )
+
+
+class TestHeterogeneousRecords:
+
+    def test_csv_header_covers_every_record(self):
+        assert run("-o", "csv", "--mixed").splitlines() == [
+            "id,n,tags",
+            "a,,",
+            "b,2,",
+            'c,,"[""x""]"',
+        ]
+
+    def test_table_columns_cover_every_record(self):
+        header, *_ = [
+            line for line in run("-o", "table", "--mixed").splitlines() if "id" in line
+        ]
+        assert [c.strip() for c in header.strip("┃ ").split("┃")] == ["id", "n", "tags"]
+
+
+class TestFailureMidStream:
+
+    def test_csv_writes_nothing_to_stdout(self):
+        res = invoke("-o", "csv", "--fail-after", "1")
+        assert res.stdout == ""
+        assert json.loads(res.stderr)["message"] == "connection lost"
+
+    def test_ndjson_keeps_stdout_to_records(self):
+        res = invoke("--fail-after", "1")
+        assert [json.loads(line) for line in res.stdout.splitlines()] == RECORDS[:1]
+        assert json.loads(res.stderr) == dict(
+            status="error", results=None, message="connection lost"
+        )
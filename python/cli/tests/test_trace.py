@@ -0,0 +1,48 @@
+import json
+
+import pytest
+from click.testing import CliRunner
+
+from prelude_cli.cli import cli
+from prelude_sdk.models import account as keychain
+
+
+@pytest.fixture
+def keychain_at(stub_account, monkeypatch):
+    """Point the root command's Account at the stub account's keychain"""
+
+    class Account(keychain.Account):
+        def __init__(self, profile="default", **kwargs):
+            super().__init__(
+                profile=profile, keychain_location=stub_account.keychain_location
+            )
+
+    monkeypatch.setattr(keychain, "Account", Account)
+
+
+def test_trace_requests(stub_api, keychain_at):
+    stub_api.routes["GET /jobs/statuses"] = lambda _: (
+        200,
+        dict(SCM_SYNC=[dict(id="j1")]),
+    )
+
+    res = CliRunner().invoke(
+        cli,
+        ["-o", "json", "--trace-requests", "jobs", "background-jobs"],
+        catch_exceptions=False,
+    )
+
+    assert json.loads(res.stdout)["results"] == [dict(SCM_SYNC=[dict(id="j1")])]
+    lines = res.stderr.splitlines()
+    waterfall = [line for line in lines if "GET /jobs/statuses" in line]
+    assert len(waterfall) == 1
+    assert " 200 " in waterfall[0] and "|█" in waterfall[0]
+    assert any("/jobs/statuses" in line and "200" in line for line in lines[1:])
+    assert lines[-1].startswith("1 requests in ")
+
+
+def test_trace_without_requests(stub_api, keychain_at):
+    res = CliRunner().invoke(
+        cli, ["--trace-requests", "detect", "--help"], catch_exceptions=False
+    )
+    assert "No API requests were made" in res.stderr
@@ -0,0 +1,129 @@
+import asyncio
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
+
+from prelude_sdk.controllers.build_controller import BuildController
+from prelude_sdk.controllers.call_context import propagate
+from prelude_sdk.controllers.detect_controller import DetectController
+from prelude_sdk.controllers.export_controller import ExportController
+from prelude_sdk.controllers.generate_controller import GenerateController
+from prelude_sdk.controllers.http_controller import PRELUDE_POOL_SIZE
+from prelude_sdk.controllers.iam_controller import IAMController
+from prelude_sdk.controllers.jobs_controller import JobsController
+from prelude_sdk.controllers.partner_controller import PartnerController
+from prelude_sdk.controllers.probe_controller import ProbeController
+from prelude_sdk.controllers.scm_controller import ScmController
+
+_EXHAUSTED = object()
+
+
+class AsyncController(object):
+    """Awaitable mirror of a controller
+
+    Every public method of `controller` becomes a coroutine with the same signature. Calls run on a
+    bounded worker pool over the account's shared session, so many of them can be in flight from a
+    single event loop. Generator methods, and iter_* methods that return one, become async
+    generators whose items are each pulled on the pool, so the event loop never blocks on them.
+    """
+
+    controller = None
+
+    def __init__(self, account, max_workers: int = None):
+        self.account = account
+        self._controller = self.controller(account)
+        max_workers = (
+            max_workers or getattr(account, "pool_size", None) or PRELUDE_POOL_SIZE
+        )
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._controller._session.ensure_pool(max_workers)
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for name, method in vars(cls.controller).items():
+            if callable(method) and not name.startswith("_"):
+                if name.startswith("iter_") or inspect.isgeneratorfunction(
+                    inspect.unwrap(method)
+                ):
+                    setattr(cls, name, cls._async_generator(name, method))
+                else:
+                    setattr(cls, name, cls._coroutine(name, method))
+
+    @staticmethod
+    def _coroutine(name, method):
+        @wraps(method)
+        async def handler(self, *args, **kwargs):
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor,
+                propagate(partial(getattr(self._controller, name), *args, **kwargs)),
+            )
+
+        return handler
+
+    @staticmethod
+    def _async_generator(name, method):
+        @wraps(method)
+        async def handler(self, *args, **kwargs):
+            loop = asyncio.get_running_loop()
+            items = await loop.run_in_executor(
+                self._executor,
+                propagate(partial(getattr(self._controller, name), *args, **kwargs)),
+            )
+            step = propagate(next)
+            try:
+                while (
+                    item := await loop.run_in_executor(
+                        self._executor, step, items, _EXHAUSTED
+                    )
+                ) is not _EXHAUSTED:
+                    yield item
+            finally:
+                if close := getattr(items, "close", None):
+                    await loop.run_in_executor(self._executor, close)
+
+        return handler
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *_):
+        self.close()
+
+
+class AsyncBuildController(AsyncController):
+    controller = BuildController
+
+
+class AsyncDetectController(AsyncController):
+    controller = DetectController
+
+
+class AsyncExportController(AsyncController):
+    controller = ExportController
+
+
+class AsyncGenerateController(AsyncController):
+    controller = GenerateController
+
+
+class AsyncIAMController(AsyncController):
+    controller = IAMController
+
+
+class AsyncJobsController(AsyncController):
+    controller = JobsController
+
+
+class AsyncPartnerController(AsyncController):
+    controller = PartnerController
+
+
+class AsyncProbeController(AsyncController):
+    controller = ProbeController
+
+
+class AsyncScmController(AsyncController):
+    controller = ScmController
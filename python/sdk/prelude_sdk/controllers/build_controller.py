@@ -1,6 +1,7 @@
 import urllib
 
 from prelude_sdk.controllers.http_controller import HttpController
+from prelude_sdk.controllers.job_waiter import JobWaiter
 from prelude_sdk.models.account import verify_credentials
 from prelude_sdk.models.codes import Control, EDRResponse
 
@@ -8,8 +9,7 @@ from prelude_sdk.models.codes import Control, EDRResponse
 class BuildController(HttpController):
 
     def __init__(self, account):
-        super().__init__()
-        self.account = account
+        super().__init__(account)
 
     @verify_credentials
     def clone_test(self, source_test_id):
@@ -142,6 +142,49 @@ class BuildController(HttpController):
             return res.json()
         raise Exception(res.text)
 
+    def wait_for_compiles(self, job_ids, timeout: float = None):
+        """Wait for many compile jobs at once, yielding (job_id, status, error) as each one finishes"""
+        yield from JobWaiter(self.account, timeout=timeout).poll_many(
+            self.get_compile_status,
+            lambda result: result["status"] != "RUNNING",
+            job_ids,
+        )
+
+    def upload_tests(self, tests, max_workers: int = None):
+        """Upload the files of many tests concurrently, yielding each test with its compile job ID (or error) as it completes
+
+        Files of one test are uploaded in order and only the last one triggers a compile.
+        Example: tests=[dict(test_id='<uuid>', files=[dict(filename='<uuid>.go', data=b'...')])]
+        """
+
+        def upload(test):
+            files = test["files"]
+            return [
+                self.upload(
+                    test_id=test["test_id"],
+                    filename=f["filename"],
+                    data=f["data"],
+                    skip_compile=i != len(files) - 1,
+                )
+                for i, f in enumerate(files)
+            ]
+
+        results = self._fan_out(upload, tests, max_workers=max_workers)
+        for test, uploads, error in results:
+            yield dict(
+                test_id=test["test_id"],
+                uploads=uploads or [],
+                compile_job_id=next(
+                    (
+                        u["compile_job_id"]
+                        for u in uploads or []
+                        if u.get("compile_job_id")
+                    ),
+                    None,
+                ),
+                error=" ".join(str(arg) for arg in error.args) if error else None,
+            )
+
     @verify_credentials
     def create_threat(
         self, name, published, threat_id=None, source_id=None, source=None, tests=None
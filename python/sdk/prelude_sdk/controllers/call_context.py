@@ -0,0 +1,84 @@
+import contextvars
+import json
+import os
+import time
+from contextlib import contextmanager
+
+
+PRELUDE_CONNECT_TIMEOUT = float(os.getenv("PRELUDE_CONNECT_TIMEOUT", 3.05))
+
+# read timeouts configured by "METHOD route" or route; each overrides the one the call passes
+ROUTE_TIMEOUTS = json.loads(os.getenv("PRELUDE_TIMEOUTS", "{}"))
+
+_current = contextvars.ContextVar("prelude_call_context", default=None)
+
+
+class CallContext(object):
+    """Deadline and timeouts applied to every API call made while it is current"""
+
+    def __init__(
+        self, deadline: float = None, connect: float = None, timeouts: dict = None
+    ):
+        self.deadline = deadline
+        self.connect = connect or PRELUDE_CONNECT_TIMEOUT
+        self.timeouts = ROUTE_TIMEOUTS | (timeouts or dict())
+
+    def remaining(self):
+        """Seconds left before the deadline, None if there is none"""
+        return None if self.deadline is None else self.deadline - time.monotonic()
+
+    def timeout(self, method: str, route: str, default=None):
+        """(connect, read) timeout for one attempt at a call, shrunk to fit the deadline
+
+        Raises TimeoutError once the deadline has passed
+        """
+        configured = self.timeouts.get(f"{method} {route}", self.timeouts.get(route))
+        if configured is None:
+            configured = default
+        if isinstance(configured, (tuple, list)):
+            connect, read = configured
+        else:
+            connect, read = self.connect, configured
+
+        remaining = self.remaining()
+        if remaining is None:
+            return connect, read
+        if remaining <= 0:
+            raise TimeoutError(f"Deadline exceeded before {method} {route}")
+        return (
+            min(connect or remaining, remaining),
+            min(read or remaining, remaining),
+        )
+
+
+def current_context():
+    """The call context in effect, or the defaults"""
+    return _current.get() or CallContext()
+
+
+@contextmanager
+def call_context(deadline: float = None, connect: float = None, timeouts: dict = None):
+    """Bound every API call made inside the block to finish within `deadline` seconds
+
+    `timeouts` maps "METHOD route" or route templates (e.g. "GET /detect/tests/{id}") to a
+    read timeout or a (connect, read) pair. Nested contexts keep the nearest deadline.
+    """
+    outer = _current.get()
+    if deadline is not None:
+        deadline = time.monotonic() + deadline
+    if outer:
+        if outer.deadline is not None:
+            deadline = min(d for d in (deadline, outer.deadline) if d is not None)
+        connect = connect or outer.connect
+        timeouts = outer.timeouts | (timeouts or dict())
+    token = _current.set(CallContext(deadline, connect, timeouts))
+    try:
+        yield _current.get()
+    finally:
+        _current.reset(token)
+
+
+def propagate(func):
+    """Wrap func so it runs under the caller's call context, e.g. on a pool thread"""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.copy().run(func, *args, **kwargs)
@@ -0,0 +1,171 @@
+import hashlib
+import json
+import os
+import sqlite3
+from datetime import datetime, timezone
+from pathlib import Path
+
+from prelude_sdk.controllers.detect_controller import DetectController
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tests (id TEXT PRIMARY KEY, technique TEXT, digest TEXT, data TEXT);
+CREATE INDEX IF NOT EXISTS tests_technique ON tests (technique);
+CREATE TABLE IF NOT EXISTS threats (id TEXT PRIMARY KEY, source TEXT, digest TEXT, data TEXT);
+CREATE INDEX IF NOT EXISTS threats_source ON threats (source);
+CREATE TABLE IF NOT EXISTS threat_tests (threat_id TEXT, test_id TEXT, PRIMARY KEY (threat_id, test_id));
+CREATE INDEX IF NOT EXISTS threat_tests_test ON threat_tests (test_id);
+CREATE TABLE IF NOT EXISTS detections (id TEXT PRIMARY KEY, test_id TEXT, digest TEXT, data TEXT);
+CREATE INDEX IF NOT EXISTS detections_test ON detections (test_id);
+CREATE TABLE IF NOT EXISTS threat_hunts (id TEXT PRIMARY KEY, test_id TEXT, digest TEXT, data TEXT);
+CREATE INDEX IF NOT EXISTS threat_hunts_test ON threat_hunts (test_id);
+CREATE TABLE IF NOT EXISTS syncs (kind TEXT PRIMARY KEY, synced TEXT);
+"""
+
+
+class CatalogController(DetectController):
+    """Local SQLite mirror of the account's tests, threats, detections and threat hunts
+
+    sync() lists each kind once and only fetches the records that are new or whose listing
+    changed since the last sync, then drops the ones that disappeared. The API has no
+    updated-since filter, so each sync still lists every kind in full; only the per-record
+    fetches are incremental. Queries are answered from indexed tables without touching the API.
+    """
+
+    # kind: (list method, get method, get argument, indexed column, record field)
+    KINDS = dict(
+        tests=("list_tests", "get_test", "test_id", "technique", "technique"),
+        threats=("list_threats", "get_threat", "threat_id", "source", "source"),
+        detections=(
+            "list_detections",
+            "get_detection",
+            "detection_id",
+            "test_id",
+            "test",
+        ),
+        threat_hunts=(
+            "list_threat_hunts",
+            "get_threat_hunt",
+            "threat_hunt_id",
+            "test_id",
+            "test_id",
+        ),
+    )
+
+    def __init__(self, account, path: str = None):
+        super().__init__(account)
+        self.path = path or os.path.join(
+            Path.home(), ".prelude", f"catalog-{account.profile}.db"
+        )
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.path)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    def sync(self, kinds=None, max_workers: int = None):
+        """Bring the mirror up to date, returning how many records of each kind were added, updated and removed"""
+        summary = dict()
+        for kind in kinds or self.KINDS:
+            try:
+                summary[kind] = self._sync(kind, max_workers)
+            except Exception as e:
+                summary[kind] = dict(error=" ".join(str(arg) for arg in e.args))
+        return summary
+
+    def tests(self, technique: str = None, threat_id: str = None):
+        """Mirrored tests, optionally only those of a technique or threat"""
+        if threat_id:
+            return self._query(
+                "SELECT tests.data FROM tests JOIN threat_tests ON tests.id = threat_tests.test_id "
+                "WHERE threat_tests.threat_id = ?",
+                threat_id,
+            )
+        return self._select("tests", "technique", technique)
+
+    def threats(self, source: str = None, test_id: str = None):
+        """Mirrored threats, optionally only those from a source or covering a test"""
+        if test_id:
+            return self._query(
+                "SELECT threats.data FROM threats JOIN threat_tests ON threats.id = threat_tests.threat_id "
+                "WHERE threat_tests.test_id = ?",
+                test_id,
+            )
+        return self._select("threats", "source", source)
+
+    def detections(self, test_id: str = None):
+        """Mirrored detections, optionally only those of a test"""
+        return self._select("detections", "test_id", test_id)
+
+    def threat_hunts(self, test_id: str = None):
+        """Mirrored threat hunts, optionally only those of a test"""
+        return self._select("threat_hunts", "test_id", test_id)
+
+    def last_synced(self):
+        return {
+            row["kind"]: row["synced"]
+            for row in self._db.execute("SELECT kind, synced FROM syncs")
+        }
+
+    def _sync(self, kind, max_workers):
+        list_method, get_method, argument, column, field = self.KINDS[kind]
+        listed = {
+            record["id"]: _digest(record) for record in getattr(self, list_method)()
+        }
+        known = dict(self._db.execute(f"SELECT id, digest FROM {kind}").fetchall())
+        changed = [id for id, digest in listed.items() if known.get(id) != digest]
+        removed = [id for id in known if id not in listed]
+
+        summary = dict(added=0, updated=0, removed=len(removed), unchanged=0, failed=[])
+        get = getattr(self, get_method)
+        results = self._fan_out(
+            lambda id: get(**{argument: id}), changed, max_workers=max_workers
+        )
+        with self._db:
+            for id, record, error in results:
+                if error:
+                    summary["failed"].append(
+                        dict(id=id, reason=" ".join(str(arg) for arg in error.args))
+                    )
+                    continue
+                summary["updated" if id in known else "added"] += 1
+                self._db.execute(
+                    f"INSERT OR REPLACE INTO {kind} (id, {column}, digest, data) VALUES (?, ?, ?, ?)",
+                    (id, record.get(field), listed[id], json.dumps(record)),
+                )
+                if kind == "threats":
+                    self._db.execute(
+                        "DELETE FROM threat_tests WHERE threat_id = ?", (id,)
+                    )
+                    self._db.executemany(
+                        "INSERT OR IGNORE INTO threat_tests (threat_id, test_id) VALUES (?, ?)",
+                        [(id, test_id) for test_id in record.get("tests") or []],
+                    )
+            self._db.executemany(
+                f"DELETE FROM {kind} WHERE id = ?", [(id,) for id in removed]
+            )
+            if kind == "threats":
+                self._db.executemany(
+                    "DELETE FROM threat_tests WHERE threat_id = ?",
+                    [(id,) for id in removed],
+                )
+            self._db.execute(
+                "INSERT OR REPLACE INTO syncs (kind, synced) VALUES (?, ?)",
+                (kind, datetime.now(timezone.utc).isoformat()),
+            )
+        summary["unchanged"] = len(listed) - len(changed)
+        return summary
+
+    def _select(self, kind, column, value):
+        if value is None:
+            return self._query(f"SELECT data FROM {kind}")
+        return self._query(f"SELECT data FROM {kind} WHERE {column} = ?", value)
+
+    def _query(self, sql, *params):
+        return [json.loads(row["data"]) for row in self._db.execute(sql, params)]
+
+
+def _digest(record):
+    return hashlib.sha256(json.dumps(record, sort_keys=True).encode()).hexdigest()
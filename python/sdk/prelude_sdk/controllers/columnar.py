@@ -0,0 +1,206 @@
+import itertools
+import json
+import pickle
+import tempfile
+import warnings
+
+
+PARQUET_BATCH_SIZE = 10000
+
+# (column, Arrow type) of the record shapes the CLI exports
+ACTIVITY_LOGS = (
+    ("endpoint_id", "string"),
+    ("test", "string"),
+    ("status", "int64"),
+    ("dos", "string"),
+    ("os", "string"),
+    ("control", "int64"),
+    ("policy", "string"),
+)
+EVALUATION_POLICIES = (
+    ("evaluation", "string"),
+    ("id", "string"),
+    ("name", "string"),
+    ("platform", "string"),
+    ("settings", "string"),
+    ("conflict_count", "int64"),
+    ("endpoint_count", "int64"),
+    ("success_count", "int64"),
+    ("user_count", "int64"),
+    ("inbox_count", "int64"),
+    ("noncompliant_hostnames", "string"),
+)
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise Exception(
+            "Columnar export requires pyarrow: pip install 'prelude-sdk[parquet]'"
+        )
+    return pyarrow
+
+
+def arrow_schema(columns):
+    """Arrow schema for a tuple of (column, type name) pairs such as ACTIVITY_LOGS"""
+    pa = _pyarrow()
+    return pa.schema(pa.field(name, getattr(pa, kind)()) for name, kind in columns)
+
+
+def record_batches(records, schema=None, batch_size: int = PARQUET_BATCH_SIZE):
+    """Group records into Arrow record batches that all share one schema
+
+    The schema is `schema` if given, inferred from the first batch otherwise. Fields missing
+    from a record are null, and a field the schema lacks raises ValueError instead of being
+    dropped. Nested values are stored as JSON strings.
+    """
+    pa = _pyarrow()
+    records = iter(records)
+    while rows := list(itertools.islice(records, batch_size)):
+        rows = [{k: _scalar(v) for k, v in row.items()} for row in rows]
+        if schema is None:
+            schema = _finish(pa, _infer(pa, rows))
+        if unknown := _unknown(schema, rows):
+            raise ValueError(
+                "Fields not in the Parquet schema: %s" % ", ".join(sorted(unknown))
+            )
+        yield pa.RecordBatch.from_pylist(_conform(pa, schema, rows), schema=schema)
+
+
+def write_parquet(
+    records,
+    dest,
+    schema=None,
+    batch_size: int = PARQUET_BATCH_SIZE,
+    compression: str = "zstd",
+    strict: bool = False,
+):
+    """Stream records into a Parquet file one record batch at a time
+
+    Unless `strict`, records are first spooled to a temporary file so that the schema covers
+    every field of every record: `schema` (if given) keeps its column types and is extended,
+    with a warning, by fields it does not declare. With `strict`, such fields raise ValueError.
+    """
+    pa = _pyarrow()
+    if strict and schema is not None:
+        return _write(pa, records, dest, schema, batch_size, compression)
+
+    with tempfile.TemporaryFile() as spool:
+        found = schema
+        records = iter(records)
+        while rows := list(itertools.islice(records, batch_size)):
+            rows = [{k: _scalar(v) for k, v in row.items()} for row in rows]
+            batch = _infer(pa, _conform(pa, found, rows))
+            found = _merge(pa, found, batch, fixed=schema.names if schema else ())
+            for row in rows:
+                pickle.dump(row, spool)
+        if schema is not None and (extra := set(found.names) - set(schema.names)):
+            warnings.warn(
+                "Fields not in the Parquet schema were added as columns: %s"
+                % ", ".join(sorted(extra)),
+                stacklevel=2,
+            )
+        spool.seek(0)
+        found = _finish(pa, found) if found is not None else None
+        return _write(pa, _unspool(spool), dest, found, batch_size, compression)
+
+
+def _write(pa, records, dest, schema, batch_size, compression):
+    writer = None
+    rows = batches = 0
+    try:
+        for batch in record_batches(records, schema=schema, batch_size=batch_size):
+            if writer is None:
+                schema = batch.schema
+                writer = pa.parquet.ParquetWriter(dest, schema, compression=compression)
+            writer.write_batch(batch)
+            rows += batch.num_rows
+            batches += 1
+        if writer is None and schema is not None:
+            writer = pa.parquet.ParquetWriter(dest, schema, compression=compression)
+    finally:
+        if writer is not None:
+            writer.close()
+    return dict(
+        path=str(dest),
+        rows=rows,
+        batches=batches,
+        columns=schema.names if schema is not None else [],
+    )
+
+
+def _infer(pa, rows):
+    """Schema of a batch of rows, over the fields of every row (from_pylist only reads the first)"""
+    columns = dict.fromkeys(k for row in rows for k in row)
+    return pa.RecordBatch.from_pydict(
+        {k: [row.get(k) for row in rows] for k in columns}
+    ).schema
+
+
+def _merge(pa, schema, found, fixed=()):
+    """Extend a schema with the fields of another
+
+    Columns named in `fixed` keep their type. One seen with two different types becomes a
+    float column if both are numbers, a string column otherwise.
+    """
+    fields = {f.name: f for f in schema or []}
+    for field in found:
+        known = fields.get(field.name)
+        if field.name in fixed or (known and pa.types.is_null(field.type)):
+            continue
+        if known is None or pa.types.is_null(known.type):
+            fields[field.name] = field
+        elif known.type != field.type:
+            numeric = _numeric(pa, known.type) and _numeric(pa, field.type)
+            fields[field.name] = pa.field(
+                field.name, pa.float64() if numeric else pa.string()
+            )
+    return pa.schema(fields.values())
+
+
+def _numeric(pa, kind):
+    return pa.types.is_integer(kind) or pa.types.is_floating(kind)
+
+
+def _finish(pa, schema):
+    """Type columns that were null throughout as strings"""
+    return pa.schema(
+        pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f for f in schema
+    )
+
+
+def _conform(pa, schema, rows):
+    """Stringify values of string columns, so that e.g. a number fits a column typed as text"""
+    if schema is None:
+        return rows
+    strings = {f.name for f in schema if pa.types.is_string(f.type)}
+    return [
+        {
+            k: (
+                str(v)
+                if k in strings and v is not None and not isinstance(v, str)
+                else v
+            )
+            for k, v in row.items()
+        }
+        for row in rows
+    ]
+
+
+def _unknown(schema, rows):
+    names = set(schema.names)
+    return {k for row in rows for k in row if k not in names}
+
+
+def _unspool(spool):
+    while True:
+        try:
+            yield pickle.load(spool)
+        except EOFError:
+            return
+
+
+def _scalar(value):
+    return json.dumps(value, default=str) if isinstance(value, (dict, list)) else value
@@ -1,3 +1,9 @@
+import os
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from dateutil.parser import isoparse
+
 from prelude_sdk.controllers.http_controller import HttpController
 
 from prelude_sdk.models.account import verify_credentials
@@ -6,8 +12,7 @@ from prelude_sdk.models.account import verify_credentials
 class DetectController(HttpController):
 
     def __init__(self, account):
-        super().__init__()
-        self.account = account
+        super().__init__(account)
 
     @verify_credentials
     def register_endpoint(self, host, serial_num, tags=None):
@@ -26,6 +31,30 @@ class DetectController(HttpController):
             return res.text
         raise Exception(res.text)
 
+    def register_endpoints(self, endpoints, max_workers: int = None):
+        """Register many endpoints concurrently, yielding each one with its token (or error) as it completes
+
+        Example: endpoints=[dict(host='web-1', serial_num='abc-123', tags='grp-1'),
+                            dict(host='web-2', serial_num='def-456')]
+        """
+
+        def register(endpoint):
+            _require(endpoint, "host", "serial_num")
+            return self.register_endpoint(
+                host=endpoint["host"],
+                serial_num=endpoint["serial_num"],
+                tags=endpoint.get("tags"),
+            )
+
+        results = self._fan_out(register, endpoints, max_workers=max_workers)
+        for endpoint, token, error in results:
+            yield dict(
+                host=endpoint.get("host"),
+                serial_num=endpoint.get("serial_num"),
+                token=token,
+                error=" ".join(str(arg) for arg in error.args) if error else None,
+            )
+
     @verify_credentials
     def update_endpoint(self, endpoint_id, tags=None):
         """Update an endpoint in your account"""
@@ -71,6 +100,78 @@ class DetectController(HttpController):
             return res.json()
         raise Exception(res.text)
 
+    def select_endpoints(self, days: int = None, stale_days: int = None, tags=None):
+        """List endpoints not seen in the last stale_days days and/or carrying any of the comma-separated tags
+
+        Endpoints are listed from the past `days` days: 90 by default, or stale_days + 90 when
+        selecting stale ones so there are endpoints old enough to qualify. Endpoints that never
+        checked in are judged by when they were created, and skipped if that is unknown.
+        """
+        if days is None:
+            days = 90 + (stale_days or 0)
+        elif stale_days is not None and days <= stale_days:
+            raise ValueError(
+                f"days ({days}) must exceed stale_days ({stale_days}), or no endpoint could be stale"
+            )
+        cutoff = (
+            datetime.now(timezone.utc) - timedelta(days=stale_days)
+            if stale_days is not None
+            else None
+        )
+        wanted = set(tags.split(",")) if tags else None
+        for endpoint in self.list_endpoints(days=days):
+            if wanted and not wanted & set(endpoint.get("tags") or []):
+                continue
+            if cutoff:
+                seen = endpoint.get("last_seen") or endpoint.get("created")
+                if not seen:
+                    continue
+                seen = _as_datetime(seen)
+                if (
+                    seen if seen.tzinfo else seen.replace(tzinfo=timezone.utc)
+                ) >= cutoff:
+                    continue
+            yield endpoint
+
+    def bulk_update_endpoints(self, endpoints, max_workers: int = None):
+        """Update many endpoints concurrently, yielding a report for each one as it completes
+
+        Example: endpoints=[dict(endpoint_id='abc', tags='grp-1,grp-2'),
+                            dict(endpoint_id='def', tags='')]
+
+        Rows without tags fail rather than being sent, since there would be nothing to update
+        """
+
+        def update(endpoint):
+            _require(endpoint, "endpoint_id")
+            if endpoint.get("tags") is None:
+                raise Exception("No tags to update")
+            return self.update_endpoint(
+                endpoint_id=endpoint["endpoint_id"], tags=endpoint["tags"]
+            )
+
+        results = self._fan_out(update, endpoints, max_workers=max_workers)
+        for endpoint, _, error in results:
+            yield self._bulk_report(endpoint.get("endpoint_id"), error)
+
+    def bulk_delete_endpoints(self, endpoint_ids, max_workers: int = None):
+        """Delete many endpoints concurrently, yielding a report for each one as it completes"""
+        results = self._fan_out(
+            lambda ident: self.delete_endpoint(ident=ident),
+            endpoint_ids,
+            max_workers=max_workers,
+        )
+        for endpoint_id, _, error in results:
+            yield self._bulk_report(endpoint_id, error)
+
+    @staticmethod
+    def _bulk_report(endpoint_id, error):
+        return dict(
+            endpoint_id=endpoint_id,
+            status="FAILED" if error else "SUCCEEDED",
+            error=" ".join(str(arg) for arg in error.args) if error else None,
+        )
+
     @verify_credentials
     def describe_activity(self, filters: dict, view: str = "protected"):
         """Get report for an Account"""
@@ -79,12 +180,45 @@ class DetectController(HttpController):
             f"{self.account.hq}/detect/activity",
             headers=self.account.headers,
             params=params,
-            timeout=10,
+            timeout=60,
         )
         if res.status_code == 200:
             return res.json()
         raise Exception(res.text)
 
+    def iter_activity(
+        self,
+        filters: dict,
+        view: str = "logs",
+        chunk: timedelta = timedelta(days=1),
+        max_workers: int = None,
+    ):
+        """Yield activity records for the filters' start-finish range, fetched in chunks of `chunk` length
+
+        Chunks are requested concurrently but yielded in chronological order. Meant for record
+        views such as logs; views that aggregate yield one result per chunk.
+        """
+        start, finish = _as_datetime(filters["start"]), _as_datetime(filters["finish"])
+        windows = []
+        while start <= finish:
+            windows.append(
+                (start, min(start + chunk - timedelta(microseconds=1), finish))
+            )
+            start += chunk
+
+        results = self._fan_out_ordered(
+            lambda window: self.describe_activity(
+                filters=filters | dict(start=window[0], finish=window[1]), view=view
+            ),
+            windows,
+            max_workers=max_workers,
+        )
+        for records in results:
+            if isinstance(records, list):
+                yield from records
+            else:
+                yield records
+
     @verify_credentials
     def threat_hunt_activity(self, threat_hunt_id=None, test_id=None, threat_id=None):
         """Get threat hunt activity"""
@@ -95,7 +229,7 @@ class DetectController(HttpController):
             f"{self.account.hq}/detect/threat_hunt_activity",
             headers=self.account.headers,
             params=filters,
-            timeout=10,
+            timeout=60,
         )
         if res.status_code == 200:
             return res.json()
@@ -104,11 +238,8 @@ class DetectController(HttpController):
     @verify_credentials
     def list_tests(self, filters: dict = None):
         """List all tests available to an account"""
-        res = self._session.get(
-            f"{self.account.hq}/detect/tests",
-            headers=self.account.headers,
-            params=filters if filters else {},
-            timeout=10,
+        res = self._cached_get(
+            f"{self.account.hq}/detect/tests", params=filters if filters else {}
         )
         if res.status_code == 200:
             return res.json()
@@ -117,11 +248,7 @@ class DetectController(HttpController):
     @verify_credentials
     def get_test(self, test_id):
         """Get properties of an existing test"""
-        res = self._session.get(
-            f"{self.account.hq}/detect/tests/{test_id}",
-            headers=self.account.headers,
-            timeout=10,
-        )
+        res = self._cached_get(f"{self.account.hq}/detect/tests/{test_id}")
         if res.status_code == 200:
             return res.json()
         raise Exception(res.text)
@@ -129,11 +256,7 @@ class DetectController(HttpController):
     @verify_credentials
     def list_techniques(self):
         """List techniques"""
-        res = self._session.get(
-            f"{self.account.hq}/detect/techniques",
-            headers=self.account.headers,
-            timeout=10,
-        )
+        res = self._cached_get(f"{self.account.hq}/detect/techniques")
         if res.status_code == 200:
             return res.json()
         raise Exception(res.text)
@@ -141,12 +264,7 @@ class DetectController(HttpController):
     @verify_credentials
     def list_threats(self):
         """List threats"""
-        res = self._session.get(
-            f"{self.account.hq}/detect/threats",
-            headers=self.account.headers,
-            params={},
-            timeout=10,
-        )
+        res = self._cached_get(f"{self.account.hq}/detect/threats")
         if res.status_code == 200:
             return res.json()
         raise Exception(res.text)
@@ -154,11 +272,7 @@ class DetectController(HttpController):
     @verify_credentials
     def get_threat(self, threat_id):
         """Get properties of an existing threat"""
-        res = self._session.get(
-            f"{self.account.hq}/detect/threats/{threat_id}",
-            headers=self.account.headers,
-            timeout=10,
-        )
+        res = self._cached_get(f"{self.account.hq}/detect/threats/{threat_id}")
         if res.status_code == 200:
             return res.json()
         raise Exception(res.text)
@@ -166,12 +280,7 @@ class DetectController(HttpController):
     @verify_credentials
     def list_detections(self):
         """List detections"""
-        res = self._session.get(
-            f"{self.account.hq}/detect/detections",
-            headers=self.account.headers,
-            params={},
-            timeout=10,
-        )
+        res = self._cached_get(f"{self.account.hq}/detect/detections")
         if res.status_code == 200:
             return res.json()
         raise Exception(res.text)
@@ -179,11 +288,7 @@ class DetectController(HttpController):
     @verify_credentials
     def get_detection(self, detection_id):
         """Get properties of an existing detection"""
-        res = self._session.get(
-            f"{self.account.hq}/detect/detections/{detection_id}",
-            headers=self.account.headers,
-            timeout=10,
-        )
+        res = self._cached_get(f"{self.account.hq}/detect/detections/{detection_id}")
         if res.status_code == 200:
             return res.json()
         raise Exception(res.text)
@@ -237,6 +342,72 @@ class DetectController(HttpController):
             return res.content
         raise Exception(res.text)
 
+    @verify_credentials
+    def download_to(
+        self,
+        test_id,
+        filename,
+        dest,
+        checksum=None,
+        etag=None,
+        chunk_size=65536,
+        resume=False,
+    ):
+        """Stream a test file or attachment to a path or file object
+
+        Returns None if an etag is given and the file has not changed since. With resume, a partial
+        download already at dest is continued with a Range request; its ETag is kept in
+        <dest>.etag, so it starts over if the file changed in the meantime.
+        """
+        headers = self.account.headers
+        if etag:
+            headers = headers | {"If-None-Match": etag}
+        offset, validator = 0, None
+        if resume and isinstance(dest, (str, os.PathLike)):
+            validator = Path(f"{dest}.etag")
+            if validator.is_file() and os.path.isfile(dest) and os.path.getsize(dest):
+                offset = os.path.getsize(dest)
+                headers = headers | {
+                    "Range": f"bytes={offset}-",
+                    "If-Range": validator.read_text(),
+                }
+        with self._session.get(
+            f"{self.account.hq}/detect/tests/{test_id}/{filename}",
+            headers=headers,
+            timeout=10,
+            stream=True,
+        ) as res:
+            if res.status_code == 304:
+                return None
+            if res.status_code == 206:
+                if not res.headers.get("Content-Range", "").startswith(
+                    f"bytes {offset}-"
+                ):
+                    raise Exception(
+                        "Unexpected Content-Range for %s: %s"
+                        % (res.url, res.headers.get("Content-Range"))
+                    )
+            elif res.status_code == 200:
+                offset = 0
+            else:
+                raise Exception(res.text)
+            if validator:
+                if res.headers.get("ETag"):
+                    validator.write_text(res.headers["ETag"])
+                else:
+                    validator.unlink(missing_ok=True)
+            result = self._stream_to(
+                res,
+                dest,
+                checksum=checksum,
+                chunk_size=chunk_size,
+                offset=offset,
+                keep_partial=resume,
+            )
+        if validator:
+            validator.unlink(missing_ok=True)
+        return result
+
     @verify_credentials
     def schedule(self, items: list):
         """Schedule tests and threats so endpoints will start running them
@@ -270,3 +441,12 @@ class DetectController(HttpController):
         if res.status_code == 200:
             return res.json()
         raise Exception(res.text)
+
+
+def _as_datetime(value):
+    return value if isinstance(value, datetime) else isoparse(value)
+
+
+def _require(row: dict, *fields):
+    if missing := [field for field in fields if not row.get(field)]:
+        raise Exception("Missing %s" % ", ".join(missing))
@@ -7,8 +7,7 @@ from prelude_sdk.models.codes import SCMCategory
 class ExportController(HttpController):
 
     def __init__(self, account):
-        super().__init__()
-        self.account = account
+        super().__init__(account)
 
     @verify_credentials
     def export_scm(
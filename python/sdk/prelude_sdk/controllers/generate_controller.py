@@ -6,8 +6,7 @@ from prelude_sdk.models.codes import Control
 
 class GenerateController(HttpController):
     def __init__(self, account):
-        super().__init__()
-        self.account = account
+        super().__init__(account)
 
     @verify_credentials
     def upload_threat_intel(self, file: str):
@@ -1,22 +1,463 @@
+import copy
+import hashlib
+import itertools
 import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
 import requests
 
-from requests.adapters import HTTPAdapter, Retry
+from requests.adapters import HTTPAdapter
 
+from prelude_sdk.controllers.call_context import current_context, propagate
+from prelude_sdk.controllers.instrumentation import RequestEvent, route_template
+from prelude_sdk.controllers.rate_limiter import (
+    PRELUDE_BACKOFF_MAX,
+    RateLimiter,
+    backoff,
+    retry_after,
+)
+from prelude_sdk.controllers.response_cache import default_cache
 
-PRELUDE_BACKOFF_FACTOR = int(os.getenv("PRELUDE_BACKOFF_FACTOR", 30))
-PRELUDE_BACKOFF_TOTAL = int(os.getenv("PRELUDE_BACKOFF_TOTAL", 0))
 
+PRELUDE_BACKOFF_FACTOR = float(os.getenv("PRELUDE_BACKOFF_FACTOR", 0.5))
+PRELUDE_BACKOFF_TOTAL = int(os.getenv("PRELUDE_BACKOFF_TOTAL", 5))
+PRELUDE_POOL_SIZE = int(os.getenv("PRELUDE_POOL_SIZE", 10))
+PRELUDE_COALESCE = os.getenv("PRELUDE_COALESCE", "1") != "0"
 
-class HttpController(object):
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+
+_session_lock = threading.Lock()
+
+
+def _follower_response(res):
+    """A coalesced follower's own copy of the leader's response, sharing no mutable state"""
+    copied = copy.copy(res)
+    copied.headers = requests.structures.CaseInsensitiveDict(res.headers)
+    copied.cookies = res.cookies.copy()
+    copied.history = list(res.history)
+    copied.request = res.request.copy() if res.request else None
+    copied._content = bytes(bytearray(res.content))
+    copied.coalesced = True
+    return copied
+
+
+def _follower_error(error):
+    """A fresh exception of the leader's type for a coalesced follower to raise"""
+    try:
+        if isinstance(error, requests.RequestException):
+            return type(error)(
+                *error.args, request=error.request, response=error.response
+            )
+        return type(error)(*error.args)
+    except Exception:
+        return Exception(*error.args)
+
+
+class PreludeSession(requests.Session):
+    """Pooled session that paces requests through a shared rate limiter and retries throttled or failed calls
+
+    429s are retried for every method, since the API did not act on them. Gateway errors and
+    dropped connections are only retried for idempotent methods. The wait is the server's
+    Retry-After when given, jittered exponential backoff otherwise. Identical GETs made at the
+    same time share a single request (see _coalesced).
+    """
+
+    def __init__(
+        self,
+        pool_size: int = PRELUDE_POOL_SIZE,
+        limiter: RateLimiter = None,
+        coalesce: bool = PRELUDE_COALESCE,
+    ):
+        super().__init__()
+        self.limiter = limiter or RateLimiter()
+        self.instruments = []
+        self.pool_size = pool_size
+        self._pool_lock = threading.Lock()
+        self.coalesce = coalesce
+        self._flights = dict()
+        self._flights_lock = threading.Lock()
+        for prefix in ("http://", "https://"):
+            self.mount(
+                prefix,
+                HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size),
+            )
+
+    def request(self, method, url, *args, **kwargs):
+        method = method.upper()
+        if method == "GET" and self.coalesce and not args and not kwargs.get("stream"):
+            return self._coalesced(url, **kwargs)
+        return self._observed(method, url, *args, **kwargs)
+
+    def _coalesced(self, url, **kwargs):
+        """Single-flight GET: callers asking for the same URL, params and headers while a request
+        for it is in flight wait for that request and get a copy of its response"""
+        key = (
+            requests.Request("GET", url, params=kwargs.get("params")).prepare().url,
+            tuple(sorted((kwargs.get("headers") or dict()).items())),
+        )
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            if not flight.done.wait(current_context().remaining()):
+                raise TimeoutError(f"Deadline exceeded waiting for GET {url}")
+            if flight.error:
+                raise _follower_error(flight.error) from flight.error
+            return _follower_response(flight.res)
+
+        try:
+            flight.res = self._observed("GET", url, **kwargs)
+            flight.res.content  # read the body once, before followers copy it
+            return flight.res
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._flights_lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def _observed(self, method, url, *args, **kwargs):
+        route = route_template(requests.utils.urlparse(url).path)
+        if not self.instruments:
+            return self._request(method, url, route, *args, **kwargs)
+
+        event = RequestEvent(method, url, route)
+        self._notify("before", event)
+        try:
+            res = self._request(method, url, route, *args, **kwargs)
+        except Exception as e:
+            event.finish(error=" ".join(str(arg) for arg in e.args))
+            self._notify("after", event)
+            raise
+        event.finish(res)
+        self._notify("after", event)
+        return res
+
+    def ensure_pool(self, size: int):
+        """Grow the connection pools so `size` threads can each keep a connection open"""
+        with self._pool_lock:
+            if size <= self.pool_size:
+                return
+            self.pool_size = size
+            for adapter in set(self.adapters.values()):
+                old = adapter.poolmanager
+                adapter.init_poolmanager(size, size)
+                # idle sockets of the old pools close now, in-flight ones once released
+                old.clear()
+
+    def sleep(self, seconds: float, reason: str):
+        """Sleep on behalf of a caller, reporting the time lost to instruments"""
+        time.sleep(seconds)
+        if seconds > 0:
+            self._notify("slept", seconds, reason)
+
+    def _notify(self, hook, *args):
+        for instrument in self.instruments:
+            try:
+                getattr(instrument, hook)(*args)
+            except Exception:
+                # a broken sink must never fail the API call it observes
+                pass
+
+    def _request(self, method, url, route, *args, **kwargs):
+        idempotent = method in IDEMPOTENT_METHODS
+        context = current_context()
+        timeout = kwargs.pop("timeout", None)
+        attempt = 0
+        while True:
+            if waited := self.limiter.acquire():
+                self._notify("slept", waited, "rate limit")
+            try:
+                res = super().request(
+                    method,
+                    url,
+                    *args,
+                    timeout=context.timeout(method, route, timeout),
+                    **kwargs,
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if not _fits(context, 0):
+                    raise TimeoutError(
+                        f"Deadline exceeded during {method} {route}"
+                    ) from e
+                delay = backoff(attempt, PRELUDE_BACKOFF_FACTOR, PRELUDE_BACKOFF_MAX)
+                if (
+                    not isinstance(e, requests.ConnectionError)
+                    or not idempotent
+                    or attempt >= PRELUDE_BACKOFF_TOTAL
+                    or not _fits(context, delay)
+                ):
+                    raise
+                self.sleep(delay, "retry backoff")
+                attempt += 1
+                continue
+
+            self.limiter.update(res)
+            if (
+                res.status_code in RETRY_STATUSES
+                and (idempotent or res.status_code == 429)
+                and attempt < PRELUDE_BACKOFF_TOTAL
+                and _fits(context, retry_after(res) or 0)
+            ):
+                # a Retry-After pauses every caller through the shared limiter instead
+                delay = (
+                    0
+                    if retry_after(res)
+                    else backoff(attempt, PRELUDE_BACKOFF_FACTOR, PRELUDE_BACKOFF_MAX)
+                )
+                res.close()
+                self.sleep(delay, "retry backoff")
+                attempt += 1
+                continue
+            res.retries = attempt
+            return res
+
+
+class _Flight(object):
     def __init__(self):
-        self._session = requests.Session()
+        self.done = threading.Event()
+        self.res = None
+        self.error = None
+
 
-        retry = Retry(
-            total=PRELUDE_BACKOFF_TOTAL,
-            backoff_factor=PRELUDE_BACKOFF_FACTOR,
-            status_forcelist=[429],
+def _fits(context, delay: float):
+    """Whether a retry after `delay` seconds could still finish before the call context's deadline"""
+    remaining = context.remaining()
+    return remaining is None or remaining > delay
+
+
+def _invalidate_cache(account, res):
+    if cache := getattr(account, "cache", None):
+        cache.on_response(res)
+
+
+def new_session(pool_size: int = PRELUDE_POOL_SIZE):
+    """Build a pooled session for talking to the Prelude API"""
+    return PreludeSession(pool_size=pool_size)
+
+
+class HttpController(object):
+    def __init__(self, account):
+        self.account = account
+        self._session = self.shared_session(account)
+
+    @staticmethod
+    def shared_session(account):
+        """Get (or lazily create) the session owned by an account, so every controller built from it reuses the same connections"""
+        with _session_lock:
+            if getattr(account, "session", None) is None:
+                if getattr(account, "cache", None) is None:
+                    account.cache = default_cache()
+                account.session = new_session(
+                    pool_size=getattr(account, "pool_size", None) or PRELUDE_POOL_SIZE
+                )
+                # the cache is looked up on every response, so one set on the account later is invalidated too
+                account.session.hooks["response"].append(
+                    lambda res, *args, **kwargs: _invalidate_cache(account, res)
+                )
+            return account.session
+
+    def add_instrument(self, instrument):
+        """Observe every API call made over this account's session (see prelude_sdk.controllers.instrumentation)"""
+        if instrument not in self._session.instruments:
+            self._session.instruments.append(instrument)
+        return instrument
+
+    def _cached_get(self, url: str, params: dict = None, timeout: int = 10):
+        """GET through the account's response cache, when one is configured
+
+        Fresh entries cost no request; stale ones are revalidated with their ETag
+        """
+        cache = getattr(self.account, "cache", None)
+        if not cache:
+            return self._session.get(
+                url, headers=self.account.headers, params=params, timeout=timeout
+            )
+
+        namespace = cache.namespace(self.account.hq, self.account.headers)
+        key = f'{self.account.profile} {requests.Request("GET", url, params=params).prepare().url}'
+        entry = cache.get(namespace, key)
+        if entry and cache.fresh(entry):
+            return cache.response(entry)
+
+        headers = self.account.headers
+        if entry and entry.get("etag"):
+            headers = headers | {"If-None-Match": entry["etag"]}
+        res = self._session.get(url, headers=headers, params=params, timeout=timeout)
+        if res.status_code == 304 and entry:
+            cache.put(namespace, key, entry)
+            return cache.response(entry)
+        if res.status_code == 200:
+            cache.put(namespace, key, cache.entry(res))
+        return res
+
+    @staticmethod
+    def _stream_to(
+        res,
+        dest,
+        checksum: str = None,
+        chunk_size: int = 65536,
+        offset: int = 0,
+        keep_partial: bool = False,
+    ):
+        """Write a streamed response chunk by chunk to a path or file object
+
+        With an offset, the response continues the first `offset` bytes already at the path (a
+        206 to a Range request). If a sha256 checksum is given, it is verified against the whole file.
+        A path left incomplete by a dropped stream is removed, unless `keep_partial` (to resume it).
+        Returns the size, sha256 and ETag of the file, and its path if dest was one
+        """
+        path = os.fspath(dest) if isinstance(dest, (str, os.PathLike)) else None
+        digest = hashlib.sha256()
+        size = 0
+        if offset:
+            with open(dest, "rb") as existing:
+                while size < offset and (chunk := existing.read(chunk_size)):
+                    chunk = chunk[: offset - size]
+                    digest.update(chunk)
+                    size += len(chunk)
+            f = open(dest, "r+b")
+            f.seek(size)
+            f.truncate()
+        else:
+            f = open(dest, "wb") if path else dest
+        try:
+            for chunk in res.iter_content(chunk_size=chunk_size):
+                f.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+        except BaseException:
+            if path and not keep_partial:
+                f.close()
+                os.remove(path)
+            raise
+        finally:
+            if path:
+                f.close()
+
+        if checksum and digest.hexdigest() != checksum.lower():
+            if path:
+                os.remove(path)
+            raise Exception(
+                "Checksum mismatch for %s: expected %s, got %s"
+                % (res.url, checksum, digest.hexdigest())
+            )
+        return dict(
+            size=size,
+            sha256=digest.hexdigest(),
+            etag=res.headers.get("ETag"),
+            path=path,
         )
 
-        self._session.mount("http://", HTTPAdapter(max_retries=retry))
-        self._session.mount("https://", HTTPAdapter(max_retries=retry))
+    @staticmethod
+    def _paginate(fetch_page, page_size: int, prefetch: int = 0):
+        """Yield records from fetch_page(offset, limit) page by page until an empty page comes back
+
+        A short page does not end the listing, since the server may cap the page size below the
+        one asked for: the following pages are requested at the size it returned. With prefetch,
+        that many following pages are requested in the background while the current one is consumed
+        """
+        if page_size < 1:
+            raise ValueError(f"page_size must be at least 1 (got {page_size})")
+        if prefetch < 0:
+            raise ValueError(f"prefetch cannot be negative (got {prefetch})")
+        return HttpController._pages(fetch_page, page_size, prefetch)
+
+    @staticmethod
+    def _pages(fetch_page, page_size: int, prefetch: int):
+        fetch_page = propagate(fetch_page)
+        pool = ThreadPoolExecutor(max_workers=prefetch + 1)
+        pending = deque()
+        next_offset = 0
+
+        def request():
+            nonlocal next_offset
+            pending.append(
+                (next_offset, pool.submit(fetch_page, next_offset, page_size))
+            )
+            next_offset += page_size
+
+        try:
+            for _ in range(prefetch + 1):
+                request()
+            while pending:
+                offset, future = pending.popleft()
+                page = future.result()
+                if not page:
+                    break
+                if len(page) < page_size:
+                    # pages requested ahead at the old size would leave gaps
+                    for _, ahead in pending:
+                        ahead.cancel()
+                    pending.clear()
+                    page_size, next_offset = len(page), offset + len(page)
+                    for _ in range(prefetch + 1):
+                        request()
+                else:
+                    request()
+                yield from page
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _fan_out(self, func, items, max_workers: int = None):
+        """Call func on each item over a bounded pool, yielding (item, result, error) as each call completes
+
+        Items are pulled lazily, so arbitrarily large inputs run in constant memory
+        """
+        max_workers = (
+            max_workers or getattr(self.account, "pool_size", None) or PRELUDE_POOL_SIZE
+        )
+        items = iter(items)
+        func = propagate(func)
+        self._session.ensure_pool(max_workers)
+        pool = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            pending = {
+                pool.submit(func, item): item
+                for item in itertools.islice(items, max_workers * 2)
+            }
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = pending.pop(future)
+                    try:
+                        yield item, future.result(), None
+                    except Exception as e:
+                        yield item, None, e
+                for item in itertools.islice(items, len(done)):
+                    pending[pool.submit(func, item)] = item
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _fan_out_ordered(self, func, items, max_workers: int = None):
+        """Call func on each item over a bounded pool, yielding results in input order
+
+        Only max_workers calls are in flight or buffered at a time, so memory stays bounded
+        """
+        max_workers = (
+            max_workers or getattr(self.account, "pool_size", None) or PRELUDE_POOL_SIZE
+        )
+        items = iter(items)
+        func = propagate(func)
+        self._session.ensure_pool(max_workers)
+        pool = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            pending = deque(
+                pool.submit(func, item) for item in itertools.islice(items, max_workers)
+            )
+            while pending:
+                result = pending.popleft().result()
+                pending.extend(
+                    pool.submit(func, item) for item in itertools.islice(items, 1)
+                )
+                yield result
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
@@ -9,8 +9,7 @@ from prelude_sdk.models.codes import AuditEvent, Mode, Permission
 class IAMController(HttpController):
 
     def __init__(self, account):
-        super().__init__()
-        self.account = account
+        super().__init__(account)
 
     def migrate(self):
         cfg = self.account.read_keychain_config()
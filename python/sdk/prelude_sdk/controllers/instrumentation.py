@@ -0,0 +1,267 @@
+import bisect
+import os
+import re
+import threading
+import time
+from collections import deque
+
+
+ID_SEGMENT = re.compile(
+    r"[0-9a-f]{8}-?[0-9a-f]{4}-?[0-9a-f]{4}-?[0-9a-f]{4}-?[0-9a-f]{12}|^[0-9a-f]{16,}$|^\d+$|:",
+    re.IGNORECASE,
+)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def route_template(path: str):
+    """Collapse the IDs in a request path, e.g. /detect/tests/<uuid> becomes /detect/tests/{id}"""
+    segments = path.split("?")[0].strip("/").split("/")
+    return "/" + "/".join("{id}" if ID_SEGMENT.search(s) else s for s in segments)
+
+
+class RequestEvent(object):
+    """One API call as seen by instrumentation sinks, retries included
+
+    Sinks may stash their own state on the event between before() and after()
+    """
+
+    def __init__(self, method: str, url: str, route: str):
+        self.method = method
+        self.url = url
+        self.route = route
+        self.started = time.time()
+        self.status = None
+        self.latency = None
+        self.retries = 0
+        self.request_bytes = 0
+        self.response_bytes = None
+        self.error = None
+
+    def finish(self, res=None, error=None):
+        self.latency = time.time() - self.started
+        self.error = error
+        if res is not None:
+            self.status = res.status_code
+            self.retries = getattr(res, "retries", 0)
+            body = res.request.body if res.request is not None else None
+            self.request_bytes = _body_size(body)
+            if res._content_consumed and isinstance(res._content, bytes):
+                self.response_bytes = len(res._content)
+            elif res.headers.get("Content-Length", "").isdigit():
+                self.response_bytes = int(res.headers["Content-Length"])
+
+    def as_dict(self):
+        return dict(
+            method=self.method,
+            route=self.route,
+            status=self.status,
+            latency=self.latency,
+            retries=self.retries,
+            request_bytes=self.request_bytes,
+            response_bytes=self.response_bytes,
+            error=self.error,
+        )
+
+
+def _body_size(body):
+    """Bytes in a request body: encoded for text, None for streams and generators that have no length"""
+    if not body:
+        return 0
+    if isinstance(body, str):
+        return len(body.encode("utf-8"))
+    try:
+        return len(body)
+    except TypeError:
+        return None
+
+
+class Instrument(object):
+    """Base sink: override before() and/or after() to observe every API call"""
+
+    def before(self, event: RequestEvent):
+        pass
+
+    def after(self, event: RequestEvent):
+        pass
+
+    def slept(self, seconds: float, reason: str):
+        """Called after the SDK deliberately waits: rate limiting, retry backoff or job polling"""
+        pass
+
+
+class Histogram(Instrument):
+    """In-memory latency histogram, request counts and byte totals per method, route and status"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS, samples: int = 1000):
+        self.buckets = tuple(buckets)
+        self.samples = samples
+        self.series = dict()
+        self._lock = threading.Lock()
+
+    def after(self, event: RequestEvent):
+        key = (event.method, event.route, event.status or "error")
+        with self._lock:
+            s = self.series.get(key)
+            if s is None:
+                s = self.series[key] = dict(
+                    count=0,
+                    sum=0.0,
+                    retries=0,
+                    request_bytes=0,
+                    response_bytes=0,
+                    buckets=[0] * (len(self.buckets) + 1),
+                    recent=deque(maxlen=self.samples),
+                )
+            s["count"] += 1
+            s["sum"] += event.latency
+            s["retries"] += event.retries
+            s["request_bytes"] += event.request_bytes or 0
+            s["response_bytes"] += event.response_bytes or 0
+            s["buckets"][bisect.bisect_left(self.buckets, event.latency)] += 1
+            s["recent"].append(event.latency)
+
+    def summary(self):
+        """Count, mean and recent p50/p95/max latency per series, slowest first"""
+        with self._lock:
+            rows = []
+            for (method, route, status), s in self.series.items():
+                recent = sorted(s["recent"])
+                rows.append(
+                    dict(
+                        method=method,
+                        route=route,
+                        status=status,
+                        count=s["count"],
+                        mean=s["sum"] / s["count"],
+                        p50=recent[len(recent) // 2],
+                        p95=recent[min(len(recent) - 1, int(len(recent) * 0.95))],
+                        max=recent[-1],
+                        retries=s["retries"],
+                        request_bytes=s["request_bytes"],
+                        response_bytes=s["response_bytes"],
+                    )
+                )
+        return sorted(rows, key=lambda r: r["p95"], reverse=True)
+
+
+class Trace(Histogram):
+    """Histogram that also keeps every request of one run, to draw a waterfall
+
+    Sleeps are kept alongside as events whose method is SLEEP and route is the reason
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.events = []
+        self.sleeps = dict()
+
+    def after(self, event: RequestEvent):
+        super().after(event)
+        with self._lock:
+            self.events.append(event)
+
+    def slept(self, seconds: float, reason: str):
+        with self._lock:
+            self.sleeps[reason] = self.sleeps.get(reason, 0.0) + seconds
+            event = RequestEvent("SLEEP", None, reason)
+            event.started -= seconds
+            event.latency = seconds
+            self.events.append(event)
+
+
+class PrometheusTextfile(Histogram):
+    """Histogram that also writes itself in Prometheus text format, for node_exporter's textfile collector
+
+    The file is rewritten at most every `interval` seconds and on flush()
+    """
+
+    def __init__(self, path: str, interval: float = 5, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.interval = interval
+        self._written = 0.0
+
+    def after(self, event: RequestEvent):
+        super().after(event)
+        if time.monotonic() - self._written >= self.interval:
+            self.flush()
+
+    def flush(self):
+        self._written = time.monotonic()
+        lines = [
+            "# HELP prelude_request_duration_seconds Prelude API request latency, retries included",
+            "# TYPE prelude_request_duration_seconds histogram",
+        ]
+        counters = dict(
+            prelude_request_retries_total="retries",
+            prelude_request_sent_bytes_total="request_bytes",
+            prelude_request_received_bytes_total="response_bytes",
+        )
+        with self._lock:
+            series = [
+                (k, dict(s, buckets=list(s["buckets"]))) for k, s in self.series.items()
+            ]
+        for (method, route, status), s in series:
+            labels = f'method="{method}",route="{route}",status="{status}"'
+            total = 0
+            for le, n in zip(self.buckets + ("+Inf",), s["buckets"]):
+                total += n
+                lines.append(
+                    f'prelude_request_duration_seconds_bucket{{{labels},le="{le}"}} {total}'
+                )
+            lines.append(f"prelude_request_duration_seconds_sum{{{labels}}} {s['sum']}")
+            lines.append(
+                f"prelude_request_duration_seconds_count{{{labels}}} {s['count']}"
+            )
+        for name, field in counters.items():
+            lines.append(f"# TYPE {name} counter")
+            for (method, route, status), s in series:
+                labels = f'method="{method}",route="{route}",status="{status}"'
+                lines.append(f"{name}{{{labels}}} {s[field]}")
+
+        part = f"{self.path}.{os.getpid()}.part"
+        with open(part, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(part, self.path)
+
+
+class OpenTelemetrySpans(Instrument):
+    """Emit an OpenTelemetry client span per API call (requires opentelemetry-api)"""
+
+    def __init__(self, tracer=None):
+        try:
+            from opentelemetry import trace
+        except ImportError:
+            raise Exception(
+                "OpenTelemetry spans require opentelemetry-api: pip install opentelemetry-api"
+            )
+        self._trace = trace
+        self.tracer = tracer or trace.get_tracer("prelude_sdk")
+
+    def before(self, event: RequestEvent):
+        event.span = self.tracer.start_span(
+            f"{event.method} {event.route}",
+            kind=self._trace.SpanKind.CLIENT,
+            attributes={
+                "http.request.method": event.method,
+                "http.route": event.route,
+                "url.full": event.url,
+            },
+        )
+
+    def after(self, event: RequestEvent):
+        span = getattr(event, "span", None)
+        if span is None:
+            return
+        if event.status is not None:
+            span.set_attribute("http.response.status_code", event.status)
+        span.set_attribute("http.request.resend_count", event.retries)
+        if event.request_bytes is not None:
+            span.set_attribute("http.request.body.size", event.request_bytes)
+        if event.response_bytes is not None:
+            span.set_attribute("http.response.body.size", event.response_bytes)
+        if event.error or (event.status or 0) >= 400:
+            span.set_status(
+                self._trace.Status(self._trace.StatusCode.ERROR, event.error)
+            )
+        span.end()
@@ -0,0 +1,116 @@
+import time
+
+from prelude_sdk.controllers.call_context import current_context
+from prelude_sdk.controllers.jobs_controller import JobsController
+
+
+class JobWaiter(object):
+    """Wait for long running jobs with exponential backoff instead of a fixed interval
+
+    The first check happens immediately and the delay between checks grows by `factor` up to
+    `ceiling` seconds, so short jobs return quickly and long ones cost few API calls. The job
+    gets a last check once `timeout` seconds have passed (None waits forever), and a
+    TimeoutError if it is still running then.
+    """
+
+    def __init__(
+        self,
+        account,
+        interval: float = 0.5,
+        factor: float = 1.5,
+        ceiling: float = 10,
+        timeout: float = None,
+    ):
+        self.account = account
+        self.interval = interval
+        self.factor = factor
+        self.ceiling = ceiling
+        self.timeout = timeout
+        self._jobs = JobsController(account)
+
+    def poll(self, fetch, done, on_update=None):
+        """Call fetch() until done(result) is true and return the last result
+
+        on_update, if given, receives every intermediate result (e.g. to report progress)
+        """
+        for _ in self._ticks():
+            result = fetch()
+            if done(result):
+                return result
+            if on_update:
+                on_update(result)
+
+    def poll_many(self, fetch, done, keys):
+        """Call fetch(key) for every key still pending on each tick, yielding (key, result, error) as each one is done
+
+        Pending keys are checked concurrently over the account's connection pool and drop out
+        of the sweep as soon as they finish. A key whose fetch raises is yielded with the error
+        and dropped, without stopping the others.
+        """
+        pending = set(keys)
+        for _ in self._ticks(pending):
+            for key, result, error in self._jobs._fan_out(fetch, list(pending)):
+                if error or done(result):
+                    pending.discard(key)
+                    yield key, result, error
+            if not pending:
+                return
+
+    def wait(self, job_id: str, on_update=None):
+        """Wait for a background job to end and return its status"""
+        return self.poll(
+            lambda: self._jobs.job_status(job_id=job_id),
+            lambda job: job.get("end_time") is not None,
+            on_update=on_update,
+        )
+
+    def wait_all(self, job_ids):
+        """Wait for many background jobs at once, yielding (job_id, status, error) as each one ends
+
+        Every tick costs a single job_statuses() call, whatever the number of jobs. A job missing
+        from that listing (e.g. one that aged out of it) is looked up on its own, and yielded
+        with the error if that lookup fails.
+        """
+        pending = set(job_ids)
+        for _ in self._ticks(pending):
+            statuses = {
+                job.get("id"): job
+                for jobs in self._jobs.job_statuses().values()
+                for job in jobs
+            }
+            missing = [job_id for job_id in pending if job_id not in statuses]
+            lookups = missing and self._jobs._fan_out(
+                lambda job_id: self._jobs.job_status(job_id=job_id), missing
+            )
+            for job_id, status, error in lookups:
+                if error:
+                    pending.discard(job_id)
+                    yield job_id, None, error
+                else:
+                    statuses[job_id] = status
+            for job_id in sorted(pending):
+                if statuses[job_id].get("end_time") is not None:
+                    pending.discard(job_id)
+                    yield job_id, statuses[job_id], None
+            if not pending:
+                return
+
+    def _ticks(self, pending=None):
+        timeout = self.timeout
+        if (remaining := current_context().remaining()) is not None:
+            timeout = min(timeout or remaining, remaining)
+        deadline = timeout and time.monotonic() + timeout
+        delay = self.interval
+        while True:
+            yield
+            wait = delay
+            if deadline:
+                if (remaining := deadline - time.monotonic()) <= 0:
+                    raise TimeoutError(
+                        "Timed out after %gs waiting for %s"
+                        % (timeout, ", ".join(sorted(pending)) if pending else "job")
+                    )
+                # the last sleep is cut short, so the job still gets one check at the deadline
+                wait = min(delay, remaining)
+            self._jobs._session.sleep(wait, "job polling")
+            delay = min(self.ceiling, delay * self.factor)
@@ -5,8 +5,7 @@ from prelude_sdk.models.account import verify_credentials
 class JobsController(HttpController):
 
     def __init__(self, account):
-        super().__init__()
-        self.account = account
+        super().__init__(account)
 
     @verify_credentials
     def job_statuses(self):
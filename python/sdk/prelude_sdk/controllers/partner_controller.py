@@ -8,8 +8,7 @@ from prelude_sdk.models.codes import Control
 class PartnerController(HttpController):
 
     def __init__(self, account):
-        super().__init__()
-        self.account = account
+        super().__init__(account)
 
     @verify_credentials
     def attach(
@@ -89,6 +88,28 @@ class PartnerController(HttpController):
             return res.json()
         raise Exception(res.text)
 
+    def iter_endpoints(
+        self,
+        partner: Control,
+        platform: str,
+        hostname: str = "",
+        page_size: int = 100,
+        prefetch: int = 1,
+    ):
+        """Iterate over every endpoint from a partner, requesting up to prefetch pages ahead"""
+
+        def fetch_page(offset, count):
+            page = self.endpoints(
+                partner=partner,
+                platform=platform,
+                hostname=hostname,
+                offset=offset,
+                count=count,
+            )
+            return [dict(edr_id=edr_id, **host) for edr_id, host in page.items()]
+
+        return self._paginate(fetch_page, page_size=page_size, prefetch=prefetch)
+
     @verify_credentials
     def generate_webhook(self, partner: Control):
         """Generate webhook credentials for an EDR system to enable the forwarding of alerts to the Prelude API, facilitating automatic alert suppression"""
@@ -185,3 +206,19 @@ class PartnerController(HttpController):
         if res.status_code == 200:
             return res.json()
         raise Exception(res.text)
+
+    def iter_advisories(
+        self,
+        partner: Control,
+        start: str = None,
+        page_size: int = 100,
+        prefetch: int = 1,
+    ):
+        """Iterate over every advisory report provided by a partner, requesting up to prefetch pages ahead"""
+        return self._paginate(
+            lambda offset, limit: self.list_advisories(
+                partner=partner, start=start, limit=limit, offset=offset
+            )["advisories"],
+            page_size=page_size,
+            prefetch=prefetch,
+        )
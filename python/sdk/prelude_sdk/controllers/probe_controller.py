@@ -4,8 +4,7 @@ from prelude_sdk.controllers.http_controller import HttpController
 class ProbeController(HttpController):
 
     def __init__(self, account):
-        super().__init__()
-        self.account = account
+        super().__init__(account)
 
     def download(self, name: str, dos: str):
         """Download a probe executable"""
@@ -15,3 +14,18 @@ class ProbeController(HttpController):
         if not res.status_code == 200:
             raise Exception(res.text)
         return res.text
+
+    def download_to(self, name: str, dos: str, dest, checksum=None, chunk_size=65536):
+        """Stream a probe executable to a path or file object
+
+        Returns its size, sha256 and path. A path is removed again if the download fails part way
+        """
+        with self._session.get(
+            f"{self.account.hq}/download/{name}",
+            headers=dict(dos=dos),
+            timeout=10,
+            stream=True,
+        ) as res:
+            if not res.status_code == 200:
+                raise Exception(res.text)
+            return self._stream_to(res, dest, checksum=checksum, chunk_size=chunk_size)
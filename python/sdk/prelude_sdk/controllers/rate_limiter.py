@@ -0,0 +1,130 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+
+
+PRELUDE_BACKOFF_MAX = float(os.getenv("PRELUDE_BACKOFF_MAX", 60))
+PRELUDE_RATE_LIMIT = float(os.getenv("PRELUDE_RATE_LIMIT", 0)) or None
+
+
+class RateLimiter(object):
+    """Adaptive token bucket shared by every controller on an account
+
+    Starts at `rate` requests per second (unlimited if None), halves its rate whenever the API
+    answers 429 and creeps back up on every success, never past `ceiling` (default `rate`). An
+    unlimited limiter only throttles after a 429 and goes back to unlimited once it climbs back
+    to `ceiling`, or to the rate it was sending at when throttled. Retry-After and rate-limit
+    headers pause all callers until the server says requests may resume.
+    """
+
+    def __init__(self, rate: float = PRELUDE_RATE_LIMIT, ceiling: float = None):
+        self.rate = rate
+        self.ceiling = ceiling or rate
+        self.tokens = rate or 0.0
+        self.paused_until = 0.0
+        self._refilled = time.monotonic()
+        self._slowed = 0.0
+        self._recover_at = None
+        self._recent = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent, returning the seconds spent waiting"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.paused_until:
+                    delay = self.paused_until - now
+                elif not self.rate or self.tokens >= 1:
+                    if self.rate:
+                        self.tokens -= 1
+                    self._recent.append(now)
+                    while self._recent and self._recent[0] < now - 1:
+                        self._recent.popleft()
+                    return waited
+                else:
+                    delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def update(self, res):
+        """Adapt to the status and rate-limit headers of a response"""
+        with self._lock:
+            now = time.monotonic()
+            if res.status_code in (429, 503) and (wait := retry_after(res)):
+                self.paused_until = max(self.paused_until, now + wait)
+            if res.status_code == 429:
+                # a burst of 429s from requests already in flight only counts once
+                if now - self._slowed > 1:
+                    if not self.rate:
+                        self._recover_at = self.ceiling or max(2, len(self._recent))
+                    self.rate = max(1.0, (self.rate or len(self._recent) or 2) / 2)
+                    self.tokens = min(self.tokens, 0.0)
+                    self._slowed = now
+                return
+
+            remaining = _header(res, "RateLimit-Remaining", "X-RateLimit-Remaining")
+            reset = _header(res, "RateLimit-Reset", "X-RateLimit-Reset")
+            if remaining is not None and remaining < 1 and reset:
+                # some APIs send an epoch timestamp, others the seconds left in the window
+                wait = reset - time.time() if reset > 1e9 else reset
+                self.paused_until = max(self.paused_until, now + max(0.0, wait))
+            if self.rate and res.status_code < 400:
+                self.rate += 1 / self.rate
+                if self._recover_at and self.rate >= self._recover_at:
+                    self.rate, self.tokens, self._recover_at = None, 0.0, None
+                elif self.ceiling:
+                    self.rate = min(self.rate, self.ceiling)
+
+    def budget(self):
+        """Current rate (requests per second), available tokens and seconds until unpaused"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            return dict(
+                rate=self.rate,
+                tokens=self.tokens if self.rate else None,
+                paused_for=max(0.0, self.paused_until - now),
+            )
+
+    def _refill(self, now):
+        if self.rate:
+            self.tokens = min(
+                max(self.rate, 1.0), self.tokens + (now - self._refilled) * self.rate
+            )
+        self._refilled = now
+
+
+def retry_after(res, maximum: float = PRELUDE_BACKOFF_MAX):
+    """Seconds the server asked us to wait, if it said so, capped at `maximum`"""
+    value = res.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        wait = float(value)
+    except ValueError:
+        try:
+            wait = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(maximum, max(0.0, wait))
+
+
+def backoff(attempt: int, factor: float, maximum: float):
+    """Full-jitter exponential backoff"""
+    return random.uniform(0, min(maximum, factor * 2**attempt))
+
+
+def _header(res, *names):
+    for name in names:
+        if (value := res.headers.get(name)) is not None:
+            try:
+                return float(value)
+            except ValueError:
+                return None
+    return None
@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import requests
+
+
+PRELUDE_CACHE_TTL = float(os.getenv("PRELUDE_CACHE_TTL", 0)) or None
+PRELUDE_CACHE_DIR = os.getenv("PRELUDE_CACHE_DIR")
+
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+class ResponseCache(object):
+    """Opt-in TTL/LRU cache for read-mostly catalog responses, kept in memory or on disk
+
+    Entries are grouped per hq and account, keyed by profile and full URL. Fresh entries are
+    served without a round-trip; expired ones carrying an ETag are revalidated with
+    If-None-Match. Any successful mutation under /build/ drops the account's entries.
+    """
+
+    def __init__(self, ttl: float = 300, max_entries: int = 1024, path: str = None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.path = Path(path).expanduser() if path else None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def namespace(hq: str, headers: dict):
+        """Entries are shared per hq and account, and dropped together on invalidation"""
+        account = f'{hq}|{headers.get("account")}'
+        return hashlib.sha256(account.encode()).hexdigest()[:16]
+
+    def get(self, namespace: str, key: str):
+        """The cached entry for a key, fresh or not, or None"""
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            if entry:
+                self._entries.move_to_end((namespace, key))
+                return entry
+        if self.path:
+            try:
+                entry = json.loads(self._file(namespace, key).read_text())
+            except (OSError, ValueError):
+                return None
+            self._remember(namespace, key, entry)
+            return entry
+        return None
+
+    def put(self, namespace: str, key: str, entry: dict):
+        entry["stored"] = time.time()
+        self._remember(namespace, key, entry)
+        if self.path:
+            file = self._file(namespace, key)
+            file.parent.mkdir(parents=True, exist_ok=True)
+            part = file.with_name(f"{file.name}.{threading.get_ident()}.part")
+            part.write_text(json.dumps(entry))
+            os.replace(part, file)
+            self._evict_files()
+
+    def fresh(self, entry: dict):
+        """Whether an entry may be served without revalidation (always, with a ttl of None)"""
+        return self.ttl is None or time.time() - entry["stored"] < self.ttl
+
+    def invalidate(self, namespace: str = None):
+        """Drop every entry, or only those of one namespace"""
+        with self._lock:
+            for k in [k for k in self._entries if namespace in (None, k[0])]:
+                del self._entries[k]
+        if self.path:
+            shutil.rmtree(
+                self.path / namespace if namespace else self.path, ignore_errors=True
+            )
+
+    def on_response(self, res, *args, **kwargs):
+        """Session response hook dropping an account's entries once it changes the catalog"""
+        req = res.request
+        if req.method not in SAFE_METHODS and res.ok and "/build/" in req.path_url:
+            hq = res.url[: res.url.index(req.path_url)]
+            self.invalidate(self.namespace(hq, req.headers))
+
+    @staticmethod
+    def entry(res):
+        return dict(
+            body=res.content.decode("latin-1"),
+            content_type=res.headers.get("Content-Type"),
+            etag=res.headers.get("ETag"),
+            url=res.url,
+        )
+
+    @staticmethod
+    def response(entry: dict):
+        """Rebuild a response from a cached entry"""
+        res = requests.Response()
+        res.status_code = 200
+        res.url = entry["url"]
+        res._content = entry["body"].encode("latin-1")
+        res.encoding = "utf-8"
+        if entry.get("content_type"):
+            res.headers["Content-Type"] = entry["content_type"]
+        if entry.get("etag"):
+            res.headers["ETag"] = entry["etag"]
+        res.from_cache = True
+        return res
+
+    def _remember(self, namespace, key, entry):
+        with self._lock:
+            self._entries[(namespace, key)] = entry
+            self._entries.move_to_end((namespace, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _file(self, namespace, key):
+        return (
+            self.path / namespace / f"{hashlib.sha256(key.encode()).hexdigest()}.json"
+        )
+
+    def _evict_files(self):
+        files = list(self.path.glob("*/*.json"))
+        if len(files) <= self.max_entries:
+            return
+        files.sort(key=_mtime)
+        for f in files[: len(files) - self.max_entries]:
+            f.unlink(missing_ok=True)
+
+
+def _mtime(file):
+    try:
+        return file.stat().st_mtime
+    except FileNotFoundError:
+        return 0
+
+
+def default_cache():
+    """The cache configured through PRELUDE_CACHE_TTL and PRELUDE_CACHE_DIR, if any"""
+    if PRELUDE_CACHE_TTL:
+        return ResponseCache(ttl=PRELUDE_CACHE_TTL, path=PRELUDE_CACHE_DIR)
+    return None
@@ -8,13 +8,18 @@ class ScmController(HttpController):
     default = -1
 
     def __init__(self, account):
-        super().__init__()
-        self.account = account
+        super().__init__(account)
 
     @verify_credentials
-    def endpoints(self, filter: str = None, orderby: str = None, top: int = None):
+    def endpoints(
+        self,
+        filter: str = None,
+        orderby: str = None,
+        top: int = None,
+        skip: int = None,
+    ):
         """List endpoints with SCM analysis"""
-        params = {"$filter": filter, "$orderby": orderby, "$top": top}
+        params = {"$filter": filter, "$orderby": orderby, "$top": top, "$skip": skip}
         res = self._session.get(
             f"{self.account.hq}/scm/endpoints",
             headers=self.account.headers,
@@ -26,9 +31,15 @@ class ScmController(HttpController):
         raise Exception(res.text)
 
     @verify_credentials
-    def inboxes(self, filter: str = None, orderby: str = None, top: int = None):
+    def inboxes(
+        self,
+        filter: str = None,
+        orderby: str = None,
+        top: int = None,
+        skip: int = None,
+    ):
         """List inboxes with SCM analysis"""
-        params = {"$filter": filter, "$orderby": orderby, "$top": top}
+        params = {"$filter": filter, "$orderby": orderby, "$top": top, "$skip": skip}
         res = self._session.get(
             f"{self.account.hq}/scm/inboxes",
             headers=self.account.headers,
@@ -40,9 +51,15 @@ class ScmController(HttpController):
         raise Exception(res.text)
 
     @verify_credentials
-    def users(self, filter: str = None, orderby: str = None, top: int = None):
+    def users(
+        self,
+        filter: str = None,
+        orderby: str = None,
+        top: int = None,
+        skip: int = None,
+    ):
         """List users with SCM analysis"""
-        params = {"$filter": filter, "$orderby": orderby, "$top": top}
+        params = {"$filter": filter, "$orderby": orderby, "$top": top, "$skip": skip}
         res = self._session.get(
             f"{self.account.hq}/scm/users",
             headers=self.account.headers,
@@ -53,6 +70,54 @@ class ScmController(HttpController):
             return res.json()
         raise Exception(res.text)
 
+    def iter_endpoints(
+        self,
+        filter: str = None,
+        orderby: str = None,
+        page_size: int = 1000,
+        prefetch: int = 1,
+    ):
+        """Iterate over every endpoint with SCM analysis, paging transparently"""
+        return self._paginate(
+            lambda skip, top: self.endpoints(
+                filter=filter, orderby=orderby, top=top, skip=skip
+            ),
+            page_size=page_size,
+            prefetch=prefetch,
+        )
+
+    def iter_inboxes(
+        self,
+        filter: str = None,
+        orderby: str = None,
+        page_size: int = 1000,
+        prefetch: int = 1,
+    ):
+        """Iterate over every inbox with SCM analysis, paging transparently"""
+        return self._paginate(
+            lambda skip, top: self.inboxes(
+                filter=filter, orderby=orderby, top=top, skip=skip
+            ),
+            page_size=page_size,
+            prefetch=prefetch,
+        )
+
+    def iter_users(
+        self,
+        filter: str = None,
+        orderby: str = None,
+        page_size: int = 1000,
+        prefetch: int = 1,
+    ):
+        """Iterate over every user with SCM analysis, paging transparently"""
+        return self._paginate(
+            lambda skip, top: self.users(
+                filter=filter, orderby=orderby, top=top, skip=skip
+            ),
+            page_size=page_size,
+            prefetch=prefetch,
+        )
+
     @verify_credentials
     def technique_summary(self, techniques: str):
         """Get policy evaluation summary by technique"""
@@ -1,25 +1,28 @@
 import configparser
+import contextvars
 import os
+import threading
+from collections import namedtuple
 from functools import wraps
 from os.path import exists
 from pathlib import Path
+from types import MappingProxyType
+
+
+Credentials = namedtuple("Credentials", ["account", "profile", "hq", "headers"])
+
+_call_credentials = contextvars.ContextVar("prelude_credentials", default=None)
 
 
 def verify_credentials(func):
     @wraps(verify_credentials)
     def handler(*args, **kwargs):
         try:
-            cfg = args[0].account.read_keychain_config()
-            args[0].account.profile = next(
-                s for s in cfg.sections() if s == args[0].account.profile
-            )
-            args[0].account.hq = cfg.get(args[0].account.profile, "hq")
-            args[0].account.headers = dict(
-                account=cfg.get(args[0].account.profile, "account"),
-                token=cfg.get(args[0].account.profile, "token"),
-                _product="py-sdk",
-            )
-            return func(*args, **kwargs)
+            token = _call_credentials.set(args[0].account.credentials())
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _call_credentials.reset(token)
         except FileNotFoundError:
             raise Exception(
                 "Please create a %s file" % args[0].account.keychain_location
@@ -37,17 +40,69 @@ def verify_credentials(func):
 
 
 class Account:
+    """Profile, keychain and connection settings shared by every controller built from it
+
+    Controllers are safe to use from many threads: each call resolves the profile once into
+    immutable Credentials, and profile, hq and headers read during that call come from them,
+    whatever other threads do to the account meanwhile
+    """
 
     def __init__(
         self,
         profile="default",
         hq="https://api.preludesecurity.com",
         keychain_location=os.path.join(Path.home(), ".prelude", "keychain.ini"),
+        pool_size=None,
+        cache=None,
     ):
         self.profile = profile
         self.hq = hq
         self.headers = dict()
         self.keychain_location = keychain_location
+        self.pool_size = pool_size
+        self.session = None
+        self.cache = cache
+        self._credentials = dict()
+        self._keychain_lock = threading.Lock()
+
+    def _call(self):
+        credentials = _call_credentials.get()
+        return credentials if credentials and credentials.account is self else None
+
+    @property
+    def profile(self):
+        call = self._call()
+        return call.profile if call else self._profile
+
+    @profile.setter
+    def profile(self, profile):
+        self._profile = profile
+
+    @property
+    def hq(self):
+        call = self._call()
+        return call.hq if call else self._hq
+
+    @hq.setter
+    def hq(self, hq):
+        self._hq = hq
+
+    @property
+    def headers(self):
+        call = self._call()
+        return call.headers if call else self._headers
+
+    @headers.setter
+    def headers(self, headers):
+        self._headers = headers
+
+    def credentials(self):
+        """Resolve the current profile into the immutable credentials of one call"""
+        profile = self._profile
+        hq, headers = self.resolve_credentials(profile)
+        # keep the last resolved values visible outside of calls, as before
+        self._hq, self._headers = hq, dict(headers)
+        return Credentials(self, profile, hq, MappingProxyType(dict(headers)))
 
     def configure(
         self,
@@ -78,6 +133,37 @@ class Account:
     def write_keychain_config(self, cfg):
         with open(self.keychain_location, "w") as f:
             cfg.write(f)
+        self.reload()
+
+    def resolve_credentials(self, profile: str = None):
+        """Resolve the hq and headers of a profile (the current one by default), re-reading the keychain only when it changes on disk"""
+        profile = profile or self._profile
+        try:
+            stat = os.stat(self.keychain_location)
+            stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            stamp = None
+
+        cached = self._credentials.get(profile)
+        if stamp and cached and cached[0] == stamp:
+            return cached[1], cached[2]
+
+        with self._keychain_lock:
+            cfg = self.read_keychain_config()
+            profile = next(s for s in cfg.sections() if s == profile)
+            hq = cfg.get(profile, "hq")
+            headers = dict(
+                account=cfg.get(profile, "account"),
+                token=cfg.get(profile, "token"),
+                _product="py-sdk",
+            )
+            if stamp:
+                self._credentials[profile] = (stamp, hq, headers)
+        return hq, headers
+
+    def reload(self):
+        """Drop cached credentials so the next call re-reads the keychain"""
+        self._credentials.clear()
 
     @staticmethod
     def generate_config(account_id, token, hq, handle, profile):
@@ -3,7 +3,9 @@ import uuid
 
 from prelude_sdk.controllers.build_controller import BuildController
 from prelude_sdk.controllers.iam_controller import IAMController
+from prelude_sdk.models import account as keychain
 from prelude_sdk.models.codes import Control
+from testutils import StubAPI
 
 
 @pytest.fixture(scope="session")
@@ -54,6 +56,21 @@ def pytest_addoption(parser):
     )
 
 
+@pytest.fixture
+def stub_api():
+    api = StubAPI().start()
+    yield api
+    api.stop()
+
+
+@pytest.fixture
+def stub_account(stub_api, tmp_path):
+    """A keychain account pointed at the local stub API"""
+    account = keychain.Account(keychain_location=str(tmp_path / "keychain.ini"))
+    account.configure("stub", "stub-token", "stub@example.com", hq=stub_api.url)
+    return account
+
+
 @pytest.fixture(scope="session")
 def api(pytestconfig):
     return pytestconfig.getoption("api")
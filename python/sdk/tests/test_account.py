@@ -0,0 +1,75 @@
+import os
+
+import pytest
+
+from prelude_sdk.models.account import Account
+
+
+@pytest.fixture
+def account(tmp_path):
+    account = Account(keychain_location=str(tmp_path / "keychain.ini"))
+    account.configure("acct", "token-1", "a@x", hq="http://hq", profile="default")
+    account.reads = 0
+    read = account.read_keychain_config
+
+    def counting(*args, **kwargs):
+        account.reads += 1
+        return read(*args, **kwargs)
+
+    account.read_keychain_config = counting
+    return account
+
+
+def rewrite(account, **replace):
+    """Change the keychain behind the account's back, the way another process would"""
+    path = account.keychain_location
+    with open(path) as f:
+        text = f.read()
+    for old, new in replace.items():
+        text = text.replace(old, new)
+    with open(f"{path}.tmp", "w") as f:
+        f.write(text)
+    stat = os.stat(path)
+    os.replace(f"{path}.tmp", path)
+    return stat
+
+
+class TestResolveCredentials:
+
+    def test_unchanged_keychain_is_read_once(self, account):
+        for _ in range(5):
+            hq, headers = account.resolve_credentials()
+
+        assert account.reads == 1
+        assert hq == "http://hq"
+        assert headers["token"] == "token-1"
+
+    def test_rewritten_keychain_is_read_again(self, account):
+        account.resolve_credentials()
+        rewrite(account, **{"token-1": "token-22"})
+
+        assert account.resolve_credentials()[1]["token"] == "token-22"
+        assert account.reads == 2
+
+    def test_replaced_keychain_with_same_size_and_mtime(self, account):
+        account.resolve_credentials()
+        old = rewrite(account, **{"token-1": "token-2"})
+        os.utime(account.keychain_location, ns=(old.st_atime_ns, old.st_mtime_ns))
+
+        assert account.resolve_credentials()[1]["token"] == "token-2"
+        assert account.reads == 2
+
+    def test_configure_drops_the_cache(self, account):
+        account.resolve_credentials()
+        account.configure("acct", "token-3", "a@x", hq="http://hq", profile="default")
+
+        assert account.resolve_credentials()[1]["token"] == "token-3"
+
+    def test_profiles_are_cached_separately(self, account):
+        account.configure("other", "token-b", "b@x", hq="http://hq-b", profile="b")
+        account.reads = 0
+
+        assert account.resolve_credentials("b")[0] == "http://hq-b"
+        assert account.resolve_credentials("default")[0] == "http://hq"
+        assert account.resolve_credentials("b")[0] == "http://hq-b"
+        assert account.reads == 2
@@ -0,0 +1,85 @@
+import time
+from datetime import datetime, timedelta
+
+from dateutil.parser import isoparse
+
+from prelude_sdk.controllers.detect_controller import DetectController
+
+
+START = datetime(2024, 1, 1)
+
+
+def window_echo(request):
+    start, finish = isoparse(request.query["start"]), isoparse(request.query["finish"])
+    # earlier windows answer last, so completion order differs from chronological order
+    time.sleep(max(0.0, 0.2 - (start - START).days * 0.05))
+    return 200, [
+        dict(start=start.isoformat(), finish=finish.isoformat(), n=n) for n in range(2)
+    ]
+
+
+def windows(records):
+    return [
+        (isoparse(r["start"]), isoparse(r["finish"])) for r in records if r["n"] == 0
+    ]
+
+
+class TestIterActivity:
+
+    def test_windows_cover_the_range_without_gaps_or_overlap(
+        self, stub_api, stub_account
+    ):
+        stub_api.routes["GET /detect/activity"] = window_echo
+        detect = DetectController(stub_account)
+
+        records = list(
+            detect.iter_activity(
+                dict(start=START, finish=START + timedelta(days=3, hours=12)),
+                max_workers=4,
+            )
+        )
+
+        found = windows(records)
+        assert found[0][0] == START
+        assert found[-1][1] == START + timedelta(days=3, hours=12)
+        for (_, finish), (start, _) in zip(found, found[1:]):
+            assert start - finish == timedelta(microseconds=1)
+        assert [finish - start for start, finish in found] == [
+            timedelta(days=1, microseconds=-1)
+        ] * 3 + [timedelta(hours=12)]
+
+    def test_records_yielded_in_chronological_order(self, stub_api, stub_account):
+        stub_api.routes["GET /detect/activity"] = window_echo
+        detect = DetectController(stub_account)
+
+        records = list(
+            detect.iter_activity(
+                dict(start="2024-01-01T00:00:00", finish="2024-01-04T23:59:59"),
+                chunk=timedelta(days=1),
+                max_workers=4,
+            )
+        )
+
+        assert [(r["start"][:10], r["n"]) for r in records] == [
+            (day, n)
+            for day in ("2024-01-01", "2024-01-02", "2024-01-03", "2024-01-04")
+            for n in range(2)
+        ]
+        assert stub_api.peak > 1
+
+    def test_aggregate_views_yield_one_result_per_window(self, stub_api, stub_account):
+        stub_api.routes["GET /detect/activity"] = lambda request: (
+            200,
+            dict(view=request.query["view"], start=request.query["start"]),
+        )
+        detect = DetectController(stub_account)
+
+        results = list(
+            detect.iter_activity(
+                dict(start=START, finish=START + timedelta(days=1)), view="metrics"
+            )
+        )
+
+        # the last window is the single microsecond at the finish
+        assert [r["view"] for r in results] == ["metrics", "metrics"]
+        assert isoparse(results[1]["start"]) == START + timedelta(days=1)
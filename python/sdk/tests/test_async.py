@@ -0,0 +1,72 @@
+import asyncio
+import inspect
+import time
+
+from prelude_sdk.controllers.async_controller import (
+    AsyncDetectController,
+    AsyncScmController,
+)
+
+
+ENDPOINTS = [dict(id=str(i)) for i in range(25)]
+
+
+def page(request):
+    skip, top = int(request.query["$skip"]), int(request.query["$top"])
+    return 200, ENDPOINTS[skip : skip + top]
+
+
+class TestAsync:
+
+    def test_coroutine(self, stub_api, stub_account):
+        stub_api.routes["GET /detect/tests"] = lambda _: (200, [dict(id="t1")])
+
+        async def main():
+            async with AsyncDetectController(stub_account) as detect:
+                return await asyncio.gather(*(detect.list_tests() for _ in range(3)))
+
+        assert asyncio.run(main()) == [[dict(id="t1")]] * 3
+
+    def test_generators_become_async_generators(self):
+        assert inspect.isasyncgenfunction(AsyncScmController.iter_endpoints)
+        assert inspect.isasyncgenfunction(AsyncDetectController.iter_activity)
+        assert inspect.iscoroutinefunction(AsyncDetectController.list_tests)
+
+    def test_async_generator_does_not_block_the_loop(self, stub_api, stub_account):
+        stub_api.latency = 0.05
+        stub_api.routes["GET /scm/endpoints"] = page
+        ticks = []
+
+        async def ticker():
+            while True:
+                ticks.append(1)
+                await asyncio.sleep(0.01)
+
+        async def main():
+            task = asyncio.create_task(ticker())
+            async with AsyncScmController(stub_account) as scm:
+                records = [
+                    e async for e in scm.iter_endpoints(page_size=10, prefetch=0)
+                ]
+            task.cancel()
+            return records
+
+        assert asyncio.run(main()) == ENDPOINTS
+        # four pages (the last one empty) at 50ms each: the ticker kept running meanwhile
+        assert len(ticks) >= 10
+        assert stub_api.count("GET", "/scm/endpoints") == 4
+
+    def test_async_generator_closes_early(self, stub_api, stub_account):
+        stub_api.routes["GET /scm/endpoints"] = page
+
+        async def main():
+            async with AsyncScmController(stub_account) as scm:
+                items = scm.iter_endpoints(page_size=10, prefetch=0)
+                first = await anext(items)
+                await items.aclose()
+                return first
+
+        assert asyncio.run(main()) == ENDPOINTS[0]
+        # the second page may already be in flight when the first is yielded, never the third
+        time.sleep(0.1)
+        assert stub_api.count("GET", "/scm/endpoints") <= 2
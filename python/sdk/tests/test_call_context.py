@@ -0,0 +1,83 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from prelude_sdk.controllers.async_controller import AsyncDetectController
+from prelude_sdk.controllers.call_context import (
+    CallContext,
+    call_context,
+    current_context,
+    propagate,
+)
+from prelude_sdk.controllers.detect_controller import DetectController
+
+
+class TestCallContext:
+
+    def test_explicit_timeout_used_unless_configured(self):
+        context = CallContext(
+            connect=1,
+            timeouts={"GET /detect/tests/{id}": 5, "/detect/threats": (2, 7)},
+        )
+        assert context.timeout("GET", "/detect/tests", 10) == (1, 10)
+        assert context.timeout("GET", "/detect/tests/{id}", 10) == (1, 5)
+        assert context.timeout("POST", "/detect/tests/{id}", 10) == (1, 10)
+        assert context.timeout("POST", "/detect/threats", 10) == (2, 7)
+        assert CallContext().timeout("GET", "/detect/activity", 60) == (
+            pytest.approx(3.05),
+            60,
+        )
+
+    def test_timeouts_shrink_to_the_deadline(self):
+        with call_context(deadline=2, connect=5):
+            connect, read = current_context().timeout("GET", "/detect/tests", 10)
+        assert 1.5 < connect <= 2 and 1.5 < read <= 2
+
+    def test_nested_contexts_keep_the_nearest_deadline(self):
+        with call_context(deadline=1) as outer:
+            with call_context(deadline=60) as inner:
+                assert inner.deadline == outer.deadline
+
+    def test_propagate_carries_the_deadline_to_pool_threads(self):
+        with call_context(deadline=30) as context:
+            with ThreadPoolExecutor(max_workers=1) as pool:
+                propagated = pool.submit(propagate(lambda: current_context().deadline))
+                plain = pool.submit(lambda: current_context().deadline)
+        assert propagated.result() == context.deadline
+        assert plain.result() is None
+
+
+class TestDeadline:
+
+    def test_fan_out_calls_stop_at_the_deadline(self, stub_api, stub_account):
+        stub_api.latency = 0.2
+        stub_api.routes["DELETE /detect/endpoint"] = lambda _: (200, dict())
+        detect = DetectController(stub_account)
+
+        started = time.monotonic()
+        with call_context(deadline=0.3):
+            results = list(
+                detect.bulk_delete_endpoints(
+                    [f"e{i}" for i in range(20)], max_workers=2
+                )
+            )
+
+        assert time.monotonic() - started < 1
+        failed = [r for r in results if r["status"] == "FAILED"]
+        assert len(results) == 20
+        assert 16 <= len(failed) < 20
+        assert all("Deadline exceeded" in r["error"] for r in failed)
+
+    def test_async_calls_honour_the_deadline(self, stub_api, stub_account):
+        stub_api.latency = 0.5
+        stub_api.routes["GET /detect/tests"] = lambda _: (200, [])
+
+        async def main():
+            async with AsyncDetectController(stub_account) as detect:
+                with call_context(deadline=0.1):
+                    return await detect.list_tests()
+
+        with pytest.raises(TimeoutError):
+            asyncio.run(main())
@@ -0,0 +1,89 @@
+from prelude_sdk.controllers.catalog_controller import CatalogController
+
+
+def publish(stub_api, catalog):
+    """Serve every kind of the catalog as a listing plus one route per record"""
+    stub_api.routes.clear()
+    for kind, records in catalog.items():
+        stub_api.routes[f"GET /detect/{kind}"] = lambda _, records=records: (
+            200,
+            list(records.values()),
+        )
+        for id, record in records.items():
+            stub_api.routes[f"GET /detect/{kind}/{id}"] = lambda _, record=record: (
+                200,
+                record,
+            )
+
+
+def fetched(stub_api, kind):
+    return sorted(
+        hit.path.rsplit("/", 1)[-1]
+        for hit in stub_api.hits
+        if hit.path.startswith(f"/detect/{kind}/")
+    )
+
+
+class TestCatalogSync:
+
+    def test_second_sync_fetches_only_changes(self, stub_api, stub_account, tmp_path):
+        catalog = dict(
+            tests={
+                "t1": dict(id="t1", name="one", technique="T1001"),
+                "t2": dict(id="t2", name="two", technique="T1002"),
+                "t3": dict(id="t3", name="three", technique="T1001"),
+            },
+            threats={"h1": dict(id="h1", source="cisa", tests=["t1", "t2"])},
+            detections={"d1": dict(id="d1", test="t1")},
+            threat_hunts=dict(),
+        )
+        publish(stub_api, catalog)
+        catalog_db = CatalogController(stub_account, path=str(tmp_path / "c.db"))
+
+        first = catalog_db.sync()
+
+        assert first["tests"] == dict(
+            added=3, updated=0, removed=0, unchanged=0, failed=[]
+        )
+        assert first["threats"]["added"] == first["detections"]["added"] == 1
+        assert [t["id"] for t in catalog_db.tests(threat_id="h1")] == ["t1", "t2"]
+
+        catalog["tests"]["t2"] = dict(id="t2", name="renamed", technique="T1002")
+        catalog["tests"]["t4"] = dict(id="t4", name="four", technique="T1003")
+        del catalog["tests"]["t3"]
+        catalog["threats"]["h1"]["tests"] = ["t1"]
+        publish(stub_api, catalog)
+        stub_api.hits.clear()
+
+        second = catalog_db.sync()
+
+        assert second["tests"] == dict(
+            added=1, updated=1, removed=1, unchanged=1, failed=[]
+        )
+        assert second["threats"] == dict(
+            added=0, updated=1, removed=0, unchanged=0, failed=[]
+        )
+        assert second["detections"]["unchanged"] == 1
+        assert fetched(stub_api, "tests") == ["t2", "t4"]
+        assert fetched(stub_api, "detections") == []
+        assert sorted(t["id"] for t in catalog_db.tests()) == ["t1", "t2", "t4"]
+        assert [t["name"] for t in catalog_db.tests(technique="T1002")] == ["renamed"]
+        assert [t["id"] for t in catalog_db.tests(threat_id="h1")] == ["t1"]
+        catalog_db.close()
+
+    def test_failed_fetch_is_retried_next_sync(self, stub_api, stub_account, tmp_path):
+        catalog = dict(tests={"t1": dict(id="t1"), "t2": dict(id="t2")})
+        publish(stub_api, catalog)
+        del stub_api.routes["GET /detect/tests/t2"]
+        catalog_db = CatalogController(stub_account, path=str(tmp_path / "c.db"))
+
+        first = catalog_db.sync(kinds=["tests"])
+        publish(stub_api, catalog)
+        second = catalog_db.sync(kinds=["tests"])
+
+        assert first["tests"]["added"] == 1
+        assert [f["id"] for f in first["tests"]["failed"]] == ["t2"]
+        assert second["tests"] == dict(
+            added=1, updated=0, removed=0, unchanged=1, failed=[]
+        )
+        catalog_db.close()
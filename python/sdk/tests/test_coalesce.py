@@ -0,0 +1,92 @@
+import threading
+
+import pytest
+import requests
+
+from prelude_sdk.controllers import http_controller
+from prelude_sdk.controllers.detect_controller import DetectController
+
+
+CALLERS = 8
+
+
+def concurrently(call):
+    barrier = threading.Barrier(CALLERS)
+    results = [None] * CALLERS
+
+    def run(i):
+        barrier.wait()
+        try:
+            results[i] = call()
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(CALLERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class TestCoalescing:
+
+    def test_one_upstream_request_with_independent_responses(
+        self, stub_api, stub_account
+    ):
+        stub_api.latency = 0.3
+        stub_api.routes["GET /detect/tests/t1"] = lambda _: (
+            200,
+            dict(id="t1"),
+            {"ETag": '"v1"'},
+        )
+        detect = DetectController(stub_account)
+        url = f"{stub_api.url}/detect/tests/t1"
+
+        responses = concurrently(
+            lambda: detect._session.get(url, headers=dict(token="stub-token"))
+        )
+
+        assert stub_api.count("GET", "/detect/tests/t1") == 1
+        assert [res.json() for res in responses] == [dict(id="t1")] * CALLERS
+        assert sum(bool(getattr(res, "coalesced", False)) for res in responses) == (
+            CALLERS - 1
+        )
+        assert len({id(res.headers) for res in responses}) == CALLERS
+        responses[0].headers["ETag"] = '"changed"'
+        responses[0].json()["id"] = "changed"
+        assert all(res.headers["ETag"] == '"v1"' for res in responses[1:])
+        assert all(res.json() == dict(id="t1") for res in responses[1:])
+
+    def test_public_calls_share_one_request(self, stub_api, stub_account):
+        stub_api.latency = 0.3
+        stub_api.routes["GET /detect/tests/t1"] = lambda _: (200, dict(id="t1"))
+        detect = DetectController(stub_account)
+
+        results = concurrently(lambda: detect.get_test("t1"))
+
+        assert stub_api.count("GET", "/detect/tests/t1") == 1
+        assert results == [dict(id="t1")] * CALLERS
+        results[0]["id"] = "changed"
+        assert results[1] == dict(id="t1")
+
+    def test_followers_raise_their_own_exception(
+        self, stub_api, stub_account, monkeypatch
+    ):
+        monkeypatch.setattr(http_controller, "PRELUDE_BACKOFF_TOTAL", 0)
+
+        def drop(_):
+            raise ConnectionResetError()
+
+        stub_api.latency = 0.3
+        stub_api.routes["GET /detect/tests/t1"] = drop
+        detect = DetectController(stub_account)
+
+        errors = concurrently(lambda: detect.get_test("t1"))
+
+        assert stub_api.count("GET", "/detect/tests/t1") == 1
+        assert all(isinstance(e, requests.ConnectionError) for e in errors)
+        assert len({id(e) for e in errors}) == CALLERS
+        followers = [e for e in errors if any(e.__cause__ is o for o in errors)]
+        assert len(followers) == CALLERS - 1
+        assert len({id(e.__cause__) for e in followers}) == 1
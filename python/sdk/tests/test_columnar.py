@@ -0,0 +1,97 @@
+import warnings
+
+import pytest
+
+from prelude_sdk.controllers.columnar import (
+    ACTIVITY_LOGS,
+    arrow_schema,
+    record_batches,
+    write_parquet,
+)
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+def logs(n, **extra):
+    return [
+        dict(endpoint_id=f"e{i}", test="t1", status=100 + i % 3, dos="linux") | extra
+        for i in range(n)
+    ]
+
+
+class TestWriteParquet:
+
+    def test_round_trip_with_late_fields(self, tmp_path):
+        records = (
+            [dict(id="a", count=1, tags=None)] * 3
+            + [dict(id="b", count=2.5, tags=["x", "y"], seen="2024-01-01")]
+            + [dict(id="c", count="many")]
+        )
+
+        res = write_parquet(iter(records), tmp_path / "out.parquet", batch_size=2)
+
+        assert res["rows"] == 5
+        assert res["columns"] == ["id", "count", "tags", "seen"]
+        table = pq.read_table(tmp_path / "out.parquet")
+        assert str(table.schema.field("count").type) == "string"
+        assert table.to_pylist()[3] == dict(
+            id="b", count="2.5", tags='["x", "y"]', seen="2024-01-01"
+        )
+        assert table.to_pylist()[0]["seen"] is None
+
+    def test_numbers_widen_to_float(self, tmp_path):
+        records = [dict(score=1), dict(score=2), dict(score=2.5)]
+        write_parquet(records, tmp_path / "out.parquet", batch_size=2)
+        table = pq.read_table(tmp_path / "out.parquet")
+        assert str(table.schema.field("score").type) == "double"
+        assert table.column("score").to_pylist() == [1.0, 2.0, 2.5]
+
+    def test_declared_schema_keeps_types_and_warns_on_extra(self, tmp_path):
+        records = logs(3) + logs(2, os="linux", policy=None, control=1, extra="z")
+
+        with pytest.warns(UserWarning, match="extra"):
+            res = write_parquet(
+                records,
+                tmp_path / "out.parquet",
+                schema=arrow_schema(ACTIVITY_LOGS),
+                batch_size=2,
+            )
+
+        assert res["columns"] == [name for name, _ in ACTIVITY_LOGS] + ["extra"]
+        table = pq.read_table(tmp_path / "out.parquet")
+        assert str(table.schema.field("status").type) == "int64"
+        assert str(table.schema.field("policy").type) == "string"
+        assert table.column("extra").to_pylist() == [None] * 3 + ["z"] * 2
+
+    def test_declared_schema_without_extra_fields_is_quiet(self, tmp_path):
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            res = write_parquet(
+                logs(3), tmp_path / "out.parquet", schema=arrow_schema(ACTIVITY_LOGS)
+            )
+        assert res["rows"] == 3
+
+    def test_strict_rejects_unknown_fields(self, tmp_path):
+        with pytest.raises(ValueError, match="extra"):
+            write_parquet(
+                logs(3) + logs(1, extra="z"),
+                tmp_path / "out.parquet",
+                schema=arrow_schema(ACTIVITY_LOGS),
+                strict=True,
+            )
+
+    def test_empty_export_with_schema(self, tmp_path):
+        res = write_parquet(
+            [], tmp_path / "out.parquet", schema=arrow_schema(ACTIVITY_LOGS)
+        )
+        assert res["rows"] == 0
+        assert pq.read_table(tmp_path / "out.parquet").num_rows == 0
+
+
+class TestRecordBatches:
+
+    def test_late_fields_raise_instead_of_dropping(self):
+        batches = record_batches(logs(2) + logs(1, extra="z"), batch_size=2)
+        assert next(batches).num_rows == 2
+        with pytest.raises(ValueError, match="extra"):
+            next(batches)
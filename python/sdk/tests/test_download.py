@@ -0,0 +1,83 @@
+import hashlib
+
+from prelude_sdk.controllers.detect_controller import DetectController
+
+
+CONTENT = bytes(range(256)) * 64
+PATH = "/detect/tests/t1/t1.go"
+
+
+def serve(etag):
+    def handler(request):
+        if request.headers.get("If-None-Match") == etag:
+            return 304, b""
+        ranged = request.headers.get("Range")
+        if ranged and request.headers.get("If-Range") == etag:
+            start = int(ranged.removeprefix("bytes=").rstrip("-"))
+            return (
+                206,
+                CONTENT[start:],
+                {
+                    "ETag": etag,
+                    "Content-Range": f"bytes {start}-{len(CONTENT) - 1}/{len(CONTENT)}",
+                },
+            )
+        return 200, CONTENT, {"ETag": etag}
+
+    return handler
+
+
+class TestDownload:
+
+    def test_resume_partial_download(self, stub_api, stub_account, tmp_path):
+        stub_api.routes[f"GET {PATH}"] = serve('"v1"')
+        dest = tmp_path / "t1.go.part"
+        dest.write_bytes(CONTENT[:1000])
+        (tmp_path / "t1.go.part.etag").write_text('"v1"')
+
+        res = DetectController(stub_account).download_to(
+            "t1", "t1.go", dest, resume=True
+        )
+
+        assert stub_api.hits[-1].headers["Range"] == "bytes=1000-"
+        assert dest.read_bytes() == CONTENT
+        assert res == dict(
+            size=len(CONTENT),
+            sha256=hashlib.sha256(CONTENT).hexdigest(),
+            etag='"v1"',
+            path=str(dest),
+        )
+        assert not (tmp_path / "t1.go.part.etag").exists()
+
+    def test_changed_file_starts_over(self, stub_api, stub_account, tmp_path):
+        stub_api.routes[f"GET {PATH}"] = serve('"v2"')
+        dest = tmp_path / "t1.go.part"
+        dest.write_bytes(b"stale bytes of an older version")
+        (tmp_path / "t1.go.part.etag").write_text('"v1"')
+
+        res = DetectController(stub_account).download_to(
+            "t1", "t1.go", dest, resume=True
+        )
+
+        assert dest.read_bytes() == CONTENT
+        assert res["size"] == len(CONTENT)
+
+    def test_without_validator_downloads_everything(
+        self, stub_api, stub_account, tmp_path
+    ):
+        stub_api.routes[f"GET {PATH}"] = serve('"v1"')
+        dest = tmp_path / "t1.go.part"
+        dest.write_bytes(CONTENT[:1000])
+
+        DetectController(stub_account).download_to("t1", "t1.go", dest, resume=True)
+
+        assert "Range" not in stub_api.hits[-1].headers
+        assert dest.read_bytes() == CONTENT
+
+    def test_not_modified(self, stub_api, stub_account, tmp_path):
+        stub_api.routes[f"GET {PATH}"] = serve('"v1"')
+        dest = tmp_path / "t1.go"
+        assert (
+            DetectController(stub_account).download_to("t1", "t1.go", dest, etag='"v1"')
+            is None
+        )
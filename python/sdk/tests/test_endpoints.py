@@ -0,0 +1,102 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from prelude_sdk.controllers.detect_controller import DetectController
+
+
+class TestBulkEndpoints:
+
+    def test_register_reports_rows_missing_columns(self, stub_api, stub_account):
+        stub_api.routes["POST /detect/endpoint"] = lambda r: (
+            200,
+            f'token-{json.loads(r.body)["id"]}'.encode(),
+        )
+        rows = [
+            dict(host="web-1", serial_num="abc"),
+            dict(serial_num="def"),
+            dict(host="web-3", serial_num=""),
+        ]
+
+        results = list(DetectController(stub_account).register_endpoints(rows))
+
+        assert len(results) == 3
+        by_serial = {r["serial_num"]: r for r in results}
+        assert by_serial["abc"]["token"] == "token-web-1:abc"
+        assert by_serial["def"]["error"] == "Missing host"
+        assert by_serial[""]["error"] == "Missing serial_num"
+        assert stub_api.count("POST", "/detect/endpoint") == 1
+
+    def test_update_rejects_rows_without_tags(self, stub_api, stub_account):
+        stub_api.routes["POST /detect/endpoint/e1"] = lambda r: (
+            200,
+            json.loads(r.body),
+        )
+        rows = [dict(endpoint_id="e1", tags="grp-1"), dict(endpoint_id="e2"), dict()]
+
+        results = list(DetectController(stub_account).bulk_update_endpoints(rows))
+
+        statuses = {r["endpoint_id"]: (r["status"], r["error"]) for r in results}
+        assert statuses == {
+            "e1": ("SUCCEEDED", None),
+            "e2": ("FAILED", "No tags to update"),
+            None: ("FAILED", "Missing endpoint_id"),
+        }
+        assert json.loads(stub_api.hits[0].body) == dict(tags="grp-1")
+        assert len(stub_api.hits) == 1
+
+
+def ago(days, fmt="%Y-%m-%dT%H:%M:%S.%fZ"):
+    return (datetime.now(timezone.utc) - timedelta(days=days)).strftime(fmt)
+
+
+ENDPOINTS = [
+    dict(endpoint_id="fresh", last_seen=ago(1), tags=["web"]),
+    dict(endpoint_id="stale", last_seen=ago(40), tags=["db"]),
+    dict(endpoint_id="stale-short-fraction", last_seen=ago(40)[:-5] + "Z"),
+    dict(endpoint_id="stale-naive", last_seen=ago(40, "%Y-%m-%d %H:%M:%S")),
+    dict(endpoint_id="new-never-seen", last_seen=None, created=ago(2)),
+    dict(endpoint_id="old-never-seen", last_seen=None, created=ago(60)),
+    dict(endpoint_id="unknown-age", last_seen=None),
+]
+
+
+class TestSelectEndpoints:
+
+    def test_stale_endpoints(self, stub_api, stub_account):
+        stub_api.routes["GET /detect/endpoint"] = lambda _: (200, ENDPOINTS)
+
+        selected = DetectController(stub_account).select_endpoints(stale_days=30)
+
+        assert [e["endpoint_id"] for e in selected] == [
+            "stale",
+            "stale-short-fraction",
+            "stale-naive",
+            "old-never-seen",
+        ]
+        assert stub_api.hits[-1].query["days"] == "120"
+
+    def test_stale_with_tags(self, stub_api, stub_account):
+        stub_api.routes["GET /detect/endpoint"] = lambda _: (200, ENDPOINTS)
+
+        selected = DetectController(stub_account).select_endpoints(
+            stale_days=30, tags="db,web"
+        )
+
+        assert [e["endpoint_id"] for e in selected] == ["stale"]
+
+    def test_tags_only_lists_default_window(self, stub_api, stub_account):
+        stub_api.routes["GET /detect/endpoint"] = lambda _: (200, ENDPOINTS)
+
+        selected = DetectController(stub_account).select_endpoints(tags="web")
+
+        assert [e["endpoint_id"] for e in selected] == ["fresh"]
+        assert stub_api.hits[-1].query["days"] == "90"
+
+    def test_days_must_exceed_stale_days(self, stub_api, stub_account):
+        with pytest.raises(ValueError):
+            list(
+                DetectController(stub_account).select_endpoints(days=30, stale_days=30)
+            )
+        assert not stub_api.hits
@@ -0,0 +1,105 @@
+import random
+import threading
+import time
+
+import pytest
+
+from prelude_sdk.controllers.http_controller import HttpController
+from prelude_sdk.controllers.scm_controller import ScmController
+
+
+RECORDS = list(range(25))
+
+
+class TestPaginate:
+
+    def setup_method(self):
+        self.offsets = []
+        self.lock = threading.Lock()
+
+    def fetch_page(self, offset, limit):
+        with self.lock:
+            self.offsets.append(offset)
+        return RECORDS[offset : offset + limit]
+
+    @pytest.mark.parametrize("prefetch", [0, 2])
+    def test_pages_until_short_page(self, prefetch):
+        records = list(HttpController._paginate(self.fetch_page, 10, prefetch))
+        assert records == RECORDS
+        assert sorted(self.offsets)[:3] == [0, 10, 20]
+
+    @pytest.mark.parametrize("prefetch", [0, 2])
+    def test_server_capped_pages_are_not_truncated(self, prefetch):
+        def capped(offset, limit):
+            return self.fetch_page(offset, min(limit, 7))
+
+        records = list(HttpController._paginate(capped, 10, prefetch))
+        assert records == RECORDS
+        assert {0, 7, 14, 21, 25} <= set(self.offsets)
+
+    def test_scm_listing_capped_by_the_server(self, stub_api, stub_account):
+        endpoints = [dict(id=str(i)) for i in range(2500)]
+
+        def capped(request):
+            skip, top = int(request.query["$skip"]), int(request.query["$top"])
+            return 200, endpoints[skip : skip + min(top, 500)]
+
+        stub_api.routes["GET /scm/endpoints"] = capped
+        scm = ScmController(stub_account)
+
+        assert list(scm.iter_endpoints()) == endpoints
+        skips = sorted({int(h.query["$skip"]) for h in stub_api.hits})
+        assert skips[:6] == [0, 500, 1000, 1500, 2000, 2500]
+
+    def test_exact_multiple_stops_on_empty_page(self):
+        records = list(HttpController._paginate(self.fetch_page, 5))
+        assert records == RECORDS
+        assert self.offsets == [0, 5, 10, 15, 20, 25]
+
+    @pytest.mark.parametrize("page_size", [0, -1])
+    def test_rejects_bad_page_size(self, page_size):
+        with pytest.raises(ValueError):
+            HttpController._paginate(self.fetch_page, page_size)
+        assert not self.offsets
+
+    def test_rejects_negative_prefetch(self):
+        with pytest.raises(ValueError):
+            HttpController._paginate(self.fetch_page, 10, prefetch=-1)
+
+
+class TestFanOut:
+
+    def test_ordered_keeps_input_order(self, stub_account):
+        controller = HttpController(stub_account)
+
+        def slow(i):
+            time.sleep(random.random() / 100)
+            return i * 2
+
+        results = list(controller._fan_out_ordered(slow, range(50), max_workers=8))
+        assert results == [i * 2 for i in range(50)]
+
+    def test_ordered_stops_on_error(self, stub_account):
+        controller = HttpController(stub_account)
+
+        def fail_on_three(i):
+            if i == 3:
+                raise RuntimeError("boom")
+            return i
+
+        results = controller._fan_out_ordered(fail_on_three, range(10), max_workers=4)
+        assert [next(results) for _ in range(3)] == [0, 1, 2]
+        with pytest.raises(RuntimeError):
+            next(results)
+
+    def test_unordered_reports_errors_per_item(self, stub_account):
+        controller = HttpController(stub_account)
+
+        def fail_on_odd(i):
+            if i % 2:
+                raise RuntimeError(i)
+            return i
+
+        results = list(controller._fan_out(fail_on_odd, range(10), max_workers=4))
+        assert sorted(i for i, r, e in results if e is None) == [0, 2, 4, 6, 8]
+        assert sorted(e.args[0] for _, _, e in results if e) == [1, 3, 5, 7, 9]
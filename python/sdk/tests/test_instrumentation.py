@@ -0,0 +1,135 @@
+import pytest
+import requests
+
+from prelude_sdk.controllers.detect_controller import DetectController
+from prelude_sdk.controllers.instrumentation import (
+    Histogram,
+    PrometheusTextfile,
+    RequestEvent,
+    route_template,
+)
+
+
+UUID = "0b5b4b1f-4a07-4d2b-9a3c-7f4c1d2e3f40"
+
+
+def event(latency, method="GET", route="/detect/tests/{id}", status=200, **kwargs):
+    e = RequestEvent(method, None, route)
+    e.latency, e.status = latency, status
+    for k, v in kwargs.items():
+        setattr(e, k, v)
+    return e
+
+
+@pytest.mark.parametrize(
+    "path,expected",
+    [
+        (f"/detect/tests/{UUID}", "/detect/tests/{id}"),
+        (f"/scm/policies/{UUID}", "/scm/policies/{id}"),
+        (f"/detect/tests/{UUID}/{UUID}.go?x=1", "/detect/tests/{id}/{id}"),
+        ("/jobs/statuses/1234", "/jobs/statuses/{id}"),
+        ("/detect/endpoint/a1b2c3d4e5f60718", "/detect/endpoint/{id}"),
+        ("/detect/endpoint/host:serial", "/detect/endpoint/{id}"),
+        ("/detect/techniques", "/detect/techniques"),
+        ("/scm/evaluations/CROWDSTRIKE/abc", "/scm/evaluations/CROWDSTRIKE/abc"),
+    ],
+)
+def test_route_template(path, expected):
+    assert route_template(path) == expected
+
+
+class TestHistogram:
+
+    def test_buckets_are_inclusive_upper_bounds(self):
+        histogram = Histogram(buckets=(0.1, 1))
+        for latency in (0.05, 0.1, 0.5, 1, 3):
+            histogram.after(event(latency))
+
+        series = histogram.series[("GET", "/detect/tests/{id}", 200)]
+        assert series["buckets"] == [2, 2, 1]
+        assert series["count"] == 5
+        assert series["sum"] == pytest.approx(4.65)
+
+    def test_series_per_status_and_summary(self):
+        histogram = Histogram()
+        for latency in (0.1, 0.2, 0.3):
+            histogram.after(event(latency, retries=1, response_bytes=10))
+        histogram.after(event(2, status=None, error="timed out"))
+
+        rows = {row["status"]: row for row in histogram.summary()}
+        assert rows["error"]["count"] == 1
+        assert rows[200]["p50"] == 0.2
+        assert rows[200]["retries"] == 3
+        assert rows[200]["response_bytes"] == 30
+        assert histogram.summary()[0]["status"] == "error"
+
+
+class TestPrometheusTextfile:
+
+    def test_flush_writes_cumulative_buckets(self, tmp_path):
+        path = tmp_path / "prelude.prom"
+        sink = PrometheusTextfile(str(path), interval=3600, buckets=(0.1, 1))
+        sink.after(event(0.05, request_bytes=5, response_bytes=100))
+        sink.after(event(0.5, retries=2))
+        sink.flush()
+
+        lines = path.read_text().splitlines()
+        labels = 'method="GET",route="/detect/tests/{id}",status="200"'
+        assert "# TYPE prelude_request_duration_seconds histogram" in lines
+        assert (
+            f'prelude_request_duration_seconds_bucket{{{labels},le="0.1"}} 1' in lines
+        )
+        assert f'prelude_request_duration_seconds_bucket{{{labels},le="1"}} 2' in lines
+        assert (
+            f'prelude_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2' in lines
+        )
+        assert f"prelude_request_duration_seconds_count{{{labels}}} 2" in lines
+        assert f"prelude_request_retries_total{{{labels}}} 2" in lines
+        assert f"prelude_request_sent_bytes_total{{{labels}}} 5" in lines
+        assert f"prelude_request_received_bytes_total{{{labels}}} 100" in lines
+        assert not list(tmp_path.glob("*.part"))
+
+    def test_records_real_calls(self, stub_api, stub_account, tmp_path):
+        stub_api.routes[f"GET /detect/tests/{UUID}"] = lambda _: (200, dict(id=UUID))
+        detect = DetectController(stub_account)
+        sink = detect.add_instrument(
+            PrometheusTextfile(str(tmp_path / "prelude.prom"), interval=0)
+        )
+
+        detect.get_test(UUID)
+
+        text = (tmp_path / "prelude.prom").read_text()
+        assert 'route="/detect/tests/{id}",status="200"' in text
+        assert sink.summary()[0]["count"] == 1
+
+
+class TestRequestBytes:
+
+    def finished(self, body):
+        res = requests.Response()
+        res.status_code = 200
+        res.request = requests.Request("POST", "http://hq/x").prepare()
+        res.request.body = body
+        e = RequestEvent("POST", None, "/x")
+        e.finish(res)
+        return e.request_bytes
+
+    def test_text_is_counted_in_encoded_bytes(self):
+        assert self.finished("héllo ✓") == 10
+        assert self.finished(b"hello") == 5
+        assert self.finished(None) == 0
+
+    def test_bodies_without_length(self, tmp_path):
+        assert self.finished(iter([b"a", b"b"])) is None
+        with open(tmp_path / "upload", "wb+") as f:
+            assert self.finished(f) is None
+
+    def test_real_call_with_unicode_body(self, stub_api, stub_account):
+        stub_api.routes["POST /detect/endpoint"] = lambda _: (200, b"token")
+        detect = DetectController(stub_account)
+        sink = detect.add_instrument(Histogram())
+
+        detect.register_endpoint(host="hôst", serial_num="1")
+
+        sent = len(stub_api.hits[-1].body)
+        assert sink.summary()[0]["request_bytes"] == sent
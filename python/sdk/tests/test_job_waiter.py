@@ -0,0 +1,156 @@
+import time
+
+import pytest
+
+from prelude_sdk.controllers.build_controller import BuildController
+from prelude_sdk.controllers.instrumentation import Instrument
+from prelude_sdk.controllers.job_waiter import JobWaiter
+
+
+class Sleeps(Instrument):
+    def __init__(self):
+        self.seconds = []
+
+    def slept(self, seconds, reason):
+        if reason == "job polling":
+            self.seconds.append(seconds)
+
+
+def finishes_after(polls):
+    def handler(request):
+        job_id = request.path.rsplit("/", 1)[-1]
+        seen[job_id] = seen.get(job_id, 0) + 1
+        if seen[job_id] < polls.get(job_id, 1):
+            return 200, dict(id=job_id, end_time=None)
+        return 200, dict(id=job_id, end_time="2024-01-01T00:00:00Z", successful=True)
+
+    seen = dict()
+    return handler
+
+
+class TestJobWaiter:
+
+    def test_wait_backs_off_until_done(self, stub_api, stub_account):
+        stub_api.routes["GET /jobs/statuses/j1"] = finishes_after(dict(j1=4))
+        waiter = JobWaiter(stub_account, interval=0.01, factor=2, ceiling=0.03)
+        sleeps = waiter._jobs.add_instrument(Sleeps())
+        updates = []
+
+        status = waiter.wait("j1", on_update=updates.append)
+
+        assert status["successful"]
+        assert len(updates) == 3
+        assert sleeps.seconds == [0.01, 0.02, 0.03]
+        assert stub_api.count("GET", "/jobs/statuses/j1") == 4
+
+    def test_wait_times_out(self, stub_api, stub_account):
+        stub_api.routes["GET /jobs/statuses/j1"] = finishes_after(dict(j1=1000))
+        waiter = JobWaiter(stub_account, interval=0.01, ceiling=0.01, timeout=0.1)
+
+        with pytest.raises(TimeoutError):
+            waiter.wait("j1")
+
+    def test_last_check_at_the_deadline(self, stub_api, stub_account):
+        done_at = time.monotonic() + 0.25
+        stub_api.routes["GET /jobs/statuses/j1"] = lambda _: (
+            200,
+            dict(
+                end_time="2024-01-01T00:00:00Z" if time.monotonic() > done_at else None
+            ),
+        )
+        # checks at 0 and 0.2s, then the 0.4s sleep is cut short to the 0.3s deadline
+        waiter = JobWaiter(stub_account, interval=0.2, factor=2, timeout=0.3)
+
+        assert waiter.wait("j1")["end_time"]
+        assert stub_api.count("GET", "/jobs/statuses/j1") == 3
+
+    def test_poll_many_drops_keys_as_they_finish(self, stub_api, stub_account):
+        handler = finishes_after(dict(a=1, b=2, c=3))
+        for job_id in "abc":
+            stub_api.routes[f"GET /jobs/statuses/{job_id}"] = handler
+        waiter = JobWaiter(stub_account, interval=0.01)
+
+        finished = [
+            job_id
+            for job_id, status, error in waiter.poll_many(
+                lambda job_id: waiter._jobs.job_status(job_id=job_id),
+                lambda job: job["end_time"] is not None,
+                "abc",
+            )
+        ]
+
+        assert finished == ["a", "b", "c"]
+        assert [stub_api.count("GET", f"/jobs/statuses/{j}") for j in "abc"] == [
+            1,
+            2,
+            3,
+        ]
+
+    def test_poll_many_reports_errors_per_job(self, stub_api, stub_account):
+        stub_api.routes["GET /build/compile/ok"] = lambda _: (
+            200,
+            dict(status="COMPLETE"),
+        )
+        stub_api.routes["GET /build/compile/slow"] = lambda _: (
+            200,
+            dict(
+                status=(
+                    "RUNNING"
+                    if stub_api.count("GET", "/build/compile/slow") < 2
+                    else "COMPLETE"
+                )
+            ),
+        )
+        stub_api.routes["GET /build/compile/gone"] = lambda _: (404, b"no such job")
+        build = BuildController(stub_account)
+
+        results = {
+            job_id: (status, error and str(error))
+            for job_id, status, error in build.wait_for_compiles(["ok", "slow", "gone"])
+        }
+
+        assert results["ok"] == (dict(status="COMPLETE"), None)
+        assert results["gone"] == (None, "no such job")
+        assert results["slow"] == (dict(status="COMPLETE"), None)
+        assert stub_api.count("GET", "/build/compile/slow") == 2
+        assert stub_api.count("GET", "/build/compile/gone") == 1
+
+    def test_wait_all_makes_one_listing_call_per_tick(self, stub_api, stub_account):
+        ticks = []
+
+        def listing(_):
+            ticks.append(None)
+            jobs = [
+                dict(
+                    id=job_id,
+                    end_time="2024-01-01T00:00:00Z" if ends <= len(ticks) else None,
+                )
+                for job_id, ends in dict(a=1, b=2, c=3).items()
+            ]
+            return 200, dict(SCM_SYNC=jobs[:2], SCM_EXPORT=jobs[2:])
+
+        stub_api.routes["GET /jobs/statuses"] = listing
+        stub_api.routes["GET /jobs/statuses/old"] = lambda _: (
+            200,
+            dict(id="old", end_time="2024-01-01T00:00:00Z"),
+        )
+        stub_api.routes["GET /jobs/statuses/gone"] = lambda _: (404, b"no such job")
+        waiter = JobWaiter(stub_account, interval=0.01)
+
+        results = [
+            (job_id, status and status["id"], error and str(error))
+            for job_id, status, error in waiter.wait_all(["a", "b", "c", "old", "gone"])
+        ]
+
+        assert sorted(results[:3]) == [
+            ("a", "a", None),
+            ("gone", None, "no such job"),
+            ("old", "old", None),
+        ]
+        assert results[3:] == [("b", "b", None), ("c", "c", None)]
+        assert stub_api.count("GET", "/jobs/statuses") == 3
+        assert stub_api.count("GET", "/jobs/statuses/old") == 1
+        assert not any(stub_api.count("GET", f"/jobs/statuses/{j}") for j in "abc")
+
+    def test_waits_forever_by_default(self, stub_account):
+        assert JobWaiter(stub_account).timeout is None
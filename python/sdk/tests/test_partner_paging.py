@@ -0,0 +1,80 @@
+import pytest
+
+from prelude_sdk.controllers.partner_controller import PartnerController
+from prelude_sdk.models.codes import Control
+
+
+HOSTS = {f"edr-{i:02}": dict(hostname=f"host-{i}") for i in range(23)}
+ADVISORIES = [dict(id=f"adv-{i}") for i in range(12)]
+
+
+def endpoints_page(request):
+    offset, count = int(request.query["offset"]), int(request.query["count"])
+    return 200, dict(list(HOSTS.items())[offset : offset + count])
+
+
+def advisories_page(request):
+    offset, limit = int(request.query.get("offset", 0)), int(request.query["limit"])
+    return 200, dict(advisories=ADVISORIES[offset : offset + limit])
+
+
+class TestPartnerPaging:
+
+    @pytest.mark.parametrize("prefetch", [0, 2])
+    def test_iter_endpoints(self, stub_api, stub_account, prefetch):
+        stub_api.routes["GET /partner/endpoints/CROWDSTRIKE"] = endpoints_page
+        partner = PartnerController(stub_account)
+
+        endpoints = list(
+            partner.iter_endpoints(
+                Control.CROWDSTRIKE, "windows", page_size=10, prefetch=prefetch
+            )
+        )
+
+        assert endpoints == [dict(edr_id=k, **v) for k, v in HOSTS.items()]
+        offsets = sorted(
+            int(h.query["offset"])
+            for h in stub_api.hits
+            if h.path == "/partner/endpoints/CROWDSTRIKE"
+        )
+        assert offsets[:4] == [0, 10, 20, 23]
+        assert all(h.query["platform"] == "windows" for h in stub_api.hits)
+
+    def test_iter_advisories(self, stub_api, stub_account):
+        stub_api.routes["GET /partner/advisories/CROWDSTRIKE"] = advisories_page
+        partner = PartnerController(stub_account)
+
+        advisories = list(
+            partner.iter_advisories(
+                Control.CROWDSTRIKE, start="2024-01-01", page_size=5, prefetch=0
+            )
+        )
+
+        assert advisories == ADVISORIES
+        assert [int(h.query.get("offset", 0)) for h in stub_api.hits] == [
+            0,
+            5,
+            10,
+            12,
+        ]
+        assert all(h.query["start"] == "2024-01-01" for h in stub_api.hits)
+
+    def test_empty_listing_makes_one_request(self, stub_api, stub_account):
+        stub_api.routes["GET /partner/advisories/CROWDSTRIKE"] = lambda _: (
+            200,
+            dict(advisories=[]),
+        )
+        partner = PartnerController(stub_account)
+
+        assert list(partner.iter_advisories(Control.CROWDSTRIKE, prefetch=0)) == []
+        assert len(stub_api.hits) == 1
+
+    def test_errors_surface_from_the_iterator(self, stub_api, stub_account):
+        stub_api.routes["GET /partner/advisories/CROWDSTRIKE"] = lambda _: (
+            403,
+            b"forbidden",
+        )
+        partner = PartnerController(stub_account)
+
+        with pytest.raises(Exception, match="forbidden"):
+            list(partner.iter_advisories(Control.CROWDSTRIKE))
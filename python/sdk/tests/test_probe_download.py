@@ -0,0 +1,111 @@
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from prelude_sdk.controllers import http_controller
+from prelude_sdk.controllers.probe_controller import ProbeController
+from prelude_sdk.models.account import Account
+
+
+PROBE = bytes(range(256)) * 512
+
+
+class TruncatingHandler(BaseHTTPRequestHandler):
+    """Promises the whole probe, then drops the connection part way through"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(PROBE)))
+        self.end_headers()
+        self.wfile.write(PROBE[:1000])
+        self.wfile.flush()
+        self.close_connection = True
+
+    def log_message(self, *_):
+        pass
+
+
+@pytest.fixture
+def probe(stub_api, tmp_path):
+    # probes download without credentials, from the account's hq
+    account = Account(hq=stub_api.url, keychain_location=str(tmp_path / "keychain.ini"))
+    return ProbeController(account)
+
+
+@pytest.fixture
+def truncating_probe(tmp_path):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), TruncatingHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    account = Account(
+        hq=f"http://127.0.0.1:{server.server_port}",
+        keychain_location=str(tmp_path / "keychain.ini"),
+    )
+    yield ProbeController(account)
+    server.shutdown()
+    server.server_close()
+
+
+class TestProbeDownload:
+
+    def test_streams_to_path(self, stub_api, probe, tmp_path):
+        stub_api.routes["GET /download/nocturnal"] = lambda request: (
+            200 if request.headers["dos"] == "linux-x86_64" else 400,
+            PROBE,
+        )
+        dest = tmp_path / "nocturnal"
+
+        res = probe.download_to(
+            "nocturnal",
+            "linux-x86_64",
+            dest,
+            checksum=hashlib.sha256(PROBE).hexdigest(),
+            chunk_size=1024,
+        )
+
+        assert dest.read_bytes() == PROBE
+        assert res == dict(
+            size=len(PROBE),
+            sha256=hashlib.sha256(PROBE).hexdigest(),
+            etag=None,
+            path=str(dest),
+        )
+
+    def test_streams_to_file_object(self, stub_api, probe, tmp_path):
+        stub_api.routes["GET /download/nocturnal"] = lambda _: (200, PROBE)
+
+        with open(tmp_path / "nocturnal", "wb") as f:
+            res = probe.download_to("nocturnal", "linux", f)
+
+        assert (tmp_path / "nocturnal").read_bytes() == PROBE
+        assert res["path"] is None
+
+    def test_checksum_mismatch_removes_the_file(self, stub_api, probe, tmp_path):
+        stub_api.routes["GET /download/nocturnal"] = lambda _: (200, PROBE)
+        dest = tmp_path / "nocturnal"
+
+        with pytest.raises(Exception, match="Checksum mismatch"):
+            probe.download_to("nocturnal", "linux", dest, checksum="0" * 64)
+        assert not dest.exists()
+
+    def test_dropped_stream_removes_the_partial_file(
+        self, truncating_probe, tmp_path, monkeypatch
+    ):
+        monkeypatch.setattr(http_controller, "PRELUDE_BACKOFF_TOTAL", 0)
+        dest = tmp_path / "nocturnal"
+
+        with pytest.raises(requests.exceptions.ChunkedEncodingError):
+            truncating_probe.download_to("nocturnal", "linux", dest)
+        assert not dest.exists()
+
+    def test_error_status_writes_nothing(self, stub_api, probe, tmp_path):
+        stub_api.routes["GET /download/nocturnal"] = lambda _: (404, b"no such probe")
+        dest = tmp_path / "nocturnal"
+
+        with pytest.raises(Exception, match="no such probe"):
+            probe.download_to("nocturnal", "linux", dest)
+        assert not dest.exists()
@@ -0,0 +1,188 @@
+import time
+from email.utils import formatdate
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+from prelude_sdk.controllers import http_controller
+from prelude_sdk.controllers.build_controller import BuildController
+from prelude_sdk.controllers.detect_controller import DetectController
+from prelude_sdk.controllers.rate_limiter import RateLimiter, retry_after
+
+
+def response(status_code=200, **headers):
+    return SimpleNamespace(
+        status_code=status_code,
+        headers={k.replace("_", "-"): str(v) for k, v in headers.items()},
+    )
+
+
+def throttle(limiter):
+    limiter._slowed = 0.0
+    limiter.update(response(429))
+
+
+class TestRateLimiter:
+
+    def test_429_halves_rate(self):
+        limiter = RateLimiter(rate=8)
+        throttle(limiter)
+        assert limiter.rate == 4
+        throttle(limiter)
+        assert limiter.rate == 2
+
+    def test_burst_of_429s_halves_once(self):
+        limiter = RateLimiter(rate=8)
+        for _ in range(5):
+            limiter.update(response(429))
+        assert limiter.rate == 4
+
+    def test_rate_never_drops_below_one(self):
+        limiter = RateLimiter(rate=1)
+        throttle(limiter)
+        assert limiter.rate == 1
+
+    def test_recovers_up_to_ceiling(self):
+        limiter = RateLimiter(rate=8)
+        throttle(limiter)
+        for _ in range(100):
+            limiter.update(response(200))
+        assert limiter.rate == 8
+
+    def test_errors_do_not_recover(self):
+        limiter = RateLimiter(rate=8)
+        throttle(limiter)
+        limiter.update(response(500))
+        assert limiter.rate == 4
+
+    def test_unlimited_throttles_then_returns_to_unlimited(self):
+        limiter = RateLimiter(rate=None)
+        for _ in range(10):
+            limiter.acquire()
+        throttle(limiter)
+        assert limiter.rate == 5
+        for _ in range(100):
+            limiter.update(response(200))
+            if limiter.rate is None:
+                break
+        assert limiter.rate is None
+        assert limiter.budget()["tokens"] is None
+
+    def test_unlimited_with_ceiling_recovers_at_ceiling(self):
+        limiter = RateLimiter(rate=None, ceiling=3)
+        throttle(limiter)
+        assert limiter.rate == 1
+        limiter.update(response(200))
+        assert limiter.rate == 2
+        rates = []
+        while limiter.rate:
+            rates.append(limiter.rate)
+            limiter.update(response(200))
+        assert rates == pytest.approx([2.0, 2.5, 2.9])
+
+    def test_retry_after_pauses_callers(self):
+        limiter = RateLimiter(rate=None)
+        limiter.update(response(429, Retry_After=0.2))
+        assert limiter.budget()["paused_for"] > 0.1
+        assert limiter.acquire() > 0.1
+
+    def test_exhausted_budget_pauses_until_reset(self):
+        limiter = RateLimiter(rate=None)
+        limiter.update(response(200, RateLimit_Remaining=0, RateLimit_Reset=5))
+        assert 4 < limiter.budget()["paused_for"] <= 5
+
+
+class TestRetryAfter:
+
+    @pytest.mark.parametrize(
+        "headers,expected",
+        [
+            (dict(), None),
+            (dict(Retry_After=3), 3),
+            (dict(Retry_After=-3), 0),
+            (dict(Retry_After="soon"), None),
+            (dict(Retry_After=86400), 60),
+        ],
+    )
+    def test_seconds(self, headers, expected):
+        assert retry_after(response(429, **headers), maximum=60) == expected
+
+    def test_http_date(self):
+        res = response(429, Retry_After=formatdate(time.time() + 30, usegmt=True))
+        assert 28 <= retry_after(res) <= 30
+
+    def test_http_date_capped(self):
+        res = response(429, Retry_After=formatdate(time.time() + 3600, usegmt=True))
+        assert retry_after(res, maximum=10) == 10
+
+
+def responds(*statuses, **headers):
+    """Handler answering with each status in turn, then 200"""
+    statuses = list(statuses)
+
+    def handler(_):
+        if statuses:
+            return statuses.pop(0), b"busy", headers
+        return 200, [dict(id="t1")]
+
+    return handler
+
+
+class TestRetries:
+
+    @pytest.fixture(autouse=True)
+    def fast_backoff(self, monkeypatch):
+        monkeypatch.setattr(http_controller, "PRELUDE_BACKOFF_FACTOR", 0.01)
+
+    def test_429_waits_for_retry_after(self, stub_api, stub_account):
+        stub_api.routes["GET /detect/tests"] = responds(429, **{"Retry-After": "0.3"})
+        detect = DetectController(stub_account)
+
+        started = time.monotonic()
+        assert detect.list_tests() == [dict(id="t1")]
+
+        assert stub_api.count("GET", "/detect/tests") == 2
+        assert time.monotonic() - started >= 0.3
+
+    def test_gateway_errors_retried_for_get(self, stub_api, stub_account):
+        stub_api.routes["GET /detect/tests"] = responds(502, 503, 504)
+        detect = DetectController(stub_account)
+
+        assert detect.list_tests() == [dict(id="t1")]
+        assert stub_api.count("GET", "/detect/tests") == 4
+
+    def test_gateway_errors_not_retried_for_post(self, stub_api, stub_account):
+        stub_api.routes["POST /build/tests"] = responds(503)
+        build = BuildController(stub_account)
+
+        with pytest.raises(Exception, match="busy"):
+            build.create_test(name="t", unit="custom")
+        assert stub_api.count("POST", "/build/tests") == 1
+
+    def test_429_retried_for_post(self, stub_api, stub_account):
+        stub_api.routes["POST /build/tests"] = responds(429, **{"Retry-After": "0"})
+        build = BuildController(stub_account)
+
+        assert build.create_test(name="t", unit="custom") == [dict(id="t1")]
+        assert stub_api.count("POST", "/build/tests") == 2
+
+    def test_dropped_connection_not_retried_for_post(self, stub_api, stub_account):
+        def drop(_):
+            raise ConnectionResetError()
+
+        stub_api.routes["POST /build/tests"] = drop
+        build = BuildController(stub_account)
+
+        with pytest.raises(requests.ConnectionError):
+            build.create_test(name="t", unit="custom")
+        assert stub_api.count("POST", "/build/tests") == 1
+
+    def test_gives_up_after_the_retry_budget(self, stub_api, stub_account, monkeypatch):
+        monkeypatch.setattr(http_controller, "PRELUDE_BACKOFF_TOTAL", 2)
+        stub_api.routes["GET /detect/tests"] = responds(*[503] * 10)
+        detect = DetectController(stub_account)
+
+        with pytest.raises(Exception, match="busy"):
+            detect.list_tests()
+        assert stub_api.count("GET", "/detect/tests") == 3
@@ -0,0 +1,98 @@
+import time
+
+from prelude_sdk.controllers.build_controller import BuildController
+from prelude_sdk.controllers.detect_controller import DetectController
+from prelude_sdk.controllers.response_cache import ResponseCache
+from prelude_sdk.models import account as keychain
+
+
+def serve(etag='"v1"'):
+    def handler(request):
+        if request.headers.get("If-None-Match") == etag:
+            return 304, b""
+        return 200, dict(id=request.path.rsplit("/", 1)[-1]), {"ETag": etag}
+
+    return handler
+
+
+class TestResponseCache:
+
+    def test_fresh_entries_skip_the_api(self, stub_api, stub_account):
+        stub_api.routes["GET /detect/tests/t1"] = serve()
+        stub_account.cache = ResponseCache()
+        detect = DetectController(stub_account)
+
+        assert detect.get_test("t1") == detect.get_test("t1") == dict(id="t1")
+        assert stub_api.count("GET", "/detect/tests/t1") == 1
+
+    def test_expired_entries_are_revalidated(self, stub_api, stub_account):
+        stub_api.routes["GET /detect/tests/t1"] = serve()
+        stub_account.cache = ResponseCache(ttl=0.05)
+        detect = DetectController(stub_account)
+
+        detect.get_test("t1")
+        time.sleep(0.1)
+        assert detect.get_test("t1") == dict(id="t1")
+        assert stub_api.hits[-1].headers["If-None-Match"] == '"v1"'
+        assert stub_api.count("GET", "/detect/tests/t1") == 2
+
+    def test_no_ttl_never_expires(self):
+        cache = ResponseCache(ttl=None)
+        assert cache.fresh(dict(stored=0))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = ResponseCache(max_entries=2)
+        cache.put("ns", "a", dict(body="a"))
+        cache.put("ns", "b", dict(body="b"))
+        cache.get("ns", "a")
+        cache.put("ns", "c", dict(body="c"))
+
+        assert cache.get("ns", "a")["body"] == "a"
+        assert cache.get("ns", "b") is None
+        assert cache.get("ns", "c")["body"] == "c"
+
+    def test_disk_entries_survive_the_process(self, stub_api, stub_account, tmp_path):
+        stub_api.routes["GET /detect/tests/t1"] = serve()
+        for _ in range(2):
+            account = keychain.Account(
+                keychain_location=stub_account.keychain_location,
+                cache=ResponseCache(path=tmp_path / "cache"),
+            )
+            DetectController(account).get_test("t1")
+
+        assert stub_api.count("GET", "/detect/tests/t1") == 1
+        assert len(list((tmp_path / "cache").glob("*/*.json"))) == 1
+
+    def test_disk_eviction(self, tmp_path):
+        cache = ResponseCache(max_entries=2, path=tmp_path)
+        for key in "abc":
+            cache.put("ns", key, dict(body=key))
+            time.sleep(0.01)
+
+        assert len(list(tmp_path.glob("*/*.json"))) == 2
+        assert ResponseCache(path=tmp_path).get("ns", "a") is None
+
+    def test_build_changes_invalidate(self, stub_api, stub_account):
+        stub_api.routes["GET /detect/tests/t1"] = serve()
+        stub_api.routes["POST /build/tests/t1"] = lambda _: (200, dict(id="t1"))
+        stub_account.cache = ResponseCache()
+        detect = DetectController(stub_account)
+
+        detect.get_test("t1")
+        BuildController(stub_account).update_test("t1", name="renamed")
+        detect.get_test("t1")
+
+        assert stub_api.count("GET", "/detect/tests/t1") == 2
+
+    def test_cache_set_after_first_call_is_invalidated(self, stub_api, stub_account):
+        stub_api.routes["GET /detect/tests/t1"] = serve()
+        stub_api.routes["POST /build/tests/t1"] = lambda _: (200, dict(id="t1"))
+        detect = DetectController(stub_account)
+        detect.get_test("t1")
+
+        stub_account.cache = ResponseCache()
+        detect.get_test("t1")
+        BuildController(stub_account).update_test("t1", name="renamed")
+        detect.get_test("t1")
+
+        assert stub_api.count("GET", "/detect/tests/t1") == 3
@@ -0,0 +1,119 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from prelude_sdk.controllers.detect_controller import DetectController
+from prelude_sdk.models.account import Account
+
+
+class EchoHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = json.dumps(
+            dict(port=self.server.server_port, token=self.headers.get("token"))
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *_):
+        pass
+
+
+@pytest.fixture(scope="module")
+def servers():
+    servers = [ThreadingHTTPServer(("127.0.0.1", 0), EchoHandler) for _ in range(2)]
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield servers
+    for server in servers:
+        server.shutdown()
+
+
+@pytest.fixture
+def account(servers, tmp_path):
+    account = Account(keychain_location=str(tmp_path / "keychain.ini"), pool_size=4)
+    for name, server in zip("ab", servers):
+        hq = f"http://127.0.0.1:{server.server_port}"
+        account.configure(name, f"token-{name}", f"{name}@x", hq=hq, profile=name)
+    account.profile = "a"
+    return account
+
+
+class TestCredentials:
+
+    def test_credentials_are_fixed_per_call(self, servers, account):
+        detect = DetectController(account)
+        tokens = {s.server_port: f"token-{name}" for name, s in zip("ab", servers)}
+        stop = threading.Event()
+
+        def switch_profiles():
+            while not stop.is_set():
+                account.profile = "b" if account.profile == "a" else "a"
+                time.sleep(0.0001)
+
+        switcher = threading.Thread(target=switch_profiles)
+        switcher.start()
+        try:
+            with ThreadPoolExecutor(max_workers=16) as pool:
+                results = list(pool.map(detect.get_test, map(str, range(256))))
+        finally:
+            stop.set()
+            switcher.join()
+
+        seen = {(r["port"], r["token"]) for r in results}
+        assert len(seen) == 2 and all(tokens[port] == token for port, token in seen)
+
+    def test_profiles_in_one_process(self, account):
+        other = Account(keychain_location=account.keychain_location, profile="b")
+        calls = [DetectController(account).get_test, DetectController(other).get_test]
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda i: calls[i % 2](str(i)), range(32)))
+
+        assert (
+            sorted(r["token"] for r in results) == ["token-a"] * 16 + ["token-b"] * 16
+        )
+
+
+class TestConcurrency:
+
+    @pytest.mark.parametrize("workers", [1, 4, 16])
+    def test_bulk_calls_run_max_workers_at_a_time(
+        self, stub_api, stub_account, workers
+    ):
+        stub_api.latency = 0.1
+        stub_api.routes["DELETE /detect/endpoint"] = lambda _: (200, dict())
+        detect = DetectController(stub_account)
+
+        results = list(
+            detect.bulk_delete_endpoints(
+                [f"e{i}" for i in range(workers * 3)], max_workers=workers
+            )
+        )
+
+        assert all(r["status"] != "FAILED" for r in results)
+        assert stub_api.count("DELETE", "/detect/endpoint") == workers * 3
+        assert stub_api.peak == workers
+
+    def test_growing_the_pool_releases_the_old_one(self, stub_api, stub_account):
+        stub_api.routes["DELETE /detect/endpoint"] = lambda _: (200, dict())
+        detect = DetectController(stub_account)
+        list(detect.bulk_delete_endpoints(["e0", "e1"], max_workers=2))
+        adapter = detect._session.get_adapter(stub_api.url)
+        old = adapter.poolmanager
+        assert len(old.pools)
+
+        size = detect._session.pool_size + 8
+        list(detect.bulk_delete_endpoints(["e2", "e3"], max_workers=size))
+
+        assert len(old.pools) == 0
+        assert adapter.poolmanager is not old
+        assert adapter.poolmanager.connection_pool_kw["maxsize"] == size
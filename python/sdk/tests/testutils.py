@@ -1,5 +1,10 @@
 import json
+import threading
+import time
 import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlparse
 
 
 def check_if_string_is_uuid(string):
@@ -64,3 +69,84 @@ def check_dict_items(expected, actual):
         json.dumps(actual, sort_keys=True, default=str, cls=SortedListEncoder)
     )
     return _check_ordered_dict_items(expected, actual)
+
+
+class StubAPI:
+    """Local stand-in for the Prelude API, for tests that must not reach the real one
+
+    `routes` maps "METHOD /path" to handler(request) -> (status, payload) or (status, payload,
+    headers). Payloads that are not bytes are sent as JSON; unknown routes answer 404. Every
+    request is recorded in `hits`, and `peak` is the most requests ever in flight at once.
+    """
+
+    def __init__(self, latency: float = 0):
+        self.latency = latency
+        self.routes = dict()
+        self.hits = []
+        self.in_flight = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.url = f"http://127.0.0.1:{self._server.server_port}"
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def count(self, method: str, path: str):
+        return sum(1 for hit in self.hits if (hit.method, hit.path) == (method, path))
+
+    def _handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def handle_one_request(self):
+                try:
+                    super().handle_one_request()
+                except ConnectionError:
+                    self.close_connection = True
+
+            def _serve(self):
+                url = urlparse(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                request = SimpleNamespace(
+                    method=self.command,
+                    path=url.path,
+                    query={k: v[-1] for k, v in parse_qs(url.query).items()},
+                    headers=self.headers,
+                    body=self.rfile.read(length) if length else b"",
+                )
+                with api._lock:
+                    api.hits.append(request)
+                    api.in_flight += 1
+                    api.peak = max(api.peak, api.in_flight)
+                try:
+                    time.sleep(api.latency)
+                    route = api.routes.get(f"{request.method} {request.path}")
+                    status, payload, *headers = (
+                        route(request) if route else (404, b"not found")
+                    )
+                finally:
+                    with api._lock:
+                        api.in_flight -= 1
+                if not isinstance(payload, bytes):
+                    payload = json.dumps(payload).encode()
+                self.send_response(status)
+                for k, v in (headers[0] if headers else dict()).items():
+                    self.send_header(k, v)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST = do_PUT = do_DELETE = _serve
+
+            def log_message(self, *_):
+                pass
+
+        return Handler